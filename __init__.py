@@ -3,11 +3,13 @@ ComfyUI Skill Prompt 插件
 智能提示词生成器 - 支持人像/艺术/设计/产品/视频 5大领域
 """
 
-from .nodes.portrait_node import PortraitPromptNode
-from .nodes.art_node import ArtPromptNode
-from .nodes.design_node import DesignPromptNode
-from .nodes.product_node import ProductPromptNode
-from .nodes.video_node import VideoPromptNode
+import os
+
+from .nodes.portrait_node import PortraitPromptNode, PortraitPromptBatchNode
+from .nodes.art_node import ArtPromptNode, ArtPromptBatchNode
+from .nodes.design_node import DesignPromptNode, DesignPromptBatchNode
+from .nodes.product_node import ProductPromptNode, ProductPromptBatchNode
+from .nodes.video_node import VideoPromptNode, VideoPromptBatchNode, VideoStoryboardNode
 
 # ComfyUI 节点注册
 NODE_CLASS_MAPPINGS = {
@@ -16,6 +18,12 @@ NODE_CLASS_MAPPINGS = {
     "DesignPromptNode": DesignPromptNode,
     "ProductPromptNode": ProductPromptNode,
     "VideoPromptNode": VideoPromptNode,
+    "PortraitPromptBatchNode": PortraitPromptBatchNode,
+    "ArtPromptBatchNode": ArtPromptBatchNode,
+    "DesignPromptBatchNode": DesignPromptBatchNode,
+    "ProductPromptBatchNode": ProductPromptBatchNode,
+    "VideoPromptBatchNode": VideoPromptBatchNode,
+    "VideoStoryboardNode": VideoStoryboardNode,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -24,8 +32,69 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "DesignPromptNode": "📐 设计提示词生成器",
     "ProductPromptNode": "📦 产品提示词生成器",
     "VideoPromptNode": "🎬 视频提示词生成器",
+    "PortraitPromptBatchNode": "🎭 人像提示词批量生成器",
+    "ArtPromptBatchNode": "🎨 艺术提示词批量生成器",
+    "DesignPromptBatchNode": "📐 设计提示词批量生成器",
+    "ProductPromptBatchNode": "📦 产品提示词批量生成器",
+    "VideoPromptBatchNode": "🎬 视频提示词批量生成器",
+    "VideoStoryboardNode": "🎬 视频分镜生成器",
 }
 
-__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
+# 前端扩展（流式预览）
+WEB_DIRECTORY = "./web"
+
+__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
+
+print("\033[92m[Skill Prompt] 插件加载成功！5个领域节点（含批量版本）与视频分镜节点已注册。\033[0m")
+
+from .config import (
+    PREWARM_ENABLED, PREWARM_CONNECT, DB_PATH,
+    DEFAULT_API_BASE_URL, DEFAULT_API_KEY, DEFAULT_MODEL,
+    DB_HOT_RELOAD, DB_RELOAD_INTERVAL,
+    LEARNER_ENABLED, LEARNER_INTERVAL, LEARNER_BATCH_SIZE, LEARNER_USE_LLM, LEARNER_CHILD_ENV
+)
+from .comfy_server import register_routes
+
+
+def _start_services():
+    """
+    注册路由并启动后台服务（预热、元素库热更新、学习进程）
+
+    只在 ComfyUI 服务端内启动：脚本、测试等在 ComfyUI 之外导入插件时不访问网络、不启动后台线程与进程
+    """
+    # 流式预览路由
+    if not register_routes():
+        return
+
+    # 后台预热（不阻塞节点注册）
+    if PREWARM_ENABLED:
+        from .core.prewarm import start_prewarm
+
+        domain_options = {
+            node.DOMAIN: node().collect_options({})
+            for node in (PortraitPromptNode, ArtPromptNode, DesignPromptNode, ProductPromptNode, VideoPromptNode)
+        }
+        if PREWARM_CONNECT:
+            start_prewarm(
+                DB_PATH, domain_options,
+                api_base_url=DEFAULT_API_BASE_URL, api_key=DEFAULT_API_KEY, model=DEFAULT_MODEL
+            )
+        else:
+            start_prewarm(DB_PATH, domain_options)
+
+    # 元素库热更新
+    if DB_HOT_RELOAD:
+        from .core.db_watcher import start_db_watcher
+
+        start_db_watcher(DB_PATH, DB_RELOAD_INTERVAL)
+
+    # 增量元素学习（独立工作进程）
+    if LEARNER_ENABLED:
+        from .core.learner import start_learner_process
+
+        start_learner_process(DB_PATH, LEARNER_INTERVAL, LEARNER_BATCH_SIZE, LEARNER_USE_LLM)
+
 
-print("\033[92m[Skill Prompt] 插件加载成功！5个领域节点已注册。\033[0m")
+# 学习进程导入插件包时不启动任何后台服务，避免递归启动学习进程
+if not os.environ.get(LEARNER_CHILD_ENV):
+    _start_services()
@@ -0,0 +1,179 @@
+"""
+ComfyUI 服务端集成
+- 流式预览路由：POST /skill_prompt/stream，以 SSE 推送 token 与已完成的段落
+- 调度指标：GET /skill_prompt/scheduler，返回 LLM 调用的排队深度、在途数与等待时间
+- 级联统计：GET /skill_prompt/cascade，返回升级率与节省的延迟
+- 节点执行时通过 websocket 推送部分文本（事件 skill_prompt.partial）
+
+仅在 ComfyUI 内运行时可用；脱离 ComfyUI（如命令行脚本）时自动降级为空操作
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+from .config import DEFAULT_API_BASE_URL, DEFAULT_API_KEY, DEFAULT_MODEL
+from .core.prompt_engine import PromptEngine
+from .core.scheduler import get_scheduler
+from .core.cascade import CascadeStats
+from .core.response_parser import SectionStreamTracker
+
+try:
+    from server import PromptServer
+    from aiohttp import web
+except ImportError:
+    PromptServer = None
+    web = None
+
+PARTIAL_EVENT = "skill_prompt.partial"
+# websocket 推送最小间隔（秒）
+PARTIAL_PUSH_INTERVAL = 0.1
+
+# 路由接受的 PromptEngine.generate 参数
+_STREAM_PARAMS = (
+    "user_input", "domain", "api_base_url", "api_key", "model", "options",
+    "output_natural_en", "output_natural_cn", "output_json_en", "output_json_cn",
+    "enable_enhance", "json_mode", "cn_mode", "auto_repair", "response_mode", "seed",
+    "use_endpoint_pool", "context_token_budget", "cascade", "reasoning_effort", "post_process",
+)
+
+
+class PartialTextPusher:
+    """累积流式文本并按间隔通过 websocket 推送给前端节点"""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+        self.parts = []
+        self._last_push = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str):
+        with self._lock:
+            self.parts.append(text)
+            now = time.monotonic()
+            if now - self._last_push < PARTIAL_PUSH_INTERVAL:
+                return
+            self._last_push = now
+            self._send(False)
+
+    def done(self):
+        with self._lock:
+            self._send(True)
+
+    def reset(self):
+        """清空已推送的文本（级联生成升级到更强模型、接口失败后换接口重试时调用）"""
+        with self._lock:
+            self.parts = []
+            self._send(False)
+
+    def _send(self, done: bool):
+        PromptServer.instance.send_sync(PARTIAL_EVENT, {
+            "node": self.node_id,
+            "text": "".join(self.parts),
+            "done": done,
+        })
+
+
+def make_partial_pusher(node_id):
+    """在 ComfyUI 内返回推送器，否则返回 None"""
+    if PromptServer is None or node_id is None or getattr(PromptServer, "instance", None) is None:
+        return None
+    return PartialTextPusher(node_id)
+
+
+def _sse(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def stream_generate(request):
+    """
+    SSE 流式生成
+
+    请求体为 PromptEngine.generate 的参数（JSON），事件：
+    - token:   {"text": 增量文本}
+    - section: {"name": 段落名, "text": 段落内容}（分隔符格式下段落完成即推送）
+    - result:  最终结果（与节点输出一致）
+    - reset:   {}（级联生成升级到更强模型，或接口在流中途失败后换接口重试，之前的 token 作废）
+    - error:   {"message": 错误信息}
+    """
+    body = await request.json()
+    params = {key: body[key] for key in _STREAM_PARAMS if key in body}
+    if "user_input" not in params and "description" in body:
+        params["user_input"] = body["description"]
+    params.setdefault("api_base_url", DEFAULT_API_BASE_URL)
+    params.setdefault("api_key", DEFAULT_API_KEY)
+    params.setdefault("model", DEFAULT_MODEL)
+    params["source"] = "stream"
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    tracker = SectionStreamTracker()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def on_delta(text):
+        emit("token", {"text": text})
+        for name, section in tracker.feed(text):
+            emit("section", {"name": name, "text": section})
+
+    def reset():
+        nonlocal tracker
+        tracker = SectionStreamTracker()
+        emit("reset", {})
+
+    on_delta.reset = reset
+
+    def run():
+        engine = PromptEngine()
+        try:
+            result = engine.generate(on_delta=on_delta, **params)
+            for name, section in tracker.finish():
+                emit("section", {"name": name, "text": section})
+            emit("result", result)
+        except Exception as e:
+            emit("error", {"message": f"{type(e).__name__}: {e}"})
+        finally:
+            engine.close()
+            emit(None, None)
+
+    loop.run_in_executor(None, run)
+
+    while True:
+        event, data = await queue.get()
+        if event is None:
+            break
+        await response.write(_sse(event, data))
+
+    await response.write_eof()
+    return response
+
+
+async def cascade_stats(request):
+    """级联生成统计：各 (快速模型, 强模型) 组合的升级率与节省的延迟"""
+    return web.json_response(CascadeStats.snapshot())
+
+
+async def scheduler_stats(request):
+    """LLM 调用调度指标（调度关闭时返回 {"enabled": false}）"""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return web.json_response({"enabled": False})
+    return web.json_response(dict(scheduler.stats(), enabled=True))
+
+
+def register_routes() -> bool:
+    """向 ComfyUI 注册路由，返回是否注册成功"""
+    if PromptServer is None or getattr(PromptServer, "instance", None) is None:
+        return False
+    PromptServer.instance.routes.post("/skill_prompt/stream")(stream_generate)
+    PromptServer.instance.routes.get("/skill_prompt/scheduler")(scheduler_stats)
+    PromptServer.instance.routes.get("/skill_prompt/cascade")(cascade_stats)
+    return True
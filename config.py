@@ -26,3 +26,113 @@ DOMAINS = {
     "product": "产品",
     "video": "视频"
 }
+
+# 级联生成（节点参数 cascade）：先用快速模型生成，本地检查（段落齐全、JSON 合法、长度、一致性）
+# 不通过时再用节点选择的模型重新生成
+CASCADE_FAST_MODEL = "gemini-3-flash"
+
+# JSON 输出模式
+# llm: 由模型直接生成 JSON 段落
+# local: 模型只生成自然语言，JSON 由本地元素索引推导（节省输出 token）
+JSON_MODES = ["llm", "local"]
+DEFAULT_JSON_MODE = "llm"
+
+# 中文自然语言输出模式
+# llm: 由模型生成中文段落
+# local: 模型只生成英文，中文由本地中英短语词典翻译（词典未覆盖的短语合并为一次小批量 LLM 翻译）
+CN_MODES = ["llm", "local"]
+DEFAULT_CN_MODE = "llm"
+
+# 段落补全：本地修复（截断/带说明文字的 JSON）后仍缺失或无法解析的段落，
+# 最多追加几次只请求这些段落的请求（已得到的段落作为上下文）；0 关闭
+SECTION_RETRY_ATTEMPTS = 1
+
+# 思考强度（节点参数 reasoning_effort，仅对模型档案中支持思考控制的模型生效）
+# auto: 使用模型档案的默认值（未设置时不传，由代理决定思考长度）
+# low / medium / high: 按 core/model_profiles.py 的 REASONING_BUDGET_TOKENS 限制思考预算
+REASONING_EFFORTS = ["auto", "low", "medium", "high"]
+DEFAULT_REASONING_EFFORT = "auto"
+
+# 响应格式
+# delimited: === natural_en === 分隔符格式
+# structured: response_format JSON Schema 结构化输出（后端不支持时自动回退）
+RESPONSE_MODES = ["delimited", "structured"]
+DEFAULT_RESPONSE_MODE = "delimited"
+
+# 批量节点默认最大并发 LLM 调用数
+BATCH_MAX_WORKERS = 4
+
+# 视频分镜节点默认镜头数（建立镜头 + 动作镜头 + 收尾镜头）
+STORYBOARD_SHOTS = 4
+
+# 元素上下文 token 预算：大于 0 时按相关度/token 在预算内挑选元素片段（背包选择，重叠短语去重），
+# 0 为不限制（每个类别取前 3 个样本、匹配元素取前 5 个）
+CONTEXT_TOKEN_BUDGET = 0
+
+# LLM 调用传输：live 直连接口；record 直连并把请求与流式 chunk（含到达时间）写入夹具目录；
+# replay 不访问网络，按夹具回放（用于离线、可复现的性能测试与回归测试）
+LLM_TRANSPORT = "live"
+LLM_FIXTURE_DIR = os.path.join(PLUGIN_DIR, "data", "fixtures")
+# 回放时间缩放：1 为原始间隔，0.5 为两倍速，0 为不等待
+LLM_REPLAY_TIME_SCALE = 1.0
+# 回放匹配：exact 只匹配完全相同的请求；loose 找不到时按用户消息、模型依次放宽，多个候选轮转
+LLM_REPLAY_MATCH = "exact"
+
+# 插件在 ComfyUI 内加载时后台预热（读入元素库、构建索引与上下文缓存、建立接口连接）；
+# 在 ComfyUI 之外导入插件（脚本、测试）时不预热，也不启动元素库热更新与学习进程
+PREWARM_ENABLED = True
+# 预热时是否向默认接口建立 keep-alive 连接（LLM_TRANSPORT 为 replay 时不连接）
+PREWARM_CONNECT = True
+
+# 接口池：同一模型配置多个 OpenAI 兼容接口（中转）时在其间负载均衡
+# 格式：{模型名: [{"base_url": ..., "api_key": ...}, ...]}，"*" 为所有模型的默认池
+# 配置后节点的 api_base_url/api_key 被忽略（节点参数 use_endpoint_pool 可关闭）
+ENDPOINT_POOLS = {}
+# 路由策略：least_outstanding（最少在途请求）/ ewma（EWMA 延迟 × 在途请求）
+ENDPOINT_ROUTING = "least_outstanding"
+# 连续失败多少次后临时摘除接口，摘除时长（秒）
+ENDPOINT_EJECT_FAILURES = 3
+ENDPOINT_EJECT_SECONDS = 30
+# 粘性路由允许的额外在途请求数（超过时改走负载最低的接口）
+ENDPOINT_STICKY_SLACK = 2
+
+# LLM 调用调度：交互调用（节点、流式预览）优先于批量调用（批量节点、命令行），
+# 同一优先级内各 api_key 公平排队
+SCHEDULER_ENABLED = True
+# 全局同时在途的 LLM 调用数
+SCHEDULER_MAX_CONCURRENCY = 16
+# 每个 api_key 的并发上限、每分钟 token 上限（0 为不限制）
+SCHEDULER_KEY_CONCURRENCY = 8
+SCHEDULER_KEY_TOKENS_PER_MINUTE = 0
+# 单独设置的配额：{api_key: {"concurrency": n, "tokens_per_minute": n}}
+SCHEDULER_KEY_QUOTAS = {}
+# 排队超时（秒），None 为不限制
+SCHEDULER_QUEUE_TIMEOUT = 600
+
+# 用量账本：记录每次请求的 token 用量与估算费用（独立的 SQLite 文件）
+USAGE_LEDGER_ENABLED = True
+USAGE_DB_PATH = os.path.join(PLUGIN_DIR, "data", "usage.db")
+# 记录由后台线程批量写入：攒满一批或距第一条待写记录超过间隔（秒）时提交一次；汇总与预算检查前先写入
+USAGE_FLUSH_INTERVAL = 1.0
+USAGE_FLUSH_BATCH = 64
+# 预算（按顺序检查，命中多项时执行最严格的动作：refuse > downgrade > warn）
+# 格式：{"period": "day"/"week"/"month", "limit_usd": 5.0 或 "limit_tokens": 2000000,
+#        可选 "domain"/"model"/"node" 限定范围, "action": "warn"/"downgrade"/"refuse",
+#        "downgrade_to": "gemini-3-flash"（action 为 downgrade 时）}
+# 模型未登记价格时费用记为空，只能用 limit_tokens 限制
+USAGE_BUDGETS = []
+
+# 元素库热更新：运行中检测 elements.db 变化并在后台重建索引（无需重启 ComfyUI）
+DB_HOT_RELOAD = True
+# 检查间隔（秒）
+DB_RELOAD_INTERVAL = 2.0
+
+# 增量元素学习：随插件启动低优先级工作进程，持续从待学习的提示词中提取新元素
+LEARNER_ENABLED = False
+# 检查新数据的间隔（秒）、每个事务处理的提示词数
+LEARNER_INTERVAL = 300
+LEARNER_BATCH_SIZE = 20
+# 本地无法分类的短语是否批量交给 LLM（使用默认接口与模型）
+LEARNER_USE_LLM = False
+# 学习进程的环境变量标记：设置时插件加载不注册路由、不启动预热/热更新/学习进程（防止学习进程递归启动自身）
+LEARNER_CHILD_ENV = "SKILL_PROMPT_LEARNER_CHILD"
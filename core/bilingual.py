@@ -0,0 +1,363 @@
+"""
+中英短语词典 - 由英文自然语言提示词在本地生成中文版本（节点参数 cn_mode = local）
+- 词条来源：元素库（英文名 / 短 ai_prompt_template ↔ chinese_name）、DesignVariables 的 en/cn 列表、
+  KnowledgeBase 颜色名与内置的常用提示词词表；同一英文有多个译法时取出现次数最多的
+- 翻译：按逗号切分短语，短语内按单词最长匹配拼接译文；冠词忽略，and / with / of 按中文语序处理
+- 词典无法完整覆盖的短语合并为一次小批量 LLM 翻译请求
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .design_variables import DesignVariables
+from .element_index import get_element_snapshot, NON_CONTENT_CATEGORIES
+from .knowledge_base import KnowledgeBase
+from .model_profiles import ModelProfiles
+from .response_parser import strip_code_fence
+
+# 常用提示词词表（元素库与设计变量未覆盖的通用词）
+BUILTIN_PHRASES = {
+    # 画质与风格
+    "masterpiece": "杰作", "best quality": "最佳画质", "high quality": "高画质",
+    "highly detailed": "高度细节", "ultra detailed": "超精细", "detailed": "细节丰富",
+    "photorealistic": "照片级写实", "realistic": "写实", "hyperrealistic": "超写实",
+    "cinematic": "电影感", "editorial": "杂志风格", "professional": "专业", "elegant": "优雅",
+    "8k": "8K", "4k": "4K", "high resolution": "高分辨率", "sharp focus": "锐利对焦",
+    # 人物
+    "portrait": "肖像", "woman": "女性", "man": "男性", "girl": "女孩", "boy": "男孩",
+    "young": "年轻", "young woman": "年轻女性", "young man": "年轻男性", "person": "人物",
+    "face": "面部", "eyes": "眼睛", "hair": "头发", "skin": "皮肤", "lips": "嘴唇",
+    "smile": "微笑", "gentle smile": "温柔的微笑", "expression": "表情", "gaze": "目光",
+    "looking at camera": "看向镜头", "wearing": "身穿", "long hair": "长发", "short hair": "短发",
+    "wavy hair": "波浪发", "straight hair": "直发", "makeup": "妆容", "natural makeup": "自然妆容",
+    # 光影
+    "light": "光", "lighting": "光线", "soft light": "柔光", "soft lighting": "柔和光线",
+    "natural light": "自然光", "window light": "窗光", "backlight": "逆光", "rim light": "轮廓光",
+    "golden hour": "黄金时刻", "sunlight": "阳光", "shadows": "阴影", "soft shadows": "柔和阴影",
+    "glow": "光晕", "studio lighting": "影棚灯光", "dramatic lighting": "戏剧性光线",
+    # 镜头与构图
+    "close-up": "特写", "close up": "特写", "medium shot": "中景", "full body": "全身",
+    "wide shot": "远景", "wide angle": "广角", "lens": "镜头", "camera": "相机",
+    "depth of field": "景深", "shallow depth of field": "浅景深", "bokeh": "焦外虚化",
+    "composition": "构图", "centered composition": "居中构图", "rule of thirds": "三分法构图",
+    "background": "背景", "blurred background": "虚化背景", "foreground": "前景",
+    # 常用形容词
+    "soft": "柔和", "warm": "温暖", "cool": "冷色", "natural": "自然", "bright": "明亮",
+    "dark": "暗", "subtle": "细微", "clean": "干净", "minimal": "极简", "vibrant": "鲜艳",
+    "delicate": "精致", "smooth": "光滑", "gentle": "轻柔", "dramatic": "戏剧性",
+    "modern": "现代", "traditional": "传统", "vintage": "复古", "beautiful": "美丽",
+    "white": "白色", "gold": "金色", "golden": "金色", "purple": "紫色", "orange": "橙色",
+    "yellow": "黄色", "tones": "色调", "warm tones": "暖色调", "cool tones": "冷色调",
+    "color": "颜色", "colors": "色彩", "texture": "质感", "atmosphere": "氛围", "mood": "情绪",
+}
+
+# 忽略的冠词
+_ARTICLES = {"a", "an", "the"}
+# 只保留可本地翻译的英文短语：单词数上限（更长的模板多为整句描述）
+MAX_ENTRY_WORDS = 6
+# 每次 LLM 翻译请求的短语数
+LLM_BATCH_SIZE = 40
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'/.\-]*[a-z0-9]|[a-z0-9]")
+_ASCII_RE = re.compile(r"^[A-Za-z0-9 '\-/.]+$")
+_CN_ENTRY_RE = re.compile(r'^[一-鿿]{1,12}$')
+# 直接保留原文的技术记号（85mm、f/1.8、8k 等）
+_PASSTHROUGH_RE = re.compile(r'^(?:\d+(?:\.\d+)?(?:mm|k|s|fps|%)?|f/\d+(?:\.\d+)?|iso\d*|\d+:\d+)$')
+# 分句：保留分隔符以便换成中文标点
+_CLAUSE_SPLIT_RE = re.compile(r'(\s*[,;.]\s+|\s*[,;]\s*|\s*\.\s*$|\n+)')
+_CN_PUNCTUATION = {",": "，", ";": "；", ".": "。"}
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _entry(en: str, cn: str) -> Tuple[Optional[str], str]:
+    """规范化词条，不可用（中文不是纯中文词、英文过长）时键为 None"""
+    key = ' '.join(_tokens(en or ''))
+    cn = (cn or '').strip()
+    if not key or not _CN_ENTRY_RE.match(cn) or key.count(' ') >= MAX_ENTRY_WORDS:
+        return None, cn
+    return key, cn
+
+
+class BilingualDictionary:
+    """英文短语 → 中文（构建后只读，可在线程间共享）"""
+
+    def __init__(self, pairs):
+        """pairs: [(规范化英文, 中文)]，见 from_db"""
+        votes = defaultdict(Counter)
+        for key, cn in pairs:
+            votes[key][cn] += 1
+        # 票数相同时取较短的译法
+        self.entries: Dict[str, str] = {
+            key: min(counter.items(), key=lambda item: (-item[1], len(item[0])))[0]
+            for key, counter in votes.items()
+        }
+        self.max_words = max((key.count(' ') + 1 for key in self.entries), default=1)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _element_pairs(db_path: str):
+        conn = sqlite3.connect(db_path)
+        try:
+            categories = ','.join('?' * len(NON_CONTENT_CATEGORIES))
+            rows = conn.execute(f"""
+                SELECT name, chinese_name, ai_prompt_template FROM elements
+                WHERE domain_id != 'prompt_writing' AND category_id NOT IN ({categories})
+                  AND chinese_name IS NOT NULL
+            """, NON_CONTENT_CATEGORIES).fetchall()
+        except sqlite3.Error:
+            return []
+        finally:
+            conn.close()
+
+        pairs = []
+        for name, chinese_name, template in rows:
+            for en in (template, (name or '').replace('_', ' ')):
+                if en and _ASCII_RE.match(en.strip()):
+                    pairs.append((en, chinese_name))
+        return pairs
+
+    @staticmethod
+    def _design_pairs():
+        groups = list(DesignVariables.COLOR_PALETTES.values())
+        groups += list(DesignVariables.STYLE_KEYWORDS.values())
+        groups += list(DesignVariables.STYLE_CONSTRAINTS.values())
+        pairs = []
+        for group in groups:
+            for terms in group.values():
+                if len(terms["en"]) == len(terms["cn"]):
+                    pairs.extend(zip(terms["en"], terms["cn"]))
+        return pairs
+
+    @classmethod
+    def from_db(cls, db_path: str) -> 'BilingualDictionary':
+        """元素库词条优先，其次设计变量、颜色名、内置词表（仅补充前者未收录的英文）"""
+        sources = [
+            cls._element_pairs(db_path),
+            cls._design_pairs(),
+            [(en, cn + "色") for en, cn in KnowledgeBase.COLOR_NAMES_CN.items()],
+            list(BUILTIN_PHRASES.items()),
+        ]
+        pairs, seen = [], set()
+        for source in sources:
+            keys = set()
+            for en, cn in source:
+                key, cn = _entry(en, cn)
+                if key and key not in seen:
+                    pairs.append((key, cn))
+                    keys.add(key)
+            seen |= keys
+        return cls(pairs)
+
+    # =========================================================================
+    # 翻译
+    # =========================================================================
+
+    def _segment(self, words: List[str]) -> Optional[str]:
+        """单词最长匹配；有未覆盖的单词时返回 None"""
+        parts = []
+        i = 0
+        while i < len(words):
+            for size in range(min(self.max_words, len(words) - i), 0, -1):
+                translation = self.entries.get(' '.join(words[i:i + size]))
+                if translation:
+                    parts.append(translation)
+                    i += size
+                    break
+            else:
+                if _PASSTHROUGH_RE.match(words[i]):
+                    parts.append(words[i].upper() if words[i].endswith('k') else words[i])
+                    i += 1
+                    continue
+                return None
+        return ''.join(parts)
+
+    def translate_phrase(self, phrase: str) -> Optional[str]:
+        """翻译单个短语，词典无法完整覆盖时返回 None"""
+        words = [word for word in _tokens(phrase) if word not in _ARTICLES]
+        if not words:
+            return None
+        whole = self._segment(words)
+        if whole is not None:
+            return whole
+
+        # X and Y → X和Y；X with Y → X，Y；X of Y → Y的X
+        for connective in ("with", "and", "of"):
+            if connective not in words:
+                continue
+            position = words.index(connective)
+            left = self.translate_phrase(' '.join(words[:position]))
+            right = self.translate_phrase(' '.join(words[position + 1:]))
+            if left is None or right is None:
+                return None
+            if connective == "of":
+                return f"{right}的{left}"
+            return f"{left}和{right}" if connective == "and" else f"{left}，{right}"
+        return None
+
+    def split(self, text: str) -> Tuple[List[str], List[str]]:
+        """切分为 (短语, 分隔符) 两个对齐的列表"""
+        parts = _CLAUSE_SPLIT_RE.split(text or "")
+        return parts[0::2], parts[1::2] + [""]
+
+    def translate(self, text: str, fallback=None) -> Tuple[str, Dict]:
+        """
+        翻译英文提示词
+
+        Args:
+            fallback: 批量翻译回调 fallback(phrases) -> 对齐的译文列表（失败项为 None）；
+                为 None 时未覆盖的短语保留英文
+
+        Returns:
+            (中文文本, 统计 {"phrases", "local", "llm", "untranslated"})
+        """
+        phrases, separators = self.split(text)
+        translations: List[Optional[str]] = []
+        missing = []
+        for i, phrase in enumerate(phrases):
+            if not phrase.strip():
+                translations.append("")
+                continue
+            translation = self.translate_phrase(phrase)
+            if translation is None:
+                missing.append(i)
+            translations.append(translation)
+
+        local = sum(1 for phrase in phrases if phrase.strip()) - len(missing)
+        translated_by_llm = 0
+        if missing and fallback is not None:
+            for i, translation in zip(missing, fallback([phrases[i].strip() for i in missing])):
+                if translation:
+                    translations[i] = translation
+                    translated_by_llm += 1
+
+        untranslated = 0
+        output = []
+        for phrase, translation, separator in zip(phrases, translations, separators):
+            if translation is None:
+                translation = phrase.strip()
+                untranslated += 1
+            output.append(translation)
+            mark = separator.strip()
+            output.append(_CN_PUNCTUATION.get(mark, mark) if mark else ("\n" if "\n" in separator else ""))
+
+        return ''.join(output).strip(), {
+            "phrases": local + len(missing),
+            "local": local,
+            "llm": translated_by_llm,
+            "untranslated": untranslated,
+        }
+
+
+class LLMPhraseTranslator:
+    """批量 LLM 短语翻译（词典无法覆盖的短语）"""
+
+    SYSTEM_PROMPT = (
+        "你是图像提示词翻译器。把每个编号的英文提示词短语翻译为简洁自然的中文提示词短语，"
+        "保留镜头参数、数字等技术记号。\n"
+        '只输出一个 JSON 对象，键为编号，值为译文，例如 {"1": "柔和的窗光", "2": "浅景深"}'
+    )
+
+    def __init__(self, base_url: str, api_key: str, model: str, batch_size: int = LLM_BATCH_SIZE):
+        from .llm_client import get_openai_client
+        self.client = get_openai_client(base_url, api_key)
+        self.model = model
+        self.batch_size = batch_size
+        # 本次翻译的用量（输入/输出 token，接口未返回时为 None）
+        self.usage = {"input_tokens": 0, "output_tokens": 0, "estimated": False}
+
+    def translate(self, phrases: List[str]) -> List[Optional[str]]:
+        """返回与 phrases 对齐的中文译文，失败项为 None"""
+        results: List[Optional[str]] = []
+        for start in range(0, len(phrases), self.batch_size):
+            results.extend(self._translate_batch(phrases[start:start + self.batch_size]))
+        return results
+
+    @staticmethod
+    def _output_tokens(model: str, phrases: List[str]) -> int:
+        """一批短语的输出 token 上限（译文不长于原文，加编号与 JSON 开销及思考预留）"""
+        profile = ModelProfiles.get(model)
+        return sum(len(phrase) for phrase in phrases) + 16 * len(phrases) + 64 + profile["reasoning_tokens"]
+
+    @classmethod
+    def estimate(cls, model: str, phrases: List[str], batch_size: int = LLM_BATCH_SIZE) -> Tuple[int, int]:
+        """估算翻译全部短语的 (输入 token, 输出 token)，用于预算与调度"""
+        from .tokens import estimate_tokens
+
+        input_tokens = output_tokens = 0
+        for start in range(0, len(phrases), batch_size):
+            batch = phrases[start:start + batch_size]
+            input_tokens += estimate_tokens(cls.SYSTEM_PROMPT + "\n".join(batch)) + 4 * len(batch)
+            output_tokens += cls._output_tokens(model, batch)
+        return input_tokens, output_tokens
+
+    def _translate_batch(self, phrases: List[str]) -> List[Optional[str]]:
+        from .tokens import estimate_tokens
+
+        system_prompt = self.SYSTEM_PROMPT
+        user_prompt = "\n".join(f"{i}. {phrase}" for i, phrase in enumerate(phrases, 1))
+
+        profile = ModelProfiles.get(self.model)
+        params = {}
+        if profile["temperature"] is not None:
+            params["temperature"] = 0
+        if profile["max_output_tokens"] is not None:
+            params["max_tokens"] = min(profile["max_output_tokens"], self._output_tokens(self.model, phrases))
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            **params
+        )
+        content = response.choices[0].message.content or ""
+        usage = getattr(response, "usage", None)
+        if usage and getattr(usage, "prompt_tokens", None) is not None:
+            self.usage["input_tokens"] += usage.prompt_tokens
+            self.usage["output_tokens"] += usage.completion_tokens or 0
+        else:
+            self.usage["input_tokens"] += estimate_tokens(system_prompt + user_prompt)
+            self.usage["output_tokens"] += estimate_tokens(content)
+            self.usage["estimated"] = True
+
+        try:
+            mapping = json.loads(strip_code_fence(content))
+        except ValueError:
+            return [None] * len(phrases)
+        if not isinstance(mapping, dict):
+            return [None] * len(phrases)
+
+        translations = []
+        for i in range(1, len(phrases) + 1):
+            translation = mapping.get(str(i))
+            translations.append(translation.strip() if isinstance(translation, str) and translation.strip() else None)
+        return translations
+
+
+# 按数据库缓存的词典，元素库热更新（快照版本变化）后重建
+_DICTIONARIES: Dict[str, Tuple[int, BilingualDictionary]] = {}
+_DICTIONARY_LOCK = threading.Lock()
+
+
+def get_bilingual_dictionary(db_path: str) -> BilingualDictionary:
+    """获取指定数据库的中英词典（首次调用或元素库更新后构建）"""
+    generation = get_element_snapshot(db_path).generation
+    cached = _DICTIONARIES.get(db_path)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    with _DICTIONARY_LOCK:
+        cached = _DICTIONARIES.get(db_path)
+        if cached is None or cached[0] != generation:
+            cached = (generation, BilingualDictionary.from_db(db_path))
+            _DICTIONARIES[db_path] = cached
+    return cached[1]
@@ -0,0 +1,163 @@
+"""
+级联生成 - 先用快速模型生成，本地检查不通过时再交给用户选择的更强模型
+检查项：
+- 请求的段落全部解析到且非空
+- JSON 段落是合法 JSON
+- 长度在扩写规则范围内（启用扩写时）
+- 一致性规则（关闭 auto_repair 时；开启时违规片段在本地修复，无需升级）
+"""
+
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .constraint_checker import ConstraintChecker
+from .model_profiles import ModelProfiles
+from .response_parser import JSON_SECTIONS, strip_code_fence
+
+# 扩写规则中的长度要求（字符）：英文自然语言 600-800，JSON 1000-1200；
+# 一个汉字承载的信息约为 2.5 个英文字符，中文自然语言按 240-320 字
+LENGTH_RULES = {
+    "natural": (600, 800),
+    "natural_cn": (240, 320),
+    "json": (1000, 1200),
+}
+
+
+def length_rule(section: str) -> Tuple[int, int]:
+    """段落对应的长度要求 (下限, 上限)"""
+    if section in JSON_SECTIONS:
+        return LENGTH_RULES["json"]
+    return LENGTH_RULES.get(section, LENGTH_RULES["natural"])
+
+
+# 低于下限 × MIN_LENGTH_RATIO 或高于上限 × MAX_LENGTH_RATIO 视为不合格
+MIN_LENGTH_RATIO = 0.5
+MAX_LENGTH_RATIO = 1.5
+
+
+def validate_result(
+    result: dict,
+    requested: List[str],
+    options: dict = None,
+    description: str = "",
+    enable_enhance: bool = True,
+    auto_repair: bool = True,
+    skip_length: Iterable[str] = (),
+    domain: str = None
+) -> List[str]:
+    """
+    本地检查生成结果
+
+    Args:
+        requested: 请求的段落（natural_en / natural_cn / json_en / json_cn）
+        skip_length: 不检查长度的段落（本地推导的 JSON、本地翻译的中文）
+        domain: 领域（判断是否涉及人物，见 KnowledgeBase.detect_ethnicity）
+
+    Returns:
+        未通过的检查，如 ["missing:json_en", "too_long:natural_en"]；全部通过时为空列表
+    """
+    failures = []
+    context = None if auto_repair else ConstraintChecker.build_context(options, description, domain)
+
+    for name in requested:
+        text = result.get(f"prompt_{name}", "") or ""
+        if not text.strip():
+            failures.append(f"missing:{name}")
+            continue
+
+        is_json = name in JSON_SECTIONS
+        if is_json:
+            try:
+                json.loads(strip_code_fence(text))
+            except ValueError:
+                failures.append(f"invalid_json:{name}")
+                continue
+
+        if enable_enhance and name not in skip_length:
+            low, high = length_rule(name)
+            if len(text) < low * MIN_LENGTH_RATIO:
+                failures.append(f"too_short:{name}")
+            elif len(text) > high * MAX_LENGTH_RATIO:
+                failures.append(f"too_long:{name}")
+
+        if context is not None:
+            _, issues = ConstraintChecker.check(text, context, repair=False)
+            if issues:
+                failures.append(f"inconsistent:{name}")
+
+    return failures
+
+
+class CascadeStats:
+    """进程内的级联统计：升级率与节省的延迟"""
+
+    _lock = threading.Lock()
+    _stats: Dict[tuple, dict] = {}
+
+    @classmethod
+    def record(
+        cls,
+        fast_model: str,
+        strong_model: str,
+        failures: List[str],
+        fast_latency: float,
+        strong_latency: Optional[float] = None
+    ):
+        with cls._lock:
+            stats = cls._stats.setdefault((fast_model, strong_model), {
+                "requests": 0, "escalations": 0, "reasons": {},
+                "accepted_fast_seconds": 0.0, "wasted_fast_seconds": 0.0,
+                "strong_seconds": 0.0,
+            })
+            stats["requests"] += 1
+            if strong_latency is None:
+                stats["accepted_fast_seconds"] += fast_latency
+                return
+            stats["escalations"] += 1
+            stats["wasted_fast_seconds"] += fast_latency
+            stats["strong_seconds"] += strong_latency
+            for failure in failures:
+                reason = failure.split(":", 1)[0]
+                stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+
+    @classmethod
+    def snapshot(cls) -> List[Dict]:
+        """
+        各 (快速模型, 强模型) 组合的升级率与节省的延迟
+
+        节省的延迟 = 未升级请求数 × 强模型平均延迟 − 未升级请求的快速模型耗时 − 升级请求浪费的快速模型耗时；
+        强模型平均延迟取升级请求的实测值，没有升级时取模型档案中观测到的延迟
+        """
+        with cls._lock:
+            items = [(key, dict(stats, reasons=dict(stats["reasons"]))) for key, stats in cls._stats.items()]
+
+        report = []
+        for (fast_model, strong_model), stats in items:
+            accepted = stats["requests"] - stats["escalations"]
+            if stats["escalations"]:
+                strong_latency = stats["strong_seconds"] / stats["escalations"]
+            else:
+                strong_latency = ModelProfiles.observed(strong_model).get("latency")
+            saved = None
+            if strong_latency is not None:
+                saved = accepted * strong_latency - stats["accepted_fast_seconds"] - stats["wasted_fast_seconds"]
+            report.append({
+                "fast_model": fast_model,
+                "strong_model": strong_model,
+                "requests": stats["requests"],
+                "escalations": stats["escalations"],
+                "escalation_rate": round(stats["escalations"] / stats["requests"], 3),
+                "reasons": stats["reasons"],
+                "fast_latency_ms": round(
+                    (stats["accepted_fast_seconds"] + stats["wasted_fast_seconds"]) / stats["requests"] * 1000, 1
+                ),
+                "strong_latency_ms": round(strong_latency * 1000, 1) if strong_latency is not None else None,
+                "latency_saved_s": round(saved, 2) if saved is not None else None,
+            })
+        return report
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._stats.clear()
@@ -0,0 +1,206 @@
+"""
+元素库压缩 - 统一类别 ID 并合并近似重复的元素
+- 类别：按 KnowledgeBase.CATEGORY_ALIASES 把漂移的类别 ID 改为规范 ID
+- 去重：同一领域、同一类别内按复用分从高到低贪心聚类（shingle Jaccard），
+  每簇保留复用分最高的代表，其余元素的关键词、来源与引用合并到代表后删除
+- 索引：补建上下文检索使用的复合索引并更新统计信息
+- 全部修改在一个事务中完成
+"""
+
+import json
+import sqlite3
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from .knowledge_base import KnowledgeBase
+from .element_index import NON_CONTENT_CATEGORIES, CONTEXT_INDEX_SQL
+from .similarity import NearDuplicateIndex, DUPLICATE_THRESHOLD
+
+# 不参与去重的领域
+_SKIPPED_DOMAINS = ('prompt_writing',)
+
+
+def _json_list(raw) -> list:
+    try:
+        value = json.loads(raw) if raw else []
+    except (TypeError, ValueError):
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _merge_unique(*lists) -> list:
+    merged = []
+    for values in lists:
+        for value in values:
+            if value not in merged:
+                merged.append(value)
+    return merged
+
+
+def normalize_categories(conn: sqlite3.Connection) -> Dict[str, int]:
+    """把元素与类别表中的别名类别改为规范 ID，返回 {别名: 改动的元素数}"""
+    renamed = {}
+    for alias, canonical in KnowledgeBase.CATEGORY_ALIASES.items():
+        count = conn.execute(
+            "UPDATE elements SET category_id = ? WHERE category_id = ?", (canonical, alias)
+        ).rowcount
+        if count:
+            renamed[alias] = count
+
+        row = conn.execute("SELECT domain_id FROM categories WHERE category_id = ?", (alias,)).fetchone()
+        if row is None:
+            continue
+        if conn.execute("SELECT 1 FROM categories WHERE category_id = ?", (canonical,)).fetchone():
+            conn.execute("DELETE FROM categories WHERE category_id = ?", (alias,))
+        else:
+            conn.execute("UPDATE categories SET category_id = ? WHERE category_id = ?", (canonical, alias))
+    return renamed
+
+
+def find_duplicate_clusters(conn: sqlite3.Connection, threshold: float = DUPLICATE_THRESHOLD) -> List[Dict]:
+    """
+    查找近似重复簇
+
+    Returns:
+        [{"domain", "category", "keep": 代表元素 ID, "merge": [被合并的元素 ID, ...]}]
+    """
+    rows = conn.execute("""
+        SELECT element_id, domain_id, category_id, ai_prompt_template
+        FROM elements
+        ORDER BY reusability_score DESC, confidence_score DESC, element_id
+    """).fetchall()
+
+    groups = defaultdict(list)
+    for element_id, domain, category, template in rows:
+        if domain in _SKIPPED_DOMAINS or category in NON_CONTENT_CATEGORIES:
+            continue
+        groups[(domain, category)].append((element_id, template))
+
+    clusters = []
+    for (domain, category), elements in groups.items():
+        leaders = NearDuplicateIndex(threshold)
+        members = defaultdict(list)
+        for element_id, template in elements:
+            match = leaders.find(template)
+            if match:
+                members[match[0]].append(element_id)
+            else:
+                leaders.add(element_id, template)
+        for keep, merge in members.items():
+            clusters.append({"domain": domain, "category": category, "keep": keep, "merge": merge})
+    return clusters
+
+
+def merge_elements(conn: sqlite3.Connection, keep: str, merge: List[str]):
+    """把 merge 中的元素合并到 keep：合并关键词与来源，迁移所有引用后删除"""
+    placeholders = ", ".join("?" * len(merge))
+    rows = conn.execute(
+        f"SELECT element_id, keywords, source_prompts, metadata FROM elements WHERE element_id IN (?, {placeholders})",
+        (keep, *merge)
+    ).fetchall()
+    by_id = {row[0]: row for row in rows}
+    _, keywords, sources, metadata = by_id[keep]
+
+    keywords = _merge_unique(_json_list(keywords), *(_json_list(by_id[m][1]) for m in merge if m in by_id))
+    sources = _merge_unique(_json_list(sources), *(_json_list(by_id[m][2]) for m in merge if m in by_id))
+    try:
+        meta = json.loads(metadata) if metadata else {}
+    except ValueError:
+        meta = {}
+    if not isinstance(meta, dict):
+        meta = {}
+    meta["merged_from"] = _merge_unique(meta.get("merged_from", []), merge)
+
+    conn.execute("""
+        UPDATE elements SET keywords = ?, source_prompts = ?, metadata = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE element_id = ?
+    """, (json.dumps(keywords, ensure_ascii=False), json.dumps(sources),
+          json.dumps(meta, ensure_ascii=False), keep))
+
+    # 迁移引用
+    conn.execute(f"UPDATE prompt_elements SET element_id = ? WHERE element_id IN ({placeholders})", (keep, *merge))
+    # 代表元素已有同名参数时丢弃被合并元素的参数
+    conn.execute(f"""
+        DELETE FROM element_variables
+        WHERE element_id IN ({placeholders})
+          AND parameter_name IN (SELECT parameter_name FROM element_variables WHERE element_id = ?)
+    """, (*merge, keep))
+    conn.execute(f"""
+        DELETE FROM element_variables
+        WHERE element_id IN ({placeholders})
+          AND rowid NOT IN (
+              SELECT MIN(rowid) FROM element_variables
+              WHERE element_id IN ({placeholders}) GROUP BY parameter_name
+          )
+    """, (*merge, *merge))
+    conn.execute(f"UPDATE element_variables SET element_id = ? WHERE element_id IN ({placeholders})", (keep, *merge))
+    conn.execute(f"""
+        INSERT OR IGNORE INTO element_tags (element_id, tag_id)
+        SELECT ?, tag_id FROM element_tags WHERE element_id IN ({placeholders})
+    """, (keep, *merge))
+    conn.execute(f"DELETE FROM element_tags WHERE element_id IN ({placeholders})", merge)
+
+    usage = conn.execute(
+        f"SELECT COALESCE(SUM(usage_count), 0), MAX(last_used) FROM element_usage_stats WHERE element_id IN ({placeholders})",
+        merge
+    ).fetchone()
+    if usage[0]:
+        conn.execute("""
+            INSERT INTO element_usage_stats (element_id, usage_count, last_used) VALUES (?, ?, ?)
+            ON CONFLICT(element_id) DO UPDATE SET
+                usage_count = usage_count + excluded.usage_count,
+                last_used = MAX(COALESCE(last_used, ''), COALESCE(excluded.last_used, ''))
+        """, (keep, usage[0], usage[1]))
+    conn.execute(f"DELETE FROM element_usage_stats WHERE element_id IN ({placeholders})", merge)
+
+    conn.execute(f"DELETE FROM elements WHERE element_id IN ({placeholders})", merge)
+
+
+def _remap_design_templates(conn: sqlite3.Connection, mapping: Dict[str, str]):
+    """design_templates.element_ids 中被合并的元素 ID 改为代表 ID"""
+    for template_id, element_ids in conn.execute("SELECT template_id, element_ids FROM design_templates").fetchall():
+        ids = _json_list(element_ids)
+        if not any(element_id in mapping for element_id in ids):
+            continue
+        remapped = _merge_unique([mapping.get(element_id, element_id) for element_id in ids])
+        conn.execute("UPDATE design_templates SET element_ids = ? WHERE template_id = ?",
+                     (json.dumps(remapped), template_id))
+
+
+def _refresh_counts(conn: sqlite3.Connection):
+    conn.execute("""
+        UPDATE categories SET total_elements =
+            (SELECT COUNT(*) FROM elements WHERE elements.category_id = categories.category_id)
+    """)
+    conn.execute("""
+        UPDATE domains SET total_elements =
+            (SELECT COUNT(*) FROM elements WHERE elements.domain_id = domains.domain_id)
+    """)
+
+
+def compact_elements(conn: sqlite3.Connection, threshold: float = DUPLICATE_THRESHOLD) -> Dict:
+    """
+    压缩元素库（单个事务）
+
+    Returns:
+        {"renamed": {别名: 元素数}, "clusters": 簇数, "removed": {领域: 删除的元素数}}
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        renamed = normalize_categories(conn)
+        clusters = find_duplicate_clusters(conn, threshold)
+        mapping = {}
+        removed = Counter()
+        for cluster in clusters:
+            merge_elements(conn, cluster["keep"], cluster["merge"])
+            mapping.update({element_id: cluster["keep"] for element_id in cluster["merge"]})
+            removed[cluster["domain"]] += len(cluster["merge"])
+        _remap_design_templates(conn, mapping)
+        _refresh_counts(conn)
+        conn.execute(CONTEXT_INDEX_SQL)
+        conn.execute("ANALYZE")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return {"renamed": renamed, "clusters": len(clusters), "removed": dict(removed)}
@@ -0,0 +1,206 @@
+"""
+一致性约束检查器
+将 KnowledgeBase 中的一致性规则编译为单个正则自动机，
+单次扫描生成结果，定位违规片段并在本地替换为合规描述
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+from .knowledge_base import KnowledgeBase
+
+# 眼睛/头发颜色前可出现的修饰词
+_EYE_MODIFIERS = (
+    'almond-shaped', 'almond', 'round', 'wide', 'large', 'big', 'expressive', 'bright',
+    'piercing', 'deep', 'clear', 'sparkling', 'striking', 'soft', 'gentle', 'intense',
+)
+_HAIR_MODIFIERS = (
+    'shoulder-length', 'long', 'short', 'wavy', 'curly', 'straight', 'sleek', 'flowing',
+    'silky', 'messy', 'braided', 'cropped', 'glossy', 'shiny', 'thick', 'loose',
+)
+# 规则外补充的常见颜色写法
+_EXTRA_EYE_COLORS = ('gray', 'violet', 'amber')
+_EXTRA_HAIR_COLORS = ('blond', 'platinum', 'silver', 'pink', 'ginger', 'golden')
+_COLOR_ALIASES = {'gray': 'grey', 'blond': 'blonde', 'golden': 'blonde', 'ginger': 'red'}
+
+# 中文：颜色后不能紧跟这些字（如"金色发光"、"红色发带"不是发色）
+_CN_HAIR_EXCLUDE = '光带夹饰箍卡'
+
+_ISSUE_TYPES = {
+    'eyes': 'ethnicity_eye_mismatch',
+    'hair': 'ethnicity_hair_mismatch',
+    'lighting': 'style_lighting_mismatch',
+    'clothing': 'era_clothing_mismatch',
+}
+
+
+# 英文词边界：连字符视为词的一部分，"blue-grey"、"hair-clip" 作为整体匹配，不从中间切开
+_EN_START = r"(?<![\w-])"
+_EN_END = r"(?![\w-])"
+
+
+def _alternation(terms) -> str:
+    """按长度降序拼接候选项，保证最长匹配优先"""
+    return '|'.join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+
+
+def _compile_automaton():
+    kb = KnowledgeBase
+    eye_colors = {c for colors in kb.ETHNICITY_TYPICAL_EYES.values() for c in colors}
+    eye_colors.update(_EXTRA_EYE_COLORS)
+    hair_colors = {c for colors in kb.ETHNICITY_TYPICAL_HAIR.values() for c in colors}
+    hair_colors.update(_EXTRA_HAIR_COLORS)
+
+    cn_eye_colors = [kb.COLOR_NAMES_CN[c] for c in eye_colors if c in kb.COLOR_NAMES_CN]
+    cn_hair_colors = [kb.COLOR_NAMES_CN[c] for c in hair_colors if c in kb.COLOR_NAMES_CN] + ['亚麻']
+
+    lighting_terms = [t for rule in kb.STYLE_LIGHTING_CONFLICTS.values() for t in rule['conflicts']]
+    clothing_en = [t for rule in kb.ERA_CLOTHING_CONFLICTS.values() for t in rule['conflicts']['en']]
+    clothing_cn = [t for rule in kb.ERA_CLOTHING_CONFLICTS.values() for t in rule['conflicts']['cn']]
+
+    eye_en = _alternation(eye_colors)
+    hair_en = _alternation(hair_colors)
+    # 英文颜色可用连字符组合（"blue-grey eyes"），整体作为一个颜色匹配
+    branches = [
+        rf"{_EN_START}(?P<eye_en>(?:{eye_en})(?:-(?:{eye_en}))*)"
+        rf"(?P<eye_en_tail>(?:[\s-]+(?:{_alternation(_EYE_MODIFIERS)}))*[\s-]+(?:eyes|eye|irises|iris)){_EN_END}",
+        rf"{_EN_START}(?P<hair_en>(?:{hair_en})(?:-(?:{hair_en}))*)"
+        rf"(?P<hair_en_tail>(?:[\s-]+(?:{_alternation(_HAIR_MODIFIERS)}))*[\s-]+hair){_EN_END}",
+        rf"(?P<eye_cn>{_alternation(cn_eye_colors)})色?的?(?P<eye_cn_tail>眼睛|眼眸|双眸|瞳孔|瞳|眼)",
+        rf"(?P<hair_cn>{_alternation(cn_hair_colors)})色?的?"
+        rf"(?P<hair_cn_tail>(?:长|短|卷|直|波浪)?(?:头发|发丝|发)(?![{_CN_HAIR_EXCLUDE}]))",
+        rf"{_EN_START}(?P<lighting>{_alternation(lighting_terms)}){_EN_END}",
+        rf"(?P<clothing>{_EN_START}(?:{_alternation(clothing_en)}){_EN_END}|{_alternation(clothing_cn)})",
+    ]
+    return re.compile('|'.join(branches), re.IGNORECASE)
+
+
+class ConstraintChecker:
+    """单次扫描的一致性检查与本地修复"""
+
+    AUTOMATON = _compile_automaton()
+    # 中文颜色 → 英文颜色键
+    CN_TO_COLOR = {cn: en for en, cn in KnowledgeBase.COLOR_NAMES_CN.items()}
+
+    @classmethod
+    def build_context(cls, options: dict = None, description: str = "", domain: str = None) -> Dict:
+        """根据用户选项与描述确定生效的规则上下文（domain 用于判断是否涉及人物）"""
+        options = options or {}
+        ethnicity = KnowledgeBase.detect_ethnicity(options, description, domain)
+        context = {
+            'ethnicity': ethnicity,
+            'styles': KnowledgeBase.detect_styles(options),
+            'era': KnowledgeBase.detect_era(options, description),
+        }
+        if ethnicity:
+            constraints = KnowledgeBase.get_ethnicity_constraints(ethnicity)
+            context['typical_eyes'] = constraints['typical_eyes']
+            context['typical_hair'] = constraints['typical_hair']
+        return context
+
+    @staticmethod
+    def _preferred_color(typical: List[str]) -> str:
+        # "black eyes" 易被理解为淤青，眼睛颜色优先选非黑色
+        for color in typical:
+            if color != 'black':
+                return color
+        return typical[0]
+
+    @classmethod
+    def _color_key(cls, color: str, lang: str) -> str:
+        """颜色写法 → 规则中的颜色键"""
+        key = color.lower() if lang == 'en' else cls.CN_TO_COLOR.get(color, color)
+        return _COLOR_ALIASES.get(key, key)
+
+    @classmethod
+    def _resolve(cls, match, context: Dict) -> Optional[Tuple[str, str, str]]:
+        """判断一次匹配是否违规，返回 (规则, 替换文本, 说明) 或 None"""
+        groups = match.groupdict()
+
+        for part, typical_key in (('eye', 'typical_eyes'), ('hair', 'typical_hair')):
+            for lang in ('en', 'cn'):
+                color = groups.get(f'{part}_{lang}')
+                if color is None or not context.get('ethnicity'):
+                    continue
+                typical = context[typical_key]
+                # 组合颜色逐个判断，只替换不合规的部分（"brown-green eyes" → "brown eyes"）
+                parts = color.split('-') if lang == 'en' else [color]
+                consistent = [p for p in parts if cls._color_key(p, lang) in typical]
+                if len(consistent) == len(parts):
+                    return None
+                if consistent:
+                    preferred = '-'.join(consistent)
+                else:
+                    preferred = cls._preferred_color(typical) if part == 'eye' else typical[0]
+                    if lang == 'cn':
+                        preferred = KnowledgeBase.COLOR_NAMES_CN.get(preferred, preferred) + '色'
+                rule = 'eyes' if part == 'eye' else 'hair'
+                message = f"{context['ethnicity']} 通常不会有 {match.group(0)}"
+                return rule, preferred + groups[f'{part}_{lang}_tail'], message
+
+        term = groups.get('lighting')
+        if term is not None:
+            for style in context.get('styles', []):
+                rule = KnowledgeBase.STYLE_LIGHTING_CONFLICTS[style]
+                if term.lower() in rule['conflicts']:
+                    return 'lighting', rule['replacement'], f"{style} 风格与 {term} 冲突"
+            return None
+
+        term = groups.get('clothing')
+        if term is not None and context.get('era'):
+            rule = KnowledgeBase.ERA_CLOTHING_CONFLICTS[context['era']]
+            lang = 'en' if term.isascii() else 'cn'
+            if term.lower() in [t.lower() for t in rule['conflicts'][lang]]:
+                return 'clothing', rule['replacement'][lang], f"{context['era']} 场景与 {term} 冲突"
+        return None
+
+    @classmethod
+    def check(cls, text: str, context: Dict, repair: bool = True) -> Tuple[str, List[Dict]]:
+        """
+        单次扫描文本
+
+        Args:
+            text: 生成的提示词
+            context: build_context() 返回的规则上下文
+            repair: 是否替换违规片段
+
+        Returns:
+            (修复后的文本, 触发的规则列表)
+        """
+        if not text:
+            return text, []
+
+        fired = []
+
+        def substitute(match):
+            resolved = cls._resolve(match, context)
+            if resolved is None:
+                return match.group(0)
+            rule, replacement, message = resolved
+            fired.append({
+                'type': _ISSUE_TYPES[rule],
+                'rule': rule,
+                'severity': 'warning',
+                'message': message,
+                'original': match.group(0),
+                'replacement': replacement,
+                'suggestion': f"建议使用: {replacement}",
+            })
+            return replacement if repair else match.group(0)
+
+        repaired = cls.AUTOMATON.sub(substitute, text)
+        return repaired, fired
+
+    @classmethod
+    def repair_result(cls, result: dict, options: dict = None, description: str = "",
+                      domain: str = None) -> List[Dict]:
+        """就地修复生成结果中的四种输出，返回触发的规则（附带所在字段）"""
+        context = cls.build_context(options, description, domain)
+        fired = []
+        for key in ("prompt_natural_en", "prompt_natural_cn", "prompt_json_en", "prompt_json_cn"):
+            repaired, issues = cls.check(result.get(key, ""), context)
+            if issues:
+                result[key] = repaired
+                for issue in issues:
+                    issue['field'] = key
+                fired.extend(issues)
+        return fired
@@ -0,0 +1,205 @@
+"""
+元素上下文打包 - 在 token 预算内挑选上下文片段
+- 每个候选片段（类别样本、匹配选项的元素）估算 token 开销，按相关度计算收益
+- 同一段落内入选的片段收益递减，段落标题的开销只在段落有片段入选时计入
+- 分组背包：每个段落选一个片段子集，帕累托前沿动态规划求收益最大的组合
+- 片段之间重叠的短语（相同或被包含）只保留在相关度更高的片段中
+"""
+
+import re
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+from .similarity import normalize
+from .tokens import estimate_tokens
+
+# 同一段落内第 n 个入选片段的收益系数
+SNIPPET_DECAY = (1.0, 0.6, 0.4, 0.3, 0.25)
+# 每个段落参与挑选的最多候选数（子集枚举 2^n）
+MAX_SECTION_CANDIDATES = 5
+
+# 短语分隔符（保留分隔符以便原样拼回）
+_PHRASE_SPLIT_RE = re.compile(r'(\s*[,，;；、。]\s*)')
+_CJK_RE = re.compile(r'[一-鿿]')
+
+
+class ContextSection:
+    """上下文段落：标题前缀 + 以分隔符连接的片段"""
+
+    def __init__(self, prefix: str, separator: str, required: bool = False):
+        self.prefix = prefix
+        self.separator = separator
+        self.required = required
+        # [(文本, 相关度, 标签)]
+        self.snippets: List[Tuple[str, float, str]] = []
+
+    def add(self, text: str, relevance: float = 1.0, label: str = ""):
+        if text and len(self.snippets) < MAX_SECTION_CANDIDATES:
+            self.snippets.append((text, relevance, label))
+
+    def render(self, snippets) -> str:
+        parts = [f"{label}: {text}" if label else text for text, _, label in snippets]
+        return self.prefix + self.separator.join(parts)
+
+    def value(self, snippets) -> float:
+        relevances = sorted((relevance for _, relevance, _ in snippets), reverse=True)
+        return sum(r * SNIPPET_DECAY[min(i, len(SNIPPET_DECAY) - 1)] for i, r in enumerate(relevances))
+
+
+class ContextPacker:
+    """
+    按 token 预算打包元素上下文
+
+    用法：
+        packer = ContextPacker(400)
+        section = packer.section("【poses】: ", "; ")
+        section.add(template, relevance)
+        context = packer.pack()
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.sections: List[ContextSection] = []
+
+    def section(self, prefix: str, separator: str, required: bool = False) -> ContextSection:
+        section = ContextSection(prefix, separator, required)
+        self.sections.append(section)
+        return section
+
+    def pack(self) -> str:
+        self._dedupe_phrases()
+
+        chosen = {}
+        remaining = self.budget
+        for index, section in enumerate(self.sections):
+            if section.required and section.snippets:
+                chosen[index] = list(section.snippets)
+                remaining -= estimate_tokens(section.render(section.snippets)) + 1
+
+        groups = [
+            (index, self._options(section))
+            for index, section in enumerate(self.sections)
+            if not section.required and section.snippets
+        ]
+        for index, snippets in self._knapsack(groups, remaining):
+            chosen[index] = snippets
+
+        # 各段落分别估算有取整误差，超出预算时去掉单位 token 收益最低的片段
+        context = self._render(chosen)
+        while estimate_tokens(context) > self.budget and self._drop_weakest(chosen):
+            context = self._render(chosen)
+        return context
+
+    def _render(self, chosen: dict) -> str:
+        return '\n'.join(
+            section.render(chosen[index])
+            for index, section in enumerate(self.sections)
+            if chosen.get(index)
+        )
+
+    def _options(self, section: ContextSection) -> List[Tuple[int, float, list]]:
+        """段落的全部非空片段子集 [(token 开销, 收益, 片段)]"""
+        options = []
+        for size in range(1, len(section.snippets) + 1):
+            for subset in combinations(section.snippets, size):
+                subset = list(subset)
+                cost = estimate_tokens(section.render(subset)) + 1  # 段落之间的换行
+                options.append((cost, section.value(subset), subset))
+        return options
+
+    @staticmethod
+    def _pareto(states):
+        """按开销升序只保留收益严格递增的状态 (开销, 收益, ...)"""
+        frontier = []
+        for state in sorted(states, key=lambda state: (state[0], -state[1])):
+            if not frontier or state[1] > frontier[-1][1]:
+                frontier.append(state)
+        return frontier
+
+    @classmethod
+    def _knapsack(cls, groups, capacity: int) -> List[Tuple[int, list]]:
+        """
+        分组背包：每组至多选一个选项，总开销不超过 capacity 时收益最大
+
+        组内选项与全局状态都只保留帕累托前沿（开销更高的状态收益也必须更高）
+        """
+        # 状态 (开销, 收益, 选择链)，选择链为 (上一个选择链, (段落序号, 片段)) 形式的链表
+        frontier = [(0, 0.0, None)]
+        for index, options in groups:
+            options = cls._pareto(options)
+            best = {cost: (cost, value, picks) for cost, value, picks in frontier}
+            for cost, value, picks in frontier:
+                for option_cost, option_value, snippets in options:
+                    total = cost + option_cost
+                    if total > capacity:
+                        break
+                    if total not in best or value + option_value > best[total][1]:
+                        best[total] = (total, value + option_value, (picks, (index, snippets)))
+            frontier = cls._pareto(best.values())
+
+        picks = max(frontier, key=lambda state: state[1])[2]
+        chosen = []
+        while picks:
+            picks, pick = picks
+            chosen.append(pick)
+        return chosen[::-1]
+
+    def _drop_weakest(self, chosen: dict) -> bool:
+        weakest = None
+        for index, snippets in chosen.items():
+            if self.sections[index].required:
+                continue
+            for snippet in snippets:
+                density = snippet[1] / max(1, estimate_tokens(snippet[0]))
+                if weakest is None or density < weakest[0]:
+                    weakest = (density, index, snippet)
+        if weakest is None:
+            return False
+        _, index, snippet = weakest
+        chosen[index].remove(snippet)
+        return True
+
+    def _dedupe_phrases(self):
+        """按相关度从高到低处理全部片段，去掉已在更相关片段中出现（相同或被包含）的短语"""
+        order = sorted(
+            ((section, i) for section in self.sections for i in range(len(section.snippets))),
+            key=lambda item: (not item[0].required, -item[0].snippets[item[1]][1])
+        )
+        seen: List[str] = []
+        removed = []
+        for section, i in order:
+            text, relevance, label = section.snippets[i]
+            deduped = _strip_seen_phrases(text, seen)
+            if deduped is None:
+                removed.append((section, i))
+            elif deduped != text:
+                section.snippets[i] = (deduped, relevance, label)
+        for section, i in sorted(removed, key=lambda item: -item[1]):
+            del section.snippets[i]
+
+
+def _contained(phrase: str, seen: List[str]) -> bool:
+    if _CJK_RE.search(phrase):
+        return any(phrase in other for other in seen)
+    padded = f" {phrase} "
+    return any(padded in f" {other} " for other in seen)
+
+
+def _strip_seen_phrases(text: str, seen: List[str]) -> Optional[str]:
+    """去掉 text 中已出现过的短语并记录新短语；全部重复时返回 None"""
+    parts = _PHRASE_SPLIT_RE.split(text)
+    phrases, separators = parts[0::2], parts[1::2] + [""]
+    kept = []
+    for phrase, separator in zip(phrases, separators):
+        key = normalize(phrase)
+        if not key:
+            continue
+        if _contained(key, seen):
+            continue
+        seen.append(key)
+        kept.append((phrase, separator))
+    if not kept:
+        return None
+    if len(kept) == len([p for p in phrases if normalize(p)]):
+        return text
+    return ''.join(phrase + separator for phrase, separator in kept[:-1]) + kept[-1][0]
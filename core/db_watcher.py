@@ -0,0 +1,67 @@
+"""
+元素库热更新 - 后台检测 data/elements.db 的变化并重建内存索引
+ComfyUI 运行期间向元素库添加元素后无需重启：
+检测到文件变化且稳定一个检查周期后，在后台线程构建新索引并原子替换
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from .element_index import db_fingerprint, reload_element_snapshot
+
+_watchers: Dict[str, "DbWatcher"] = {}
+_watchers_lock = threading.Lock()
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m")
+
+
+class DbWatcher(threading.Thread):
+    """轮询数据库文件指纹的守护线程"""
+
+    def __init__(self, db_path: str, interval: float = 2.0):
+        super().__init__(name="skill-prompt-db-watcher", daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        last_seen = db_fingerprint(self.db_path)
+        while not self._stop_event.wait(self.interval):
+            fingerprint = db_fingerprint(self.db_path)
+            if fingerprint != last_seen:
+                # 仍在写入：等文件稳定一个周期再重建
+                last_seen = fingerprint
+                continue
+            try:
+                self.check()
+            except Exception as e:
+                _log(f"元素库重新加载失败（保留当前索引）: {type(e).__name__}: {e}")
+
+    def check(self) -> bool:
+        """检查一次，数据库有变化时重建索引；返回是否重建"""
+        start = time.perf_counter()
+        snapshot = reload_element_snapshot(self.db_path)
+        if snapshot is None:
+            return False
+        _log(
+            f"元素库已更新，索引已重建 ({snapshot.index.element_count} 个元素, "
+            f"第 {snapshot.generation} 版, {(time.perf_counter() - start) * 1000:.0f}ms)"
+        )
+        return True
+
+
+def start_db_watcher(db_path: str, interval: float = 2.0) -> Optional[DbWatcher]:
+    """启动（每个数据库一个）热更新线程"""
+    with _watchers_lock:
+        watcher = _watchers.get(db_path)
+        if watcher is None or not watcher.is_alive():
+            watcher = DbWatcher(db_path, interval)
+            watcher.start()
+            _watchers[db_path] = watcher
+    return watcher
@@ -126,13 +126,14 @@ class DesignVariables:
         return list(cls.STYLE_KEYWORDS.keys())
 
     @classmethod
-    def sample_color_palette(cls, style: str, lang: str = "en") -> Optional[Dict]:
+    def sample_color_palette(cls, style: str, lang: str = "en", rng: random.Random = None) -> Optional[Dict]:
         """
         随机采样一个配色方案
         
         Args:
             style: 风格名称
             lang: 语言 ("en" 或 "cn")
+            rng: 随机数生成器（传入带种子的 random.Random 可复现结果，默认使用全局随机）
         
         Returns:
             {"palette_name": "珊瑚粉色系", "colors": ["peach pink", ...]}
@@ -140,8 +141,9 @@ class DesignVariables:
         if style not in cls.COLOR_PALETTES:
             return None
         
+        rng = rng or random
         palettes = cls.COLOR_PALETTES[style]
-        palette_name = random.choice(list(palettes.keys()))
+        palette_name = rng.choice(list(palettes.keys()))
         colors = palettes[palette_name].get(lang, [])
         
         return {
@@ -183,13 +185,14 @@ class DesignVariables:
         return result
 
     @classmethod
-    def build_context(cls, style: str, lang: str = "en") -> str:
+    def build_context(cls, style: str, lang: str = "en", rng: random.Random = None) -> str:
         """
         构建设计上下文字符串，用于增强 LLM 提示词
         
         Args:
             style: 风格名称
             lang: 语言
+            rng: 随机数生成器（默认使用全局随机）
         
         Returns:
             格式化的上下文字符串
@@ -200,7 +203,7 @@ class DesignVariables:
         parts = []
         
         # 1. 配色参考
-        palette = cls.sample_color_palette(style, lang)
+        palette = cls.sample_color_palette(style, lang, rng)
         if palette:
             colors_str = ", ".join(palette["colors"][:4])
             if lang == "en":
@@ -231,13 +234,14 @@ class DesignVariables:
         return "\n".join(parts)
 
     @classmethod
-    def build_prompt_enhancement(cls, style: str, lang: str = "en") -> str:
+    def build_prompt_enhancement(cls, style: str, lang: str = "en", rng: random.Random = None) -> str:
         """
         构建直接可用的提示词增强片段
         
         Args:
             style: 风格名称
             lang: 语言
+            rng: 随机数生成器（默认使用全局随机）
         
         Returns:
             逗号分隔的提示词片段
@@ -245,25 +249,26 @@ class DesignVariables:
         if style not in cls.STYLE_KEYWORDS:
             return ""
         
+        rng = rng or random
         fragments = []
         
         # 采样配色
-        palette = cls.sample_color_palette(style, lang)
+        palette = cls.sample_color_palette(style, lang, rng)
         if palette and palette["colors"]:
             fragments.append(f"{palette['colors'][0]} color scheme")
         
         # 采样氛围词
         keywords = cls.get_style_keywords(style, lang)
         if keywords.get("atmosphere"):
-            fragments.extend(random.sample(keywords["atmosphere"], min(2, len(keywords["atmosphere"]))))
+            fragments.extend(rng.sample(keywords["atmosphere"], min(2, len(keywords["atmosphere"]))))
         
         # 采样光影
         if keywords.get("lighting"):
-            fragments.append(random.choice(keywords["lighting"]))
+            fragments.append(rng.choice(keywords["lighting"]))
         
         # 采样装饰
         if keywords.get("decoration"):
-            decorations = random.sample(keywords["decoration"], min(2, len(keywords["decoration"])))
+            decorations = rng.sample(keywords["decoration"], min(2, len(keywords["decoration"])))
             fragments.append(f"decorated with {' and '.join(decorations)}")
         
         return ", ".join(fragments)
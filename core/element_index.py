@@ -0,0 +1,259 @@
+"""
+元素索引 - 元素库的内存索引
+将元素的关键词、名称映射到类别，用于本地短语分类
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .knowledge_base import KnowledgeBase
+
+# 英文分词
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+# 纯中文片段
+_CN_TERM_RE = re.compile(r'^[一-鿿]{2,8}$')
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'with', 'in', 'on', 'at', 'to', 'for',
+    'by', 'from', 'as', 'is', 'are', 'very', 'style', 'look', 'effect',
+}
+
+# 不参与索引的领域（写作技巧类元素不是画面内容）
+_EXCLUDED_DOMAINS = ('prompt_writing',)
+# 非画面内容的内部类别（用法索引、扩展规划等）
+NON_CONTENT_CATEGORIES = ('usage_index', 'expansion_roadmap')
+
+# 按 (领域, 类别, 复用分) 的复合索引：分类别取前 N 个元素时只扫描索引
+# （随元素库发布；其他元素库由 compact_elements 或首次连接时创建）
+CONTEXT_INDEX_NAME = "idx_elements_domain_category_score"
+CONTEXT_INDEX_SQL = f"""
+    CREATE INDEX IF NOT EXISTS {CONTEXT_INDEX_NAME}
+    ON elements(domain_id, category_id, reusability_score DESC)
+"""
+
+
+def _words(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+
+class ElementIndex:
+    """元素库内存索引（构建后只读，可在线程间共享）"""
+
+    def __init__(self, rows: Iterable[Dict]):
+        phrase_votes = defaultdict(Counter)   # 关键词短语 → 类别计数
+        word_votes = defaultdict(Counter)     # 单词 → 类别计数
+        cn_votes = defaultdict(Counter)       # 中文词 → 类别计数
+        self.element_count = 0
+
+        for row in rows:
+            self.element_count += 1
+            category = KnowledgeBase.canonical_category(row['category_id'])
+            for keyword in self._parse_keywords(row.get('keywords')):
+                if _CN_TERM_RE.match(keyword):
+                    cn_votes[keyword][category] += 1
+                    continue
+                key = ' '.join(_words(keyword))
+                if not key:
+                    continue
+                phrase_votes[key][category] += 1
+                for word in key.split():
+                    word_votes[word][category] += 1
+
+            chinese_name = (row.get('chinese_name') or '').strip()
+            if _CN_TERM_RE.match(chinese_name):
+                cn_votes[chinese_name][category] += 1
+
+        # 每个短语只保留票数最多的类别
+        self.phrase_categories = {k: c.most_common(1)[0][0] for k, c in phrase_votes.items()}
+        self.cn_categories = {k: c.most_common(1)[0][0] for k, c in cn_votes.items()}
+        # 单词按类别分布归一化，出现在越多类别中的词权重越低
+        self.word_weights = {
+            word: {cat: n / sum(c.values()) / len(c) for cat, n in c.items()}
+            for word, c in word_votes.items()
+        }
+        self.max_phrase_words = max((k.count(' ') + 1 for k in self.phrase_categories), default=1)
+        self.max_cn_len = max((len(k) for k in self.cn_categories), default=2)
+
+    @staticmethod
+    def _parse_keywords(raw) -> List[str]:
+        if not raw:
+            return []
+        try:
+            keywords = json.loads(raw)
+        except (TypeError, ValueError):
+            return []
+        if not isinstance(keywords, list):
+            return []
+        return [str(k).strip() for k in keywords if k]
+
+    @classmethod
+    def from_db(cls, db_path: str) -> 'ElementIndex':
+        """从数据库构建索引"""
+        if not os.path.exists(db_path):
+            return cls([])
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            domains = ','.join('?' * len(_EXCLUDED_DOMAINS))
+            categories = ','.join('?' * len(NON_CONTENT_CATEGORIES))
+            cursor = conn.execute(f"""
+                SELECT category_id, chinese_name, keywords
+                FROM elements
+                WHERE domain_id NOT IN ({domains}) AND category_id NOT IN ({categories})
+            """, _EXCLUDED_DOMAINS + NON_CONTENT_CATEGORIES)
+            return cls(dict(row) for row in cursor.fetchall())
+        finally:
+            conn.close()
+
+    # =========================================================================
+    # 分类
+    # =========================================================================
+
+    def classify(self, phrase: str, lang: str = "en") -> Optional[str]:
+        """返回短语最可能所属的元素类别，无法判断时返回 None"""
+        if lang == "cn":
+            return self._classify_cn(phrase)
+        return self._classify_en(phrase)
+
+    def classify_confident(self, phrase: str, lang: str = "en") -> Tuple[Optional[str], float]:
+        """
+        返回 (类别, 置信度)
+
+        英文关键词短语命中时置信度为 1.0，单词投票时为支持该类别的单词占比；
+        中文为命中词占短语长度的比例
+        """
+        if lang == "cn":
+            text = phrase.strip()
+            for size in range(min(self.max_cn_len, len(text)), 1, -1):
+                for start in range(len(text) - size + 1):
+                    category = self.cn_categories.get(text[start:start + size])
+                    if category:
+                        return category, size / len(text)
+            return None, 0.0
+
+        words = _words(phrase)
+        category = self._classify_en(phrase)
+        if not category:
+            return None, 0.0
+        for size in range(min(self.max_phrase_words, len(words)), 1, -1):
+            for start in range(len(words) - size + 1):
+                if self.phrase_categories.get(' '.join(words[start:start + size])) == category:
+                    return category, 1.0
+        support = sum(1 for word in words if category in self.word_weights.get(word, {}))
+        return category, support / len(words)
+
+    def _classify_en(self, phrase: str) -> Optional[str]:
+        words = _words(phrase)
+        if not words:
+            return None
+
+        # 1. 关键词短语最长匹配
+        for size in range(min(self.max_phrase_words, len(words)), 1, -1):
+            for start in range(len(words) - size + 1):
+                category = self.phrase_categories.get(' '.join(words[start:start + size]))
+                if category:
+                    return category
+
+        # 2. 单词加权投票
+        scores = Counter()
+        for word in words:
+            for category, weight in self.word_weights.get(word, {}).items():
+                scores[category] += weight
+        if scores:
+            return scores.most_common(1)[0][0]
+        return None
+
+    def _classify_cn(self, phrase: str) -> Optional[str]:
+        # 中文最长子串匹配
+        text = phrase.strip()
+        for size in range(min(self.max_cn_len, len(text)), 1, -1):
+            for start in range(len(text) - size + 1):
+                category = self.cn_categories.get(text[start:start + size])
+                if category:
+                    return category
+        return None
+
+
+def db_fingerprint(db_path: str) -> tuple:
+    """
+    数据库文件指纹（主文件与 WAL 文件的修改时间、大小），内容变化时指纹随之变化
+
+    文件不存在时返回空元组
+    """
+    fingerprint = ()
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        fingerprint += (stat.st_mtime_ns, stat.st_size)
+    return fingerprint
+
+
+class ElementSnapshot:
+    """某一版本元素库的只读快照（索引构建完成后才对外可见）"""
+
+    def __init__(self, db_path: str, fingerprint: tuple, generation: int, index: ElementIndex):
+        self.db_path = db_path
+        self.fingerprint = fingerprint
+        self.generation = generation
+        self.index = index
+
+
+_SNAPSHOTS: Dict[str, ElementSnapshot] = {}
+_INDEX_LOCK = threading.Lock()
+# 串行化构建（首次构建与重建），避免同一数据库并发重复构建；已有快照的读取不经过此锁
+_BUILD_LOCK = threading.Lock()
+
+
+def _build_snapshot(db_path: str, generation: int) -> ElementSnapshot:
+    # 先取指纹再读库：读库期间若有写入，下次检查时指纹不一致会再次重建
+    fingerprint = db_fingerprint(db_path)
+    return ElementSnapshot(db_path, fingerprint, generation, ElementIndex.from_db(db_path))
+
+
+def get_element_snapshot(db_path: str) -> ElementSnapshot:
+    """获取指定数据库的当前快照（首次调用时构建）"""
+    snapshot = _SNAPSHOTS.get(db_path)
+    if snapshot is None:
+        with _BUILD_LOCK:
+            snapshot = _SNAPSHOTS.get(db_path)
+            if snapshot is None:
+                snapshot = _build_snapshot(db_path, 1)
+                with _INDEX_LOCK:
+                    _SNAPSHOTS[db_path] = snapshot
+    return snapshot
+
+
+def get_element_index(db_path: str) -> ElementIndex:
+    """获取（并缓存）指定数据库的元素索引"""
+    return get_element_snapshot(db_path).index
+
+
+def reload_element_snapshot(db_path: str, force: bool = False) -> Optional[ElementSnapshot]:
+    """
+    数据库发生变化时重建快照并原子替换
+
+    构建在 _BUILD_LOCK 内进行（串行化重建，并发的检查不会重复构建），但不持有读取快照用的
+    _INDEX_LOCK：新索引完整构建后才在 _INDEX_LOCK 内替换引用，构建期间 get_element_snapshot
+    仍立即返回旧快照，正在使用旧快照的生成不受影响
+
+    Returns:
+        新快照；数据库未变化时返回 None
+    """
+    with _BUILD_LOCK:
+        current = _SNAPSHOTS.get(db_path)
+        if current is None:
+            return None
+        if not force and db_fingerprint(db_path) == current.fingerprint:
+            return None
+        snapshot = _build_snapshot(db_path, current.generation + 1)
+        with _INDEX_LOCK:
+            _SNAPSHOTS[db_path] = snapshot
+    return snapshot
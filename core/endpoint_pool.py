@@ -0,0 +1,184 @@
+"""
+接口池 - 多个 OpenAI 兼容接口之间的负载均衡
+- 路由策略：最少在途请求（least_outstanding）或 EWMA 延迟（ewma）
+- 被动健康检查：连续失败达到阈值的接口被临时摘除
+- 粘性路由：相同提示词前缀优先发往同一接口，复用服务端前缀缓存
+"""
+
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+# 可以换接口重试的错误（接口本身不可用或过载）
+ENDPOINT_FAILURES = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+class Endpoint:
+    """单个接口及其运行状态"""
+
+    def __init__(self, base_url: str, api_key: str):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def snapshot(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "outstanding": self.outstanding,
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejected": not self.is_healthy(time.monotonic()),
+        }
+
+
+class EndpointPool:
+    """接口池（线程安全）"""
+
+    def __init__(
+        self,
+        endpoints: List[Dict],
+        strategy: str = "least_outstanding",
+        eject_failures: int = 3,
+        eject_seconds: float = 30.0,
+        sticky_slack: int = 2,
+        ewma_alpha: float = 0.3
+    ):
+        self.endpoints = [Endpoint(e["base_url"], e.get("api_key", "")) for e in endpoints]
+        self.strategy = strategy
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.sticky_slack = sticky_slack
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+
+    # =========================================================================
+    # 选择接口
+    # =========================================================================
+
+    def _cost(self, endpoint: Endpoint) -> tuple:
+        latency = endpoint.ewma_latency or 0.0
+        if self.strategy == "ewma":
+            return (latency * (endpoint.outstanding + 1), endpoint.outstanding)
+        return (endpoint.outstanding, latency)
+
+    @staticmethod
+    def _rendezvous(endpoint: Endpoint, affinity_key: str) -> int:
+        digest = hashlib.blake2b(f"{affinity_key}|{endpoint.base_url}".encode("utf-8"), digest_size=8)
+        return int.from_bytes(digest.digest(), "big")
+
+    def acquire(self, affinity_key: str = None, exclude: List[Endpoint] = ()) -> Endpoint:
+        """选择一个接口并计入在途请求"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude] or list(self.endpoints)
+            healthy = [e for e in candidates if e.is_healthy(now)]
+            if not healthy:
+                # 全部被摘除时选择最早恢复的接口（失败开放）
+                healthy = [min(candidates, key=lambda e: e.ejected_until)]
+
+            chosen = min(healthy, key=self._cost)
+            if affinity_key:
+                # 最高随机权重哈希：接口增减时只迁移少量键
+                sticky = max(healthy, key=lambda e: self._rendezvous(e, affinity_key))
+                if sticky.outstanding <= chosen.outstanding + self.sticky_slack:
+                    chosen = sticky
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, endpoint: Endpoint, latency: float, ok: bool):
+        """请求结束，更新延迟与健康状态"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.consecutive_failures = 0
+                if endpoint.ewma_latency is None:
+                    endpoint.ewma_latency = latency
+                else:
+                    endpoint.ewma_latency += self.ewma_alpha * (latency - endpoint.ewma_latency)
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.eject_failures:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.consecutive_failures = 0
+
+    # =========================================================================
+    # 调用
+    # =========================================================================
+
+    def call(self, func: Callable[[Endpoint], Dict], affinity_key: str = None, max_attempts: int = None):
+        """
+        在池中执行一次调用；接口不可用时换下一个接口重试
+
+        Args:
+            func: 以 Endpoint 为参数的调用
+            affinity_key: 粘性路由键（相同键优先同一接口）
+            max_attempts: 最多尝试的接口数（默认为池大小）
+        """
+        attempts = max_attempts or len(self.endpoints)
+        tried = []
+        while True:
+            endpoint = self.acquire(affinity_key, exclude=tried)
+            start = time.monotonic()
+            try:
+                result = func(endpoint)
+            except ENDPOINT_FAILURES:
+                self.release(endpoint, time.monotonic() - start, ok=False)
+                tried.append(endpoint)
+                if len(tried) >= attempts:
+                    raise
+                continue
+            except Exception:
+                # 请求本身的错误（如参数错误）不计入接口健康
+                self.release(endpoint, time.monotonic() - start, ok=True)
+                raise
+            self.release(endpoint, time.monotonic() - start, ok=True)
+            return result
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
+
+
+_POOLS: Dict[str, EndpointPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_endpoint_pool(model: str) -> Optional[EndpointPool]:
+    """按模型获取 config.ENDPOINT_POOLS 中配置的接口池（"*" 为所有模型的默认池）"""
+    from ..config import (
+        ENDPOINT_POOLS, ENDPOINT_ROUTING, ENDPOINT_EJECT_FAILURES,
+        ENDPOINT_EJECT_SECONDS, ENDPOINT_STICKY_SLACK
+    )
+
+    key = model if model in ENDPOINT_POOLS else "*"
+    endpoints = ENDPOINT_POOLS.get(key)
+    if not endpoints:
+        return None
+
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = EndpointPool(
+                endpoints,
+                strategy=ENDPOINT_ROUTING,
+                eject_failures=ENDPOINT_EJECT_FAILURES,
+                eject_seconds=ENDPOINT_EJECT_SECONDS,
+                sticky_slack=ENDPOINT_STICKY_SLACK
+            )
+            _POOLS[key] = pool
+    return pool
@@ -3,6 +3,9 @@
 用于增强 LLM 生成的准确性和一致性
 """
 
+import re
+from typing import List, Optional
+
 
 class KnowledgeBase:
     """常识知识库"""
@@ -63,6 +66,82 @@ class KnowledgeBase:
         }
     }
 
+    # 风格 → 冲突光影词及替换词（风格与光影匹配规则）
+    STYLE_LIGHTING_CONFLICTS = {
+        'cinematic': {
+            'conflicts': ['flat lighting', 'flat light', 'even lighting'],
+            'replacement': 'cinematic lighting',
+        },
+        'zhang_yimou': {
+            'conflicts': ['flat lighting', 'flat light', 'even lighting'],
+            'replacement': 'dramatic shadows',
+        },
+        'wong_kar_wai': {
+            'conflicts': ['flat lighting', 'flat light', 'even lighting'],
+            'replacement': 'moody lighting',
+        },
+        'tsui_hark': {
+            'conflicts': ['flat lighting', 'flat light', 'even lighting'],
+            'replacement': 'dynamic lighting',
+        },
+        'film_noir': {
+            'conflicts': ['flat lighting', 'flat light', 'even lighting', 'high key lighting', 'bright even light'],
+            'replacement': 'low key lighting',
+        },
+        'natural': {
+            'conflicts': ['dramatic shadows', 'harsh shadows', 'chiaroscuro', 'low key lighting', 'neon glow'],
+            'replacement': 'soft natural light',
+        },
+    }
+
+    # 时代识别关键词
+    ERA_KEYWORDS = {
+        'ancient': ['古装', '古代', '古风', '汉服', '武侠', '仙侠', '宫廷', '朝代',
+                    'ancient', 'hanfu', 'wuxia', 'dynasty', 'period drama'],
+        'modern': ['现代', '都市', '职业', '商务', '当代', 'modern', 'contemporary', 'urban', 'office'],
+    }
+
+    # 时代 → 冲突服装词及替换词（时代与服装一致规则）
+    ERA_CLOTHING_CONFLICTS = {
+        'ancient': {
+            'conflicts': {
+                'en': ['business suit', 'suit and tie', 'jeans', 'sneakers', 't-shirt', 'hoodie',
+                       'modern clothing', 'modern outfit', 'contemporary clothing', 'contemporary outfit'],
+                'cn': ['西装', '牛仔裤', '运动鞋', 'T恤', '卫衣', '现代服装'],
+            },
+            'replacement': {'en': 'traditional period costume', 'cn': '传统古装'},
+        },
+        'modern': {
+            'conflicts': {
+                'en': ['ancient robe', 'period costume', 'traditional period costume'],
+                'cn': ['古装', '古代长袍'],
+            },
+            'replacement': {'en': 'modern contemporary clothing', 'cn': '现代服装'},
+        },
+    }
+
+    # 人种识别关键词（用于从描述中推断人种；英文按整词匹配，同一位置优先匹配较长的词）
+    ETHNICITY_HINTS = {
+        'East_Asian': ['东亚', '中国', '日本', '韩国', '亚洲', 'east asian', 'chinese', 'japanese', 'korean'],
+        'Southeast_Asian': ['东南亚', '泰国', '越南', 'southeast asian', 'thai', 'vietnamese'],
+        'South_Asian': ['南亚', '印度', 'south asian', 'indian'],
+        'African': ['非洲', '黑人', 'african'],
+        'Middle_Eastern': ['中东', '阿拉伯', 'middle eastern', 'arab'],
+        'Latin_American': ['拉美', '拉丁', 'latin american', 'latina', 'latino'],
+        'European': ['欧美', '欧洲', '白人', 'european', 'caucasian'],
+    }
+
+    # 涉及人物的领域与选项：只有涉及人物时才从描述推断人种（"Chinese ink painting" 不是人物）
+    PERSON_DOMAINS = ('portrait',)
+    PERSON_OPTION_KEYS = ('ethnicity', 'gender', 'subject')
+
+    # 颜色中英对照（眼睛/发色规则的中文匹配与替换）
+    COLOR_NAMES_CN = {
+        'black': '黑', 'dark brown': '深棕', 'brown': '棕', 'blue': '蓝', 'green': '绿',
+        'hazel': '榛', 'grey': '灰', 'violet': '紫', 'amber': '琥珀',
+        'blonde': '金', 'red': '红', 'auburn': '赤褐', 'silver': '银', 'pink': '粉', 'platinum': '铂金',
+    }
+
     # 领域 → 核心元素类别
     DOMAIN_CATEGORIES = {
         'portrait': [
@@ -89,6 +168,32 @@ class KnowledgeBase:
         ]
     }
 
+    # 类别别名 → 规范类别 ID
+    # 统一元素库中漂移的类别 ID（单复数、领域前缀），以及 DOMAIN_CATEGORIES 中与元素库不一致的名称
+    CATEGORY_ALIASES = {
+        'hair_style': 'hair_styles',
+        'hairstyles': 'hair_styles',
+        'art_art_styles': 'art_styles',
+        'art_composition_concepts': 'composition_techniques',
+        'art_scene_settings': 'backgrounds',
+        'common_lighting_techniques': 'lighting_techniques',
+        'common_material_textures': 'material_textures',
+        'composition': 'composition_techniques',
+        'compositions': 'composition_techniques',
+        'composition_types': 'composition_techniques',
+        'color_palettes': 'color_schemes',
+        'layouts': 'layout_systems',
+        'layout_templates': 'layout_systems',
+        'arrangements': 'layout_systems',
+        'background_settings': 'backgrounds',
+        'graphic_elements': 'decorative_elements',
+        'materials': 'material_textures',
+        'textures': 'material_textures',
+        'lighting_setups': 'lighting_techniques',
+        'angles': 'camera_angles',
+        'effects': 'technical_effects',
+    }
+
     # 风格类型定义
     STYLE_TYPES = {
         'anime': {'type': 'art_style', 'affects': 'rendering', 'description': '动漫绘画风格'},
@@ -115,10 +220,83 @@ class KnowledgeBase:
         """获取导演风格信息"""
         return cls.DIRECTOR_LIGHTING_STYLES.get(style, {})
 
+    @classmethod
+    def detect_ethnicity(cls, options: dict, description: str = "", domain: str = None) -> Optional[str]:
+        """
+        从选项或描述推断人种键，无法判断时返回 None
+
+        选项中指定的人种总是生效；描述中的关键词只在领域或选项涉及人物时使用
+        """
+        ethnicity = (options or {}).get('ethnicity')
+        if ethnicity and ethnicity != '自动':
+            return cls._normalize_ethnicity(ethnicity)
+        if not cls.involves_person(options, domain):
+            return None
+
+        match = cls._ethnicity_pattern().search((description or "").lower())
+        if match:
+            return next(key for key, hints in cls.ETHNICITY_HINTS.items() if match.group(0) in hints)
+        return None
+
+    @classmethod
+    def involves_person(cls, options: dict, domain: str = None) -> bool:
+        """领域或选项是否涉及人物"""
+        if domain in cls.PERSON_DOMAINS:
+            return True
+        return any((options or {}).get(key) not in (None, '', '自动') for key in cls.PERSON_OPTION_KEYS)
+
+    @classmethod
+    def _ethnicity_pattern(cls):
+        """人种关键词的单一正则：按长度降序（"东南亚" 先于 "南亚"），英文两端为词边界（"arab" 不匹配 "arabesque"）"""
+        pattern = cls.__dict__.get('_ETHNICITY_RE')
+        if pattern is None:
+            terms = sorted({t for hints in cls.ETHNICITY_HINTS.values() for t in hints}, key=len, reverse=True)
+            pattern = cls._ETHNICITY_RE = re.compile(
+                '|'.join(rf'\b{re.escape(t)}\b' if t.isascii() else re.escape(t) for t in terms)
+            )
+        return pattern
+
+    @classmethod
+    def detect_styles(cls, options: dict) -> List[str]:
+        """从选项中提取已知风格键（style/lighting 均可能携带风格）"""
+        styles = []
+        for field in ('style', 'lighting'):
+            value = (options or {}).get(field)
+            if value and value != '自动':
+                key = cls._normalize_style(value)
+                if key in cls.STYLE_LIGHTING_CONFLICTS and key not in styles:
+                    styles.append(key)
+        return styles
+
+    @classmethod
+    def detect_era(cls, options: dict, description: str = "") -> Optional[str]:
+        """从描述和选项推断时代；古代优先，两者都无法判断时返回 None"""
+        text = ' '.join([description or ""] + [str(v) for v in (options or {}).values() if v]).lower()
+        for era in ('ancient', 'modern'):
+            if any(keyword in text for keyword in cls.ERA_KEYWORDS[era]):
+                return era
+        return None
+
     @classmethod
     def get_domain_categories(cls, domain: str) -> list:
-        """获取领域的核心类别列表"""
-        return cls.DOMAIN_CATEGORIES.get(domain, [])
+        """获取领域的核心类别列表（规范类别 ID）"""
+        categories = []
+        for category in cls.DOMAIN_CATEGORIES.get(domain, []):
+            category = cls.canonical_category(category)
+            if category not in categories:
+                categories.append(category)
+        return categories
+
+    @classmethod
+    def canonical_category(cls, category: str) -> str:
+        """类别 ID → 规范类别 ID"""
+        return cls.CATEGORY_ALIASES.get(category, category)
+
+    @classmethod
+    def category_variants(cls, category: str) -> List[str]:
+        """规范类别及所有映射到它的别名（用于查询未压缩的元素库）"""
+        canonical = cls.canonical_category(category)
+        return [canonical] + [alias for alias, target in cls.CATEGORY_ALIASES.items() if target == canonical]
 
     @classmethod
     def build_constraints_prompt(cls, options: dict) -> str:
@@ -170,5 +348,7 @@ class KnowledgeBase:
             '王家卫': 'wong_kar_wai',
             '徐克': 'tsui_hark',
             '黑色电影': 'film_noir',
+            '自然光': 'natural',
+            '自然': 'natural',
         }
         return mapping.get(value, value)
@@ -0,0 +1,433 @@
+"""
+增量元素学习 - 从待学习的提示词中提取候选元素并写入元素库
+- 来源：source_prompts 中 learning_status = 'pending' 的提示词，以及新增的 generated_prompts
+- 提取：短语切分后用元素索引在本地分类；本地无法分类的短语可批量交给 LLM 判断
+- 去重：与同类别已有 ai_prompt_template 做字符 n-gram Jaccard 比较
+- 写入：每批一个事务，元素插入与状态更新同时提交或同时回滚
+- 运行：独立的低优先级工作进程（scripts/learn_elements.py），不与交互式生成争抢资源
+"""
+
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .element_index import ElementIndex, NON_CONTENT_CATEGORIES
+from .knowledge_base import KnowledgeBase
+from .similarity import NearDuplicateIndex, DUPLICATE_THRESHOLD
+from .response_parser import strip_code_fence
+from .model_profiles import ModelProfiles
+
+LEARNER_SOURCE = "incremental_learner"
+# 本地分类的最低置信度（低于该值交给 LLM 或丢弃）
+MIN_LOCAL_CONFIDENCE = 0.6
+# 自动学习的元素复用分上限（不超过人工整理的元素）
+LEARNED_SCORE_CAP = 7.0
+DEFAULT_LEARNED_SCORE = 6.0
+# 每次 LLM 分类请求的短语数
+LLM_BATCH_SIZE = 40
+
+_PHRASE_SPLIT_RE = re.compile(r'[,，。；;、\n!?！？]+')
+_PLACEHOLDER_RE = re.compile(r'\[[^\]]*\]|\{[^}]*\}|【[^】]*】')
+_LIST_MARK_RE = re.compile(r'^(?:\d+[.、)]|[-*•])\s*')
+# JSON 片段中的键（"lighting": "..."）与句首连接词
+_JSON_KEY_RE = re.compile(r'^.*["\']\s*:\s*["\']?')
+_LEADING_CONJUNCTION_RE = re.compile(r'^(?:and|or|with|plus)\s+', re.IGNORECASE)
+# 指令、说明类片段（不是画面元素）
+_INSTRUCTION_RE = re.compile(
+    r'^(?:you|your|please|make sure|do not|don\'t|no |if |ensure|avoid|use |output|generate)'
+    r'|^(?:你|请|如果|必须|不要|确保|任务|要求|注意|输出|生成|根据)',
+    re.IGNORECASE
+)
+_CJK_RE = re.compile(r'[一-鿿]')
+_NAME_RE = re.compile(r'[^0-9a-z一-鿿]+')
+# source_prompts 原文的正文标记（之前为标题、作者等元信息）
+_BODY_MARKER = "提示词:"
+
+
+def extract_prompt_body(text: str) -> str:
+    """去掉 source_prompts 原文中的元信息头，只保留提示词正文"""
+    if _BODY_MARKER in text:
+        text = text.split(_BODY_MARKER, 1)[1]
+    return "\n".join(line for line in text.splitlines() if not line.strip().startswith("==="))
+
+
+def split_candidate_phrases(text: str) -> List[Tuple[str, str]]:
+    """切分候选短语，返回 [(短语, 语言)]；过长、过短或只有占位符的片段被丢弃"""
+    phrases = []
+    for raw in _PHRASE_SPLIT_RE.split(text or ""):
+        phrase = _JSON_KEY_RE.sub("", raw)
+        phrase = _LIST_MARK_RE.sub("", phrase.strip(" \t\"'“”‘’:：()（）"))
+        phrase = _PLACEHOLDER_RE.sub("", phrase).strip(" \t\"'“”‘’:：()（）")
+        phrase = _LEADING_CONJUNCTION_RE.sub("", phrase)
+        if not phrase or "{" in phrase or "}" in phrase or _INSTRUCTION_RE.match(phrase):
+            continue
+        cjk = len(_CJK_RE.findall(phrase))
+        if cjk > len(phrase) * 0.3:
+            if 4 <= len(phrase) <= 30:
+                phrases.append((phrase, "cn"))
+        elif 2 <= len(phrase.split()) <= 12 and len(phrase) <= 100:
+            phrases.append((phrase, "en"))
+    return phrases
+
+
+class LLMPhraseClassifier:
+    """批量 LLM 短语分类（本地无法判断的短语）"""
+
+    def __init__(self, base_url: str, api_key: str, model: str, batch_size: int = LLM_BATCH_SIZE):
+        from .llm_client import get_openai_client
+        self.client = get_openai_client(base_url, api_key)
+        self.model = model
+        self.batch_size = batch_size
+
+    def classify(self, phrases: List[str], categories: List[str]) -> List[Optional[str]]:
+        """返回与 phrases 对齐的类别列表，无法归类或不是画面元素时为 None"""
+        results: List[Optional[str]] = []
+        for start in range(0, len(phrases), self.batch_size):
+            results.extend(self._classify_batch(phrases[start:start + self.batch_size], categories))
+        return results
+
+    def _classify_batch(self, phrases: List[str], categories: List[str]) -> List[Optional[str]]:
+        system_prompt = (
+            "你是图像提示词元素分类器。判断每个编号短语属于哪个类别（只能从给定类别中选择）；"
+            "不是可复用的画面描述元素（如指令、说明、排版要求）时为 null。\n"
+            '只输出一个 JSON 对象，键为编号，值为类别或 null，例如 {"1": "poses", "2": null}'
+        )
+        user_prompt = "类别：" + ", ".join(categories) + "\n\n短语：\n" + "\n".join(
+            f"{i}. {phrase}" for i, phrase in enumerate(phrases, 1)
+        )
+
+        profile = ModelProfiles.get(self.model)
+        params = {}
+        if profile["temperature"] is not None:
+            params["temperature"] = 0
+        if profile["max_output_tokens"] is not None:
+            params["max_tokens"] = min(
+                profile["max_output_tokens"], 16 * len(phrases) + 64 + profile["reasoning_tokens"]
+            )
+
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            **params
+        )
+        try:
+            mapping = json.loads(strip_code_fence(response.choices[0].message.content or ""))
+        except ValueError:
+            return [None] * len(phrases)
+        if not isinstance(mapping, dict):
+            return [None] * len(phrases)
+
+        allowed = set(categories)
+        labels = []
+        for i in range(1, len(phrases) + 1):
+            label = mapping.get(str(i))
+            labels.append(label if label in allowed else None)
+        return labels
+
+
+class ElementLearner:
+    """增量元素学习器"""
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 20,
+        classifier: LLMPhraseClassifier = None,
+        threshold: float = DUPLICATE_THRESHOLD
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.classifier = classifier
+        self.threshold = threshold
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS learner_state (
+                source TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.commit()
+        return conn
+
+    # =========================================================================
+    # 读取
+    # =========================================================================
+
+    def _fetch_pending(self, conn) -> List[Dict]:
+        """取一批待学习的提示词（source_prompts 优先）"""
+        items = [
+            {"source": "source_prompts", "id": row["prompt_id"],
+             "text": extract_prompt_body(row["original_prompt"]), "quality": row["quality_score"]}
+            for row in conn.execute("""
+                SELECT prompt_id, original_prompt, quality_score
+                FROM source_prompts
+                WHERE learning_status = 'pending'
+                ORDER BY prompt_id
+                LIMIT ?
+            """, (self.batch_size,))
+        ]
+        remaining = self.batch_size - len(items)
+        if remaining > 0:
+            state = conn.execute(
+                "SELECT last_id FROM learner_state WHERE source = 'generated_prompts'"
+            ).fetchone()
+            items += [
+                {"source": "generated_prompts", "id": row["prompt_id"],
+                 "text": row["prompt_text"], "quality": row["quality_score"]}
+                for row in conn.execute("""
+                    SELECT prompt_id, prompt_text, quality_score
+                    FROM generated_prompts
+                    WHERE prompt_id > ?
+                    ORDER BY prompt_id
+                    LIMIT ?
+                """, (state["last_id"] if state else 0, remaining))
+            ]
+        return items
+
+    def _load_library(self, conn, build_index: bool = True):
+        """读取元素库：分类索引、类别所属领域、各类别的去重索引、已有元素 ID"""
+        rows = [dict(row) for row in conn.execute("""
+            SELECT element_id, domain_id, category_id, chinese_name, ai_prompt_template, keywords
+            FROM elements
+        """)]
+
+        domain_votes = defaultdict(Counter)
+        duplicates: Dict[str, NearDuplicateIndex] = defaultdict(lambda: NearDuplicateIndex(self.threshold))
+        for row in rows:
+            category = KnowledgeBase.canonical_category(row["category_id"])
+            domain_votes[category][row["domain_id"]] += 1
+            duplicates[category].add(row["element_id"], row["ai_prompt_template"])
+
+        category_domains = {category: votes.most_common(1)[0][0] for category, votes in domain_votes.items()}
+        for row in conn.execute("SELECT category_id, domain_id FROM categories"):
+            category_domains.setdefault(KnowledgeBase.canonical_category(row["category_id"]), row["domain_id"])
+
+        index = ElementIndex(
+            row for row in rows
+            if row["domain_id"] != "prompt_writing" and row["category_id"] not in NON_CONTENT_CATEGORIES
+        ) if build_index else None
+        element_ids = {row["element_id"] for row in rows}
+        return index, category_domains, duplicates, element_ids
+
+    # =========================================================================
+    # 提取
+    # =========================================================================
+
+    def extract(self, index: ElementIndex, text: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        本地提取候选元素
+
+        Returns:
+            (已分类候选, 未分类候选)
+        """
+        classified, unclassified = [], []
+        for phrase, lang in split_candidate_phrases(text):
+            category, confidence = index.classify_confident(phrase, lang)
+            candidate = {"phrase": phrase, "lang": lang, "category": category,
+                         "confidence": confidence, "method": "local"}
+            if category and confidence >= MIN_LOCAL_CONFIDENCE and category not in NON_CONTENT_CATEGORIES:
+                classified.append(candidate)
+            else:
+                unclassified.append(candidate)
+        return classified, unclassified
+
+    def _classify_with_llm(self, candidates: List[Dict], categories: List[str]) -> List[Dict]:
+        if not self.classifier or not candidates:
+            return []
+        labels = self.classifier.classify([c["phrase"] for c in candidates], categories)
+        accepted = []
+        for candidate, label in zip(candidates, labels):
+            if label:
+                candidate.update(category=label, confidence=0.5, method="llm")
+                accepted.append(candidate)
+        return accepted
+
+    # =========================================================================
+    # 写入
+    # =========================================================================
+
+    @staticmethod
+    def _next_element_id(domain: str, category: str, element_ids: set) -> str:
+        prefix = f"{domain}_{category}_"
+        numbers = [int(eid[len(prefix):]) for eid in element_ids
+                   if eid.startswith(prefix) and eid[len(prefix):].isdigit()]
+        number = max(numbers, default=0) + 1
+        while f"{prefix}{number:03d}" in element_ids:
+            number += 1
+        element_id = f"{prefix}{number:03d}"
+        element_ids.add(element_id)
+        return element_id
+
+    @staticmethod
+    def _element_name(phrase: str, lang: str) -> str:
+        if lang == "cn":
+            return _NAME_RE.sub("", phrase)
+        return "_".join(_NAME_RE.sub(" ", phrase.lower()).split()[:6])
+
+    def _insert(self, conn, candidate: Dict, domain: str, item: Dict, element_ids: set) -> str:
+        quality = item.get("quality")
+        score = min(LEARNED_SCORE_CAP, quality) if quality else DEFAULT_LEARNED_SCORE
+        phrase, lang = candidate["phrase"], candidate["lang"]
+        element_id = self._next_element_id(domain, candidate["category"], element_ids)
+        metadata = {"lang": lang, "method": candidate["method"]}
+        if item["source"] == "generated_prompts":
+            metadata["generated_prompt_id"] = item["id"]
+            source_ids = []
+        else:
+            source_ids = [item["id"]]
+
+        conn.execute("""
+            INSERT INTO elements (
+                element_id, domain_id, category_id, name, chinese_name, ai_prompt_template,
+                keywords, reusability_score, confidence_score, source_prompts, learned_from, metadata
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            element_id, domain, candidate["category"], self._element_name(phrase, lang),
+            phrase if lang == "cn" else None, phrase,
+            json.dumps([phrase], ensure_ascii=False), score, candidate["confidence"],
+            json.dumps(source_ids), LEARNER_SOURCE, json.dumps(metadata, ensure_ascii=False)
+        ))
+        conn.execute(
+            "UPDATE categories SET total_elements = total_elements + 1 WHERE category_id = ?",
+            (candidate["category"],)
+        )
+        return element_id
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        处理一批待学习的提示词
+
+        Returns:
+            统计：prompts / candidates / inserted / duplicates / failed
+        """
+        stats = {"prompts": 0, "candidates": 0, "inserted": 0, "duplicates": 0, "failed": 0}
+        conn = self._connect()
+        try:
+            items = self._fetch_pending(conn)
+            if not items:
+                return stats
+            index, category_domains, _, _ = self._load_library(conn)
+            content_categories = sorted(
+                category for category, domain in category_domains.items()
+                if domain != "prompt_writing" and category not in NON_CONTENT_CATEGORIES
+            )
+
+            # 1. 提取（事务外进行，LLM 调用不持有数据库锁）
+            unclassified_all = []
+            for item in items:
+                try:
+                    item["candidates"], unclassified = self.extract(index, item["text"])
+                    unclassified_all.extend((item, c) for c in unclassified)
+                except Exception as e:
+                    item["error"] = f"{type(e).__name__}: {e}"
+                    item["candidates"] = []
+            llm_accepted = self._classify_with_llm([c for _, c in unclassified_all], content_categories)
+            accepted_ids = {id(c) for c in llm_accepted}
+            for item, candidate in unclassified_all:
+                if id(candidate) in accepted_ids:
+                    item["candidates"].append(candidate)
+
+            # 2. 写入（单个事务：去重、插入、状态更新）
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 事务内重新读取，防止与其他写入者的元素 ID 冲突
+                _, category_domains, duplicates, element_ids = self._load_library(conn, build_index=False)
+                last_generated = None
+                for item in items:
+                    stats["prompts"] += 1
+                    inserted = 0
+                    for candidate in item["candidates"]:
+                        stats["candidates"] += 1
+                        category = candidate["category"]
+                        domain = category_domains.get(category)
+                        if domain is None:
+                            continue
+                        if duplicates[category].find(candidate["phrase"]):
+                            stats["duplicates"] += 1
+                            continue
+                        element_id = self._insert(conn, candidate, domain, item, element_ids)
+                        duplicates[category].add(element_id, candidate["phrase"])
+                        inserted += 1
+                    stats["inserted"] += inserted
+
+                    if item["source"] == "source_prompts":
+                        status = "failed" if "error" in item else "completed"
+                        stats["failed"] += status == "failed"
+                        conn.execute("""
+                            UPDATE source_prompts
+                            SET learning_status = ?, extracted_elements_count = ?, learned_at = CURRENT_TIMESTAMP
+                            WHERE prompt_id = ?
+                        """, (status, inserted, item["id"]))
+                    else:
+                        stats["failed"] += "error" in item
+                        last_generated = item["id"]
+
+                if last_generated is not None:
+                    conn.execute("""
+                        INSERT INTO learner_state (source, last_id) VALUES ('generated_prompts', ?)
+                        ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id
+                    """, (last_generated,))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            conn.close()
+        return stats
+
+    def run(self, watch_interval: float = None, on_batch=None):
+        """
+        处理全部待学习的提示词；指定 watch_interval 时持续轮询新数据
+
+        Args:
+            on_batch: 每批完成后回调 on_batch(stats)
+        """
+        while True:
+            stats = self.run_once()
+            if on_batch and stats["prompts"]:
+                on_batch(stats)
+            if stats["prompts"]:
+                continue
+            if watch_interval is None:
+                return
+            time.sleep(watch_interval)
+
+
+def start_learner_process(
+    db_path: str,
+    interval: float = 300,
+    batch_size: int = 20,
+    use_llm: bool = False,
+    nice: int = 10
+) -> subprocess.Popen:
+    """
+    以低优先级子进程启动学习器（scripts/learn_elements.py --watch），
+    与 ComfyUI 进程隔离，新元素写入后由元素库热更新自动生效；
+    子进程带 LEARNER_CHILD_ENV 标记，即使导入插件包也不会再启动学习进程
+    """
+    from ..config import LEARNER_CHILD_ENV
+
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "learn_elements.py")
+    command = [
+        sys.executable, script, "--db", db_path, "--watch", str(interval),
+        "--batch-size", str(batch_size), "--nice", str(nice),
+    ]
+    if use_llm:
+        command.append("--llm")
+
+    kwargs = {"env": dict(os.environ, **{LEARNER_CHILD_ENV: "1"})}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    return subprocess.Popen(command, **kwargs)
@@ -4,19 +4,90 @@ LLM 客户端 - 增强版
 """
 
 import json
-from openai import OpenAI
+import threading
+import time
+from openai import OpenAI, BadRequestError
+from .response_parser import (
+    parse_delimited, parse_structured, build_response_schema, repair_json, ThinkTagSplitter, JSON_SECTIONS
+)
+from .cascade import LENGTH_RULES
+from .model_profiles import ModelProfiles
+from .tokens import estimate_tokens
+from .transport import get_transport, transport_client
+
+# OpenAI 客户端按 (base_url, api_key, 传输设置) 进程内共享，复用 HTTP 连接池（keep-alive）
+_OPENAI_CLIENTS = {}
+_OPENAI_CLIENTS_LOCK = threading.Lock()
+
+
+def get_openai_client(base_url: str, api_key: str) -> OpenAI:
+    """
+    获取共享的 OpenAI 客户端（线程安全）
+
+    传输模式为 record / replay 时返回录制或回放客户端（接口与 OpenAI 客户端一致），见 core/transport.py
+    """
+    settings = get_transport()
+    key = (base_url, api_key) + tuple(sorted(settings.items()))
+    with _OPENAI_CLIENTS_LOCK:
+        client = _OPENAI_CLIENTS.get(key)
+        if client is None:
+            client = transport_client(
+                lambda: OpenAI(
+                    base_url=base_url,
+                    api_key=api_key
+                ),
+                base_url, settings
+            )
+            _OPENAI_CLIENTS[key] = client
+    return client
+
+
+def _error_mentions(error: Exception, *terms: str) -> bool:
+    """接口错误信息是否提到指定参数（区分"不支持该参数"与其他 400 错误）"""
+    message = str(error).lower()
+    body = getattr(error, "body", None)
+    if body:
+        message += " " + str(body).lower()
+    return any(term in message for term in terms)
 
 
 class LLMClient:
     """增强版 LLM 客户端"""
 
+    # 已确认不支持 response_format 的 (base_url, model)，后续直接使用分隔符格式
+    _structured_unsupported = set()
+    # 已确认不接受 stream_options 的 (base_url, model)，后续不再请求流式用量
+    _stream_usage_unsupported = set()
+    # 各段落的输出要求（写入系统提示词）
+    _OUTPUT_REQUIREMENTS = {
+        "natural_en": "natural_en: 英文自然语言提示词（逗号分隔的关键词短语）",
+        "natural_cn": "natural_cn: 中文自然语言提示词（逗号分隔的关键词短语）",
+        "json_en": "json_en: 英文JSON结构化提示词",
+        "json_cn": "json_cn: 中文JSON结构化提示词",
+    }
+    # 领域扩写规则缓存（与请求无关，可预先构建）
+    _enhance_rules_cache = {}
+
     def __init__(self, base_url: str, api_key: str, model: str):
-        self.client = OpenAI(
-            base_url=base_url,
-            api_key=api_key
-        )
+        self.client = get_openai_client(base_url, api_key)
+        self.base_url = base_url
         self.model = model
 
+    def warm_up(self, domains: list, timeout: float = 5.0) -> bool:
+        """
+        预热：预构建各领域扩写规则，并向接口发起一次轻量请求建立 keep-alive 连接
+
+        Returns:
+            连接是否成功建立
+        """
+        for domain in domains:
+            self._build_enhance_rules(domain)
+        try:
+            self.client.with_options(timeout=timeout, max_retries=0).models.list()
+            return True
+        except Exception:
+            return False
+
     def generate_prompt(
         self,
         user_input: str,
@@ -27,7 +98,11 @@ class LLMClient:
         output_natural_cn: bool = False,
         output_json_en: bool = False,
         output_json_cn: bool = False,
-        enable_enhance: bool = True  # 新增：是否启用二次扩写
+        enable_enhance: bool = True,  # 新增：是否启用二次扩写
+        response_mode: str = "delimited",
+        on_delta=None,
+        reasoning_effort: str = None,
+        section_retries: int = 0
     ) -> dict:
         """
         生成提示词（支持4种输出格式）
@@ -38,23 +113,28 @@ class LLMClient:
             options: 用户选项
             element_context: 元素库上下文（来自数据库）
             output_*: 输出格式开关
+            response_mode: "delimited" 分隔符格式；"structured" 使用 response_format 结构化输出
+                （后端不支持时自动回退到分隔符格式）
+            on_delta: 流式回调，每收到一段文本调用 on_delta(text)（不含思考内容）
+            reasoning_effort: 思考强度（auto / low / medium / high），见 ModelProfiles.reasoning_effort
+            section_retries: 本地修复后仍缺失或无法解析的段落，最多补发几次只请求这些段落的追加请求
+                （已得到的段落作为上下文；所有段落都失败时不追加）
 
         Returns:
-            包含4种输出格式的字典
+            包含4种输出格式的字典，meta 中记录实际响应模式、各段解析错误、本地修复的 JSON 段落
+            （json_repaired）与追加请求（section_retries）；追加请求的用量计入 meta["usage"]
         """
 
-        # 构建输出要求
-        output_requirements = []
-        if output_natural_en:
-            output_requirements.append("natural_en: 英文自然语言提示词（逗号分隔的关键词短语）")
-        if output_natural_cn:
-            output_requirements.append("natural_cn: 中文自然语言提示词（逗号分隔的关键词短语）")
-        if output_json_en:
-            output_requirements.append("json_en: 英文JSON结构化提示词")
-        if output_json_cn:
-            output_requirements.append("json_cn: 中文JSON结构化提示词")
-
-        if not output_requirements:
+        requested = [
+            name for name, enabled in (
+                ("natural_en", output_natural_en),
+                ("natural_cn", output_natural_cn),
+                ("json_en", output_json_en),
+                ("json_cn", output_json_cn),
+            ) if enabled
+        ]
+
+        if not requested:
             return {
                 "prompt_natural_en": "",
                 "prompt_natural_cn": "",
@@ -62,69 +142,293 @@ class LLMClient:
                 "prompt_json_cn": ""
             }
 
+        # 构建输出要求
+        output_requirements = [self._OUTPUT_REQUIREMENTS[name] for name in requested]
+
+        if response_mode == "structured" and (self.base_url, self.model) in self._structured_unsupported:
+            response_mode = "delimited"
+
+        usage = {}
+
+        if response_mode == "structured":
+            try:
+                content = self._request(
+                    user_input, domain, output_requirements, options, element_context,
+                    enable_enhance, response_mode, requested, on_delta, usage, reasoning_effort
+                )
+            except BadRequestError as e:
+                # 后端不接受 response_format：记录并回退；其他 400（内容、长度等）照常抛出，不记录
+                if not _error_mentions(e, "response_format", "json_schema"):
+                    raise
+                self._structured_unsupported.add((self.base_url, self.model))
+                response_mode = "delimited"
+
+        if response_mode != "structured":
+            content = self._request(
+                user_input, domain, output_requirements, options, element_context,
+                enable_enhance, response_mode, requested, on_delta, usage, reasoning_effort
+            )
+
+        result = self._parse_generation_response(content, requested, response_mode)
+        result["meta"]["usage"] = usage
+        if section_retries:
+            self._retry_sections(
+                result, requested, section_retries, user_input, domain, options, element_context,
+                enable_enhance, result["meta"]["response_mode"], on_delta, reasoning_effort
+            )
+        return result
+
+    def _retry_sections(
+        self,
+        result: dict,
+        requested: list,
+        attempts: int,
+        user_input: str,
+        domain: str,
+        options: dict,
+        element_context: str,
+        enable_enhance: bool,
+        response_mode: str,
+        on_delta=None,
+        reasoning_effort: str = None
+    ):
+        """
+        只为缺失或无法解析的段落追加请求，成功的段落合并回 result（就地修改）
+
+        追加请求的系统提示词只列出失败的段落，用户消息附带已得到的段落以保持一致；
+        全部段落都失败时不追加（等同于重新生成），只请求了一个段落时例外，追加一次；
+        追加请求失败（接口错误等）时保留原结果
+        """
+        meta = result["meta"]
+        retries = []
+        for _ in range(attempts):
+            failed = [name for name in requested if name in meta["parse_errors"]]
+            if not failed:
+                break
+            if len(failed) == len(requested) and (len(requested) > 1 or retries):
+                break
+            good = {name: result[f"prompt_{name}"] for name in requested if name not in failed}
+            retry_usage = {}
+            record = {"sections": failed, "recovered": []}
+            retries.append(record)
+            if on_delta:
+                on_delta("\n\n")
+            try:
+                content = self._request(
+                    self._build_retry_input(user_input, failed, good), domain,
+                    [self._OUTPUT_REQUIREMENTS[name] for name in failed], options, element_context,
+                    enable_enhance, response_mode, failed, on_delta, retry_usage, reasoning_effort
+                )
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                break
+            finally:
+                self._merge_usage(meta["usage"], retry_usage)
+
+            retried = self._parse_generation_response(content, failed, response_mode)
+            # 只补一个段落时模型常省略分隔符：整段视为该段落
+            if (response_mode == "delimited" and len(failed) == 1 and "===" not in content
+                    and retried["meta"]["parse_errors"].get(failed[0]) == "missing"):
+                retried = self._parse_generation_response(f"=== {failed[0]} ===\n{content}", failed, response_mode)
+            for name in failed:
+                if name in retried["meta"]["parse_errors"]:
+                    continue
+                result[f"prompt_{name}"] = retried[f"prompt_{name}"]
+                del meta["parse_errors"][name]
+                record["recovered"].append(name)
+                if name in retried["meta"]["json_repaired"]:
+                    meta["json_repaired"].append(name)
+        if retries:
+            meta["section_retries"] = retries
+
+    @staticmethod
+    def _build_retry_input(user_input: str, failed: list, good: dict) -> str:
+        """追加请求的用户消息：原描述 + 需要补全的段落 + 已得到的段落"""
+        request = f"【补全请求】上一次回复中以下段落缺失或格式错误：{', '.join(failed)}。只输出这些段落"
+        lines = [
+            user_input,
+            "",
+            request + ("，内容与下列已生成的段落保持一致：" if good else "。"),
+        ]
+        for name, text in good.items():
+            lines += [f"=== {name} ===", text]
+        return "\n".join(lines)
+
+    @staticmethod
+    def _merge_usage(total: dict, extra: dict):
+        """把一次追加请求的用量累加到 total（数值相加，估算标记取或）"""
+        for key, value in extra.items():
+            if isinstance(value, bool):
+                total[key] = total.get(key, False) or value
+            elif isinstance(value, float):
+                total[key] = round(total.get(key, 0) + value, 1)
+            elif isinstance(value, int):
+                total[key] = total.get(key, 0) + value
+
+    def _request(
+        self,
+        user_input: str,
+        domain: str,
+        output_requirements: list,
+        options: dict,
+        element_context: str,
+        enable_enhance: bool,
+        response_mode: str,
+        requested: list,
+        on_delta=None,
+        usage: dict = None,
+        reasoning_effort: str = None
+    ) -> str:
+        """
+        发送一次流式请求并返回完整文本（不含思考内容）
+
+        usage 不为 None 时写入本次请求的 token 用量：
+        {"input_tokens", "output_tokens", "estimated", "reasoning_tokens", "answer_tokens", "reasoning_estimated"}，
+        接口未返回 usage 时按字符估算（estimated 为 True）；output_tokens = reasoning_tokens + answer_tokens。
+        收到思考内容时另记 "reasoning_chars" 与 "reasoning_ms"（首个思考片段到首个正文片段的时长）
+        """
         # 构建增强版系统提示词
         system_prompt = self._build_enhanced_system_prompt(
-            domain, output_requirements, options, element_context, enable_enhance
+            domain, output_requirements, options, element_context, enable_enhance, response_mode
         )
 
-        # 根据模型类型动态设置参数
-        model_lower = self.model.lower()
-        
-        # 构建请求参数
+        # 构建请求参数（模型相关参数来自模型档案）
         request_params = {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_input}
             ],
-            "stream": True
+            "stream": True,
+            **ModelProfiles.request_params(self.model, requested, enable_enhance, reasoning_effort)
         }
-        
-        # Claude Thinking 模型：不传递 max_tokens 和 temperature（使用代理默认值）
-        # Gemini 模型：使用 8192
-        # 其他模型：使用 16384
-        if 'thinking' in model_lower:
-            # Claude Thinking 模型使用代理默认值
-            pass
-        elif 'gemini' in model_lower:
-            request_params["max_tokens"] = 8192
-            request_params["temperature"] = 0.8
-        else:
-            request_params["max_tokens"] = 16384
-            request_params["temperature"] = 0.8
+
+        if response_mode == "structured":
+            request_params["response_format"] = build_response_schema(requested)
+        endpoint = (self.base_url, self.model)
+        if endpoint in self._stream_usage_unsupported:
+            request_params.pop("stream_options", None)
 
         # 使用流式传输增加稳定性（避免大模型超时）
-        response = self.client.chat.completions.create(**request_params)
+        start = time.monotonic()
+        try:
+            response = self.client.chat.completions.create(**request_params)
+        except BadRequestError as e:
+            # 代理不接受 stream_options：记录后去掉重试，用量改为估算
+            if "stream_options" not in request_params or not _error_mentions(e, "stream_options", "include_usage"):
+                raise
+            self._stream_usage_unsupported.add(endpoint)
+            request_params.pop("stream_options")
+            response = self.client.chat.completions.create(**request_params)
 
         # 收集流式响应
-        content = self._collect_stream_response(response)
-        return self._parse_generation_response(
-            content,
-            output_natural_en,
-            output_natural_cn,
-            output_json_en,
-            output_json_cn
-        )
+        reported = {}
+        reasoning = {}
+        content = self._collect_stream_response(response, on_delta, reported, reasoning)
+        thought = reasoning.get("text", "")
+        if reported:
+            counted = {
+                "input_tokens": reported["prompt_tokens"],
+                "output_tokens": reported["completion_tokens"],
+                "estimated": False,
+            }
+        else:
+            counted = {
+                "input_tokens": estimate_tokens(system_prompt) + estimate_tokens(user_input),
+                "output_tokens": estimate_tokens(content) + estimate_tokens(thought),
+                "estimated": True,
+            }
+        counted.update(self._split_output_tokens(counted["output_tokens"], reported, thought, content))
+        if thought:
+            counted["reasoning_chars"] = len(thought)
+        if reasoning.get("ms") is not None:
+            counted["reasoning_ms"] = reasoning["ms"]
+        if usage is not None:
+            usage.update(counted)
+        ModelProfiles.observe(self.model, time.monotonic() - start, counted["output_tokens"])
+        return content
+
+    def _split_output_tokens(self, output_tokens: int, reported: dict, thought: str, content: str) -> dict:
+        """
+        把输出 token 拆分为思考与正文
+
+        优先使用接口返回的 completion_tokens_details.reasoning_tokens；否则按思考内容估算；
+        代理不返回思考内容时，支持思考的模型以输出 token 减去正文估算值作为思考 token
+        """
+        if "reasoning_tokens" in reported:
+            reasoning_tokens, estimated = reported["reasoning_tokens"], False
+        elif thought:
+            reasoning_tokens, estimated = estimate_tokens(thought), True
+        elif ModelProfiles.get(self.model)["reasoning_param"] and "completion_tokens" in reported:
+            reasoning_tokens, estimated = output_tokens - estimate_tokens(content), True
+        else:
+            reasoning_tokens, estimated = 0, False
+        reasoning_tokens = max(0, min(output_tokens, reasoning_tokens))
+        return {
+            "reasoning_tokens": reasoning_tokens,
+            "answer_tokens": output_tokens - reasoning_tokens,
+            "reasoning_estimated": estimated,
+        }
 
-    def _collect_stream_response(self, stream) -> str:
+    def _collect_stream_response(self, stream, on_delta=None, usage: dict = None, reasoning: dict = None) -> str:
         """
         收集流式响应并拼接完整内容
 
+        思考内容（代理以 reasoning_content / reasoning 字段或正文开头的 <think> 块返回）单独收集，
+        不拼入正文、不调用 on_delta
+
         Args:
             stream: OpenAI 流式响应迭代器
+            on_delta: 可选回调，每段增量正文到达时调用
+            usage: 不为 None 时写入接口返回的用量（prompt_tokens、completion_tokens，
+                有 completion_tokens_details 时另有 reasoning_tokens）
+            reasoning: 不为 None 时写入思考内容 {"text", "ms"}
 
         Returns:
-            完整的响应文本
+            完整的响应正文
         """
         collected_content = []
+        collected_reasoning = []
+        splitter = ThinkTagSplitter()
+        reasoning_started = answer_started = None
+
+        def add(thought: str, text: str):
+            nonlocal reasoning_started, answer_started
+            if thought:
+                collected_reasoning.append(thought)
+                if reasoning_started is None:
+                    reasoning_started = time.monotonic()
+            if text:
+                collected_content.append(text)
+                if answer_started is None:
+                    answer_started = time.monotonic()
+                if on_delta:
+                    on_delta(text)
 
         for chunk in stream:
+            # 开启 stream_options.include_usage 时，最后一个 chunk 携带用量
+            chunk_usage = getattr(chunk, "usage", None)
+            if usage is not None and chunk_usage is not None:
+                usage["prompt_tokens"] = chunk_usage.prompt_tokens or 0
+                usage["completion_tokens"] = chunk_usage.completion_tokens or 0
+                details = getattr(chunk_usage, "completion_tokens_details", None)
+                if details is not None and getattr(details, "reasoning_tokens", None) is not None:
+                    usage["reasoning_tokens"] = details.reasoning_tokens
             # 检查 chunk 是否有内容
             if chunk.choices and len(chunk.choices) > 0:
                 delta = chunk.choices[0].delta
-                if delta and delta.content:
-                    collected_content.append(delta.content)
-
+                if not delta:
+                    continue
+                thought = getattr(delta, "reasoning_content", None) or getattr(delta, "reasoning", None)
+                add(thought if isinstance(thought, str) else "", "")
+                if delta.content:
+                    add(*splitter.feed(delta.content))
+        add(*splitter.finish())
+
+        if reasoning is not None:
+            reasoning["text"] = "".join(collected_reasoning)
+            if reasoning_started is not None and answer_started is not None:
+                reasoning["ms"] = round((answer_started - reasoning_started) * 1000, 1)
         return ''.join(collected_content)
 
     def _build_enhanced_system_prompt(
@@ -133,7 +437,8 @@ class LLMClient:
         output_requirements: list,
         options: dict,
         element_context: str,
-        enable_enhance: bool = True
+        enable_enhance: bool = True,
+        response_mode: str = "delimited"
     ) -> str:
         """构建增强版系统提示词（包含元素库知识 + 扩写规则）"""
 
@@ -188,35 +493,71 @@ class LLMClient:
 ### 输出格式：
 {outputs_str}
 
-### 格式规范：
+{self._build_format_rules(response_mode)}
+
+请生成详细、专业、符合一致性规则的提示词。"""
+
+    # 示例输出（分隔符格式与结构化格式共用）
+    _EXAMPLE_NATURAL_EN = (
+        "professional Asian woman, full body shot, business formal attire, dark brown almond eyes, "
+        "sleek black hair, natural makeup, soft window light, shallow depth of field, 85mm lens, 8K resolution"
+    )
+    _EXAMPLE_NATURAL_CN = "职业亚洲女性，全身照，商务正装，深棕色杏仁眼，黑色直发，自然妆容，柔和窗光，浅景深，85mm镜头，8K分辨率"
+    _EXAMPLE_JSON_EN = (
+        '{"subject": {"gender": "female", "ethnicity": "East Asian", "age": "adult"}, '
+        '"styling": {"clothing": "business formal", "hair": "black sleek", "makeup": "natural"}, '
+        '"lighting": {"type": "window light", "mood": "soft professional"}, '
+        '"technical": {"lens": "85mm", "resolution": "8K"}}'
+    )
+    _EXAMPLE_JSON_CN = (
+        '{"主体": {"性别": "女性", "人种": "东亚", "年龄": "成年"}, '
+        '"造型": {"服装": "商务正装", "发型": "黑色直发", "妆容": "自然"}, '
+        '"光影": {"类型": "窗光", "氛围": "柔和职业感"}, '
+        '"技术": {"镜头": "85mm", "分辨率": "8K"}}'
+    )
+
+    def _build_format_rules(self, response_mode: str = "delimited") -> str:
+        """构建格式规范与示例输出"""
+        if response_mode == "structured":
+            return f"""### 格式规范：
+1. 只返回一个 JSON 对象，键为上述输出格式名（natural_en / natural_cn / json_en / json_cn），只包含要求的键
+2. natural_* 的值：逗号分隔的描述性短语字符串，详细丰富，包含主体、风格、光影、构图、技术参数等
+3. json_* 的值：JSON 对象，包含 subject/styling/lighting/scene/technical 等分类
+4. 不要输出 JSON 对象以外的任何文字
+
+### 示例输出格式：
+{{"natural_en": "{self._EXAMPLE_NATURAL_EN}", "natural_cn": "{self._EXAMPLE_NATURAL_CN}", "json_en": {self._EXAMPLE_JSON_EN}, "json_cn": {self._EXAMPLE_JSON_CN}}}"""
+
+        return f"""### 格式规范：
 1. 使用 === natural_en === 等分隔符标记每个部分
 2. 自然语言格式：逗号分隔的描述性短语，详细丰富，包含主体、风格、光影、构图、技术参数等
 3. JSON格式：结构化的键值对，包含 subject/styling/lighting/scene/technical 等分类
 
 ### 示例输出格式：
 === natural_en ===
-professional Asian woman, full body shot, business formal attire, dark brown almond eyes, sleek black hair, natural makeup, soft window light, shallow depth of field, 85mm lens, 8K resolution
+{self._EXAMPLE_NATURAL_EN}
 
 === natural_cn ===
-职业亚洲女性，全身照，商务正装，深棕色杏仁眼，黑色直发，自然妆容，柔和窗光，浅景深，85mm镜头，8K分辨率
+{self._EXAMPLE_NATURAL_CN}
 
 === json_en ===
-{{"subject": {{"gender": "female", "ethnicity": "East Asian", "age": "adult"}}, "styling": {{"clothing": "business formal", "hair": "black sleek", "makeup": "natural"}}, "lighting": {{"type": "window light", "mood": "soft professional"}}, "technical": {{"lens": "85mm", "resolution": "8K"}}}}
+{self._EXAMPLE_JSON_EN}
 
 === json_cn ===
-{{"主体": {{"性别": "女性", "人种": "东亚", "年龄": "成年"}}, "造型": {{"服装": "商务正装", "发型": "黑色直发", "妆容": "自然"}}, "光影": {{"类型": "窗光", "氛围": "柔和职业感"}}, "技术": {{"镜头": "85mm", "分辨率": "8K"}}}}
-
-请生成详细、专业、符合一致性规则的提示词。"""
+{self._EXAMPLE_JSON_CN}"""
 
     def _parse_generation_response(
         self,
         content: str,
-        output_natural_en: bool,
-        output_natural_cn: bool,
-        output_json_en: bool,
-        output_json_cn: bool
+        requested: list,
+        response_mode: str = "delimited"
     ) -> dict:
-        """解析生成响应"""
+        """
+        解析生成响应
+
+        结构化响应无法解析为 JSON 时（如模型忽略 response_format），回退到分隔符解析；
+        无效的 JSON 段落先尝试本地修复（repair_json），修复成功的段落记录在 meta["json_repaired"]
+        """
         result = {
             "prompt_natural_en": "",
             "prompt_natural_cn": "",
@@ -224,60 +565,37 @@ professional Asian woman, full body shot, business formal attire, dark brown alm
             "prompt_json_cn": ""
         }
 
-        # 解析各个部分
-        if output_natural_en and "=== natural_en ===" in content:
-            try:
-                part = content.split("=== natural_en ===")[1]
-                if "===" in part:
-                    part = part.split("===")[0]
-                result["prompt_natural_en"] = part.strip()
-            except:
-                pass
-
-        if output_natural_cn and "=== natural_cn ===" in content:
-            try:
-                part = content.split("=== natural_cn ===")[1]
-                if "===" in part:
-                    part = part.split("===")[0]
-                result["prompt_natural_cn"] = part.strip()
-            except:
-                pass
-
-        if output_json_en and "=== json_en ===" in content:
-            try:
-                part = content.split("=== json_en ===")[1]
-                if "===" in part:
-                    part = part.split("===")[0]
-                # 清理 JSON
-                part = part.strip()
-                if "```json" in part:
-                    part = part.split("```json")[1].split("```")[0]
-                elif "```" in part:
-                    part = part.split("```")[1].split("```")[0]
-                result["prompt_json_en"] = part.strip()
-            except:
-                pass
-
-        if output_json_cn and "=== json_cn ===" in content:
-            try:
-                part = content.split("=== json_cn ===")[1]
-                if "===" in part:
-                    part = part.split("===")[0]
-                part = part.strip()
-                if "```json" in part:
-                    part = part.split("```json")[1].split("```")[0]
-                elif "```" in part:
-                    part = part.split("```")[1].split("```")[0]
-                result["prompt_json_cn"] = part.strip()
-            except:
-                pass
-
-        # 如果解析失败，尝试直接使用内容
-        if output_natural_en and not result["prompt_natural_en"]:
-            # 没有分隔符，假设整个内容是自然语言英文
-            if "===" not in content:
-                result["prompt_natural_en"] = content.strip()
-
+        repaired = []
+        if response_mode == "structured":
+            sections, errors = parse_structured(content, requested)
+            # 整个 JSON 对象被截断或带说明文字：修复后重新解析
+            if not sections and "===" not in content:
+                fixed = repair_json(content)
+                if fixed is not None:
+                    sections, errors = parse_structured(fixed, requested)
+                    repaired = list(sections)
+            if not sections and "===" in content:
+                response_mode = "delimited"
+        if response_mode != "structured":
+            sections, errors = parse_delimited(content, requested)
+
+        # 截断、带说明文字或尾逗号的 JSON 段落在本地修复
+        for name, error in list(errors.items()):
+            if name in JSON_SECTIONS and error.startswith("invalid_json") and name in sections:
+                fixed = repair_json(sections[name])
+                if fixed is not None:
+                    sections[name] = fixed
+                    del errors[name]
+                    repaired.append(name)
+
+        for name, text in sections.items():
+            result[f"prompt_{name}"] = text
+
+        result["meta"] = {
+            "response_mode": response_mode,
+            "parse_errors": errors,
+            "json_repaired": repaired,
+        }
         return result
 
     def _build_enhance_rules(self, domain: str) -> str:
@@ -286,6 +604,10 @@ professional Asian woman, full body shot, business formal attire, dark brown alm
         
         不再硬编码扩写维度，让 LLM 根据上下文自主推理最适合的扩写方向
         """
+        rules = self._enhance_rules_cache.get(domain)
+        if rules is not None:
+            return rules
+
         # 领域名称映射
         domain_name = {
             "portrait": "人像摄影",
@@ -295,7 +617,7 @@ professional Asian woman, full body shot, business formal attire, dark brown alm
             "video": "视频场景"
         }.get(domain, "通用")
         
-        return f"""
+        rules = f"""
 
 ## 扩写增强规则（必须遵守）：
 
@@ -303,8 +625,9 @@ professional Asian woman, full body shot, business formal attire, dark brown alm
 请根据上述【用户描述】和【{domain_name}】领域特点，根据输入复杂度自主推理出 **3-8 个**最适合本次生成的扩写维度（如：服饰、发型、姿势、背景、神态、表情、动作、材质、光影、氛围、动态、质感、构图、色调等），并按这些维度丰富提示词细节。
 
 ### 长度控制：
-- 自然语言输出：控制在 **600-800 字符**
-- JSON 输出：控制在 **1000-1200 字符**
+- 英文自然语言输出：控制在 **{LENGTH_RULES["natural"][0]}-{LENGTH_RULES["natural"][1]} 字符**
+- 中文自然语言输出：控制在 **{LENGTH_RULES["natural_cn"][0]}-{LENGTH_RULES["natural_cn"][1]} 字**
+- JSON 输出：控制在 **{LENGTH_RULES["json"][0]}-{LENGTH_RULES["json"][1]} 字符**
 
 ### 扩写规范：
 1. **只增不改**：在核心描述基础上追加细节修饰，保持原始语义不变
@@ -312,3 +635,5 @@ professional Asian woman, full body shot, business formal attire, dark brown alm
 3. **关键元素前置**：主体关键描述放在**前 150 字符**内，确保核心元素获得最高权重
 4. **层次递进**：从主体→环境→氛围→技术参数，由近及远、由主及次
 """
+        self._enhance_rules_cache[domain] = rules
+        return rules
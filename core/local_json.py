@@ -0,0 +1,200 @@
+"""
+本地 JSON 推导 - 由自然语言提示词构建结构化 JSON
+按逗号切分短语，借助元素索引归类到 subject/styling/lighting/scene/technical，
+分区内再按元素类别归入属性，输出与模型生成的 JSON 相同的两层结构：
+{"subject": {"gender": "...", "description": "..."}, "lighting": {"type": "..."}, ...}
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+from .element_index import ElementIndex
+
+# JSON 分区顺序（与系统提示词中的示例保持一致）
+SECTIONS = ["subject", "styling", "lighting", "scene", "technical"]
+
+SECTION_NAMES_CN = {
+    "subject": "主体",
+    "styling": "造型",
+    "lighting": "光影",
+    "scene": "场景",
+    "technical": "技术",
+}
+
+# 元素类别 → JSON 分区（按顺序匹配类别名中的片段）
+CATEGORY_SECTION_RULES = [
+    ("lighting", ("lighting",)),
+    ("subject", ("gender", "ethnicity", "age", "eye", "face", "facial", "skin", "nose", "lip",
+                 "expression", "pose", "gesture", "gaze", "product_types", "subject")),
+    ("styling", ("clothing", "hair", "makeup", "material", "texture", "finish", "color",
+                 "palette", "typography", "art_style", "styles", "aesthetic", "decorative")),
+    ("scene", ("background", "scene", "space", "spatial", "atmosphere", "mood", "interior",
+               "layout", "arrangement", "furniture", "design_elements")),
+    ("technical", ("photography", "camera", "technical", "rendering", "composition",
+                   "effects", "transition", "pacing", "grading")),
+]
+
+# 元素类别 → 分区内的属性名 (英文, 中文)（按顺序匹配类别名中的片段，命名与系统提示词中的 JSON 示例一致）
+CATEGORY_ATTRIBUTE_RULES = [
+    (("gender",), "gender", "性别"),
+    (("ethnicity",), "ethnicity", "人种"),
+    (("age_",), "age", "年龄"),
+    (("eye",), "eyes", "眼睛"),
+    (("face", "facial", "nose", "lip"), "face", "五官"),
+    (("skin",), "skin", "皮肤"),
+    (("expression",), "expression", "表情"),
+    (("pose", "gesture", "gaze"), "pose", "姿态"),
+    (("product_types",), "product", "产品"),
+    (("clothing",), "clothing", "服装"),
+    (("hair",), "hair", "发型"),
+    (("makeup",), "makeup", "妆容"),
+    (("material", "texture", "finish"), "material", "材质"),
+    (("color", "palette"), "color", "色彩"),
+    (("typography",), "typography", "字体"),
+    (("lighting",), "type", "类型"),
+    (("atmosphere", "mood"), "mood", "氛围"),
+    (("layout", "arrangement", "furniture", "composition"), "composition", "构图"),
+    (("camera",), "camera", "机位"),
+    (("art_style", "styles", "aesthetic"), "style", "风格"),
+    (("decorative", "design_elements"), "elements", "元素"),
+    (("background", "scene", "space", "spatial", "interior"), "setting", "环境"),
+    (("rendering", "effects", "grading"), "effects", "效果"),
+    (("photography", "technique", "transition", "pacing"), "technique", "技法"),
+]
+
+# 类别未知（兜底词表归类）或类别没有对应属性时，各分区使用的属性名 (英文, 中文)
+SECTION_DEFAULT_ATTRIBUTES = {
+    "subject": ("description", "描述"),
+    "styling": ("details", "细节"),
+    "lighting": ("type", "类型"),
+    "scene": ("setting", "环境"),
+    "technical": ("details", "参数"),
+}
+
+# 同一属性下多个短语的连接符
+_ATTRIBUTE_JOINERS = {"en": ", ", "cn": "，"}
+
+# 元素库未覆盖时的兜底规则
+FALLBACK_PATTERNS = {
+    "en": [
+        ("technical", re.compile(r'\b(\d+k|\d+mm|f/\d[\d.]*|lens|resolution|depth of field|bokeh|'
+                                 r'shot|angle|close-up|wide|hdr|render|focus|dof|aperture)\b')),
+        ("lighting", re.compile(r'\b(light|lighting|lit|glow|shadows?|sunlight|backlight|illumination)\b')),
+        ("subject", re.compile(r'\b(eyes|face|skin|woman|man|girl|boy|person|expression|pose|smile)\b')),
+        ("styling", re.compile(r'\b(hair|makeup|dress|suit|attire|outfit|wearing|clothing|color|palette)\b')),
+        ("scene", re.compile(r'\b(background|setting|atmosphere|mood|scene|environment|street|room|sky)\b')),
+    ],
+    "cn": [
+        ("technical", re.compile(r'(\d+[kK]|\d+mm|镜头|分辨率|景深|焦|构图|特写|机位|画幅|渲染|视角)')),
+        ("subject", re.compile(r'(眼|脸|肤|唇|鼻|女性|男性|女孩|男孩|人物|表情|姿势|微笑)')),
+        ("lighting", re.compile(r'(光|影|照明)')),
+        ("styling", re.compile(r'(发|妆|服|装|衣|裙|色调|配色)')),
+        ("scene", re.compile(r'(背景|场景|环境|氛围|街|室内|天空)')),
+    ],
+}
+
+# 中文元素名噪声较多，中文短语优先使用兜底词表
+LEXICON_FIRST_LANGS = {"cn"}
+
+_SPLIT_RE = {
+    "en": re.compile(r'[,;\n]+'),
+    "cn": re.compile(r'[，,、；;。\n]+'),
+}
+
+
+def category_to_section(category: Optional[str]) -> Optional[str]:
+    """将元素类别映射到 JSON 分区"""
+    if not category:
+        return None
+    for section, fragments in CATEGORY_SECTION_RULES:
+        if any(fragment in category for fragment in fragments):
+            return section
+    return None
+
+
+def category_to_attribute(category: Optional[str], section: str, lang: str = "en") -> str:
+    """将元素类别映射到分区内的属性名，无法判断时使用分区的默认属性"""
+    if category:
+        for fragments, name_en, name_cn in CATEGORY_ATTRIBUTE_RULES:
+            if any(fragment in category for fragment in fragments):
+                return name_cn if lang == "cn" else name_en
+    name_en, name_cn = SECTION_DEFAULT_ATTRIBUTES[section]
+    return name_cn if lang == "cn" else name_en
+
+
+class LocalJsonBuilder:
+    """由自然语言提示词在本地推导 JSON 结构化提示词"""
+
+    def __init__(self, index: ElementIndex):
+        self.index = index
+
+    @staticmethod
+    def split_phrases(text: str, lang: str = "en") -> List[str]:
+        """按逗号切分短语"""
+        return [p.strip() for p in _SPLIT_RE[lang].split(text or "") if p.strip()]
+
+    def classify_phrase(self, phrase: str, lang: str = "en") -> Optional[str]:
+        """短语 → JSON 分区，无法判断时返回 None"""
+        return self._classify(phrase, lang)[0]
+
+    def _classify(self, phrase: str, lang: str) -> Tuple[Optional[str], Optional[str]]:
+        """短语 → (JSON 分区, 元素类别)；由兜底词表归类时类别为 None"""
+        if lang in LEXICON_FIRST_LANGS:
+            section = self._match_lexicon(phrase, lang)
+            if section:
+                return section, None
+            category = self.index.classify(phrase, lang)
+            return category_to_section(category), category
+        category = self.index.classify(phrase, lang)
+        section = category_to_section(category)
+        if section:
+            return section, category
+        return self._match_lexicon(phrase, lang), None
+
+    @staticmethod
+    def _match_lexicon(phrase: str, lang: str) -> Optional[str]:
+        lowered = phrase.lower()
+        for section, pattern in FALLBACK_PATTERNS[lang]:
+            if pattern.search(lowered):
+                return section
+        return None
+
+    def _entries(self, natural_text: str, lang: str) -> List[Tuple[str, Optional[str], str]]:
+        """[(分区, 元素类别, 短语)]"""
+        entries = []
+        for position, phrase in enumerate(self.split_phrases(natural_text, lang)):
+            # 关键元素前置：首个短语固定视为主体描述
+            if position == 0:
+                entries.append(("subject", None, phrase))
+                continue
+            section, category = self._classify(phrase, lang)
+            entries.append((section or "scene", category if section else None, phrase))
+        return entries
+
+    def build(self, natural_text: str, lang: str = "en") -> Dict[str, List[str]]:
+        """构建分区字典 {分区（英文键）: [短语]}"""
+        sections = {name: [] for name in SECTIONS}
+        for section, _, phrase in self._entries(natural_text, lang):
+            sections[section].append(phrase)
+        return {name: phrases for name, phrases in sections.items() if phrases}
+
+    def build_nested(self, natural_text: str, lang: str = "en") -> Dict[str, Dict[str, str]]:
+        """构建两层字典 {分区: {属性: 文本}}，同一属性的多个短语按原顺序合并；中文使用中文分区名与属性名"""
+        sections = {name: {} for name in SECTIONS}
+        for section, category, phrase in self._entries(natural_text, lang):
+            sections[section].setdefault(category_to_attribute(category, section, lang), []).append(phrase)
+
+        joiner = _ATTRIBUTE_JOINERS[lang]
+        nested = {}
+        for name, attributes in sections.items():
+            if attributes:
+                key = SECTION_NAMES_CN[name] if lang == "cn" else name
+                nested[key] = {attribute: joiner.join(phrases) for attribute, phrases in attributes.items()}
+        return nested
+
+    def build_json(self, natural_text: str, lang: str = "en") -> str:
+        """构建与模型输出结构相同的 JSON 字符串"""
+        nested = self.build_nested(natural_text, lang)
+        if not nested:
+            return ""
+        return json.dumps(nested, ensure_ascii=False)
@@ -0,0 +1,234 @@
+"""
+模型档案 - 声明式的模型参数注册表
+记录每个模型的请求参数、上下文上限、流式兼容性、价格，以及运行中观测到的延迟；
+max_tokens 按本次实际请求的输出段落计算，避免失控生成消耗大量 token
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .tokens import estimate_tokens
+
+# 默认档案（未登记的模型使用）
+DEFAULT_PROFILE = {
+    "family": "openai",
+    "temperature": 0.8,           # None 表示不传（使用代理默认值）
+    "max_output_tokens": 16384,   # 输出上限；None 表示不传 max_tokens
+    "adaptive_max_tokens": True,  # 按请求的段落计算 max_tokens
+    "context_window": 128000,
+    "token_factor": 1.0,          # 分词器相对 estimate_tokens 的膨胀系数
+    "reasoning_tokens": 0,        # 计入 max_tokens 的内部思考预留（未指定思考强度时）
+    "reasoning_param": None,      # 思考强度的传参方式（见 REASONING_PARAMS）；None 表示不支持
+    "reasoning_effort": None,     # 节点选择 auto 时的思考强度；None 表示不传（使用代理默认值）
+    "stream_usage": True,         # 请求 stream_options.include_usage（最后一个 chunk 携带实际用量）；
+                                  # 代理拒绝该参数时 LLMClient 自动去掉重试并记住，也可在此对模型关闭
+    "input_cost": None,           # 美元 / 百万输入 token
+    "output_cost": None,          # 美元 / 百万输出 token
+}
+
+# 按模型名片段匹配的系列档案（按顺序叠加所有命中项）
+FAMILY_PROFILES = [
+    ("gemini-", {
+        "family": "gemini",
+        "max_output_tokens": 8192,
+        "context_window": 1048576,
+        "token_factor": 1.2,
+        # Gemini 3 默认开启思考，思考 token 计入 max_tokens
+        "reasoning_tokens": 2048,
+        "reasoning_param": "reasoning_effort",
+    }),
+    ("claude-", {
+        "family": "claude",
+        "context_window": 200000,
+    }),
+    # Thinking 模型：max_tokens 包含思考 token，且代理对 temperature 有限制，均使用代理默认值；
+    # 指定思考强度时按思考预算 + 段落预算传 max_tokens
+    ("thinking", {
+        "temperature": None,
+        "max_output_tokens": None,
+        "adaptive_max_tokens": False,
+        "reasoning_param": "thinking",
+    }),
+]
+
+# 思考强度传参方式（均经 extra_body 发送，兼容各类 OpenAI 兼容代理）
+# reasoning_effort: {"reasoning_effort": "low"}（OpenAI 标准参数，Gemini 兼容接口同样接受）
+# thinking: {"thinking": {"type": "enabled", "budget_tokens": n}}（Claude 代理透传的 Anthropic 参数）
+REASONING_PARAMS = ("reasoning_effort", "thinking")
+# 各思考强度的思考预算（token）；Anthropic 要求 budget_tokens 不小于 1024
+REASONING_BUDGET_TOKENS = {"low": 1024, "medium": 4096, "high": 16384}
+
+# 精确模型名档案（覆盖系列档案）
+# 价格参考官方定价，中转价格不同时在此修改
+MODEL_PROFILES = {
+    "gemini-3-flash": {"input_cost": 0.5, "output_cost": 3.0},
+    "gemini-3-pro-high": {"reasoning_tokens": 4096, "input_cost": 2.0, "output_cost": 12.0},
+    "claude-sonnet-4-5-thinking": {"input_cost": 3.0, "output_cost": 15.0},
+    "claude-opus-4-5-thinking": {"input_cost": 5.0, "output_cost": 25.0},
+}
+
+# 各段落的输出 token 预算（按扩写规则的长度上限：英文自然语言 800 字符、中文 320 字、JSON 1200 字符）
+SECTION_TOKEN_BUDGET = {
+    "natural_en": estimate_tokens("x" * 800),
+    "natural_cn": estimate_tokens("中" * 320),
+    "json_en": estimate_tokens("x" * 1200),
+    "json_cn": estimate_tokens("中" * 1000 + "x" * 200),
+}
+# 段落标题与格式开销
+SECTION_OVERHEAD_TOKENS = 16
+RESPONSE_OVERHEAD_TOKENS = 32
+# 预算余量：模型经常略超长度要求，超出余量才视为失控
+BUDGET_SAFETY_FACTOR = 1.5
+# 未启用扩写时没有长度约束，预算放宽
+UNBOUNDED_LENGTH_FACTOR = 2.0
+# 系统提示词（元素上下文之外）的估算 token 数：启用扩写时约 900，未启用约 600
+SYSTEM_PROMPT_TOKENS = 900
+# 延迟 EWMA 平滑系数
+LATENCY_EWMA_ALPHA = 0.3
+
+
+class ModelProfiles:
+    """模型档案注册表"""
+
+    _cache: Dict[str, dict] = {}
+    _observed: Dict[str, dict] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, model: str) -> dict:
+        """获取模型档案（默认档案 ← 命中的系列档案 ← 精确档案）"""
+        profile = cls._cache.get(model)
+        if profile is not None:
+            return profile
+
+        profile = dict(DEFAULT_PROFILE)
+        lower = model.lower()
+        for pattern, overrides in FAMILY_PROFILES:
+            if pattern in lower:
+                profile.update(overrides)
+        profile.update(MODEL_PROFILES.get(model, {}))
+        cls._cache[model] = profile
+        return profile
+
+    @classmethod
+    def reasoning_effort(cls, model: str, effort: str = None) -> Optional[str]:
+        """
+        本次请求生效的思考强度
+
+        Args:
+            effort: 节点选择的思考强度；None 或 "auto" 使用模型档案的默认值
+
+        Returns:
+            REASONING_BUDGET_TOKENS 中的强度；模型不支持思考控制或使用代理默认值时返回 None
+        """
+        profile = cls.get(model)
+        if profile["reasoning_param"] is None:
+            return None
+        if effort in (None, "auto"):
+            effort = profile["reasoning_effort"]
+        return effort if effort in REASONING_BUDGET_TOKENS else None
+
+    @classmethod
+    def reasoning_reserve(cls, model: str, effort: str = None) -> int:
+        """计入输出预算的思考 token：指定思考强度时为其思考预算，否则为档案的思考预留"""
+        effort = cls.reasoning_effort(model, effort)
+        if effort is None:
+            return cls.get(model)["reasoning_tokens"]
+        return REASONING_BUDGET_TOKENS[effort]
+
+    @classmethod
+    def max_tokens(cls, model: str, requested: List[str], enable_enhance: bool = True,
+                   reasoning_effort: str = None):
+        """
+        计算本次请求的 max_tokens
+
+        Returns:
+            token 数；模型不传 max_tokens 时返回 None
+        """
+        profile = cls.get(model)
+        ceiling = profile["max_output_tokens"]
+        budget = RESPONSE_OVERHEAD_TOKENS + sum(
+            SECTION_TOKEN_BUDGET.get(name, 0) + SECTION_OVERHEAD_TOKENS for name in requested
+        )
+        factor = BUDGET_SAFETY_FACTOR * profile["token_factor"]
+        if not enable_enhance:
+            factor *= UNBOUNDED_LENGTH_FACTOR
+        answer = int(budget * factor)
+
+        # thinking 传参要求 max_tokens 大于 budget_tokens：始终传入思考预算 + 段落预算
+        effort = cls.reasoning_effort(model, reasoning_effort)
+        if effort is not None and profile["reasoning_param"] == "thinking":
+            return answer + REASONING_BUDGET_TOKENS[effort]
+
+        if ceiling is None or not profile["adaptive_max_tokens"]:
+            return ceiling
+        return min(ceiling, answer + cls.reasoning_reserve(model, reasoning_effort))
+
+    @classmethod
+    def request_params(cls, model: str, requested: List[str], enable_enhance: bool = True,
+                       reasoning_effort: str = None) -> dict:
+        """构建 chat.completions.create 的模型相关参数"""
+        profile = cls.get(model)
+        params = {}
+        max_tokens = cls.max_tokens(model, requested, enable_enhance, reasoning_effort)
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if profile["temperature"] is not None:
+            params["temperature"] = profile["temperature"]
+        if profile["stream_usage"]:
+            params["stream_options"] = {"include_usage": True}
+
+        effort = cls.reasoning_effort(model, reasoning_effort)
+        if effort is not None:
+            if profile["reasoning_param"] == "thinking":
+                extra = {"thinking": {"type": "enabled", "budget_tokens": REASONING_BUDGET_TOKENS[effort]}}
+            else:
+                extra = {"reasoning_effort": effort}
+            params["extra_body"] = extra
+        return params
+
+    @classmethod
+    def estimate_request(cls, model: str, requested: List[str], input_text: str = "",
+                         enable_enhance: bool = True, reasoning_effort: str = None) -> Tuple[int, int]:
+        """
+        请求前估算 (输入 token, 输出 token)
+
+        输入 = 系统提示词 + input_text（用户描述与元素上下文）；
+        输出按请求段落的预算（不含余量）加思考预留，用于调度配额与预算检查
+        """
+        profile = cls.get(model)
+        input_tokens = SYSTEM_PROMPT_TOKENS + estimate_tokens(input_text)
+        output_tokens = RESPONSE_OVERHEAD_TOKENS + sum(
+            SECTION_TOKEN_BUDGET.get(name, 0) + SECTION_OVERHEAD_TOKENS for name in requested
+        )
+        output_tokens = int(output_tokens * profile["token_factor"]) + cls.reasoning_reserve(model, reasoning_effort)
+        return int(input_tokens * profile["token_factor"]), output_tokens
+
+    @classmethod
+    def estimate_cost(cls, model: str, input_tokens: int, output_tokens: int):
+        """估算费用（美元），价格未登记时返回 None"""
+        profile = cls.get(model)
+        if profile["input_cost"] is None or profile["output_cost"] is None:
+            return None
+        return (input_tokens * profile["input_cost"] + output_tokens * profile["output_cost"]) / 1_000_000
+
+    @classmethod
+    def observe(cls, model: str, latency: float, output_tokens: int = 0):
+        """记录一次请求的延迟（秒）与输出 token 数"""
+        with cls._lock:
+            stats = cls._observed.setdefault(model, {"requests": 0, "latency": None, "tokens_per_second": None})
+            stats["requests"] += 1
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] += LATENCY_EWMA_ALPHA * (latency - stats["latency"])
+            if output_tokens and latency > 0:
+                rate = output_tokens / latency
+                previous = stats["tokens_per_second"]
+                stats["tokens_per_second"] = rate if previous is None else previous + LATENCY_EWMA_ALPHA * (rate - previous)
+
+    @classmethod
+    def observed(cls, model: str) -> dict:
+        """运行中观测到的延迟统计"""
+        with cls._lock:
+            return dict(cls._observed.get(model, {}))
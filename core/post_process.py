@@ -0,0 +1,287 @@
+"""
+提示词后处理 - 在本地执行扩写规则中的语义去重、关键元素前置与长度控制（natural_en / natural_cn）
+模型未遵守规则时直接修正，不再因此重新生成
+- 去重：完全相同、包含关系（"stockings" 已含于 "black silk stockings"，须中心词相同）与近似重复的短语
+  只保留一个，保留更具体的短语，位置取两者中靠前的一个
+- 前置：与用户描述（及用户指定选项）相符的短语移到最前，其余保持模型给出的顺序
+- 长度：超出扩写规则的长度上限时，从末尾起删去非关键短语，仍超出时再删关键短语
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .cascade import length_rule
+from .local_json import LocalJsonBuilder
+from .similarity import jaccard, normalize, shingles
+
+# 近似重复阈值（字符 3-gram Jaccard）；高于元素去重的阈值，只合并几乎相同的短语
+NEAR_DUPLICATE_THRESHOLD = 0.75
+# 中文包含关系的最短长度（单字如"红"不视为被包含）
+MIN_CONTAINED_CN_CHARS = 2
+# 输出分隔符
+JOINERS = {"en": ", ", "cn": "，"}
+
+# 匹配描述时忽略的英文词
+_STOPWORDS = frozenset(
+    "a an the and or with of in on at to for by from into very high quality detailed style shot".split()
+)
+# 短语中心词之后的后置修饰起始词（"stockings with lace trim" 的中心词为 stockings）
+_POSTMODIFIERS = frozenset(
+    "with of in on at under over by from for against near behind beside wearing holding".split()
+)
+# 复数形式另有词义的名词，不还原为单数（"glasses" 不等于 "glass"）
+_PLURAL_ONLY = frozenset(
+    "glasses sunglasses eyeglasses spectacles jeans pants trousers shorts tights leggings overalls "
+    "clothes arms goods braces bangs scissors".split()
+)
+_CJK_RE = re.compile(r'[一-鿿]+')
+
+
+def _stem(word: str) -> str:
+    if word in _PLURAL_ONLY:
+        return word
+    if len(word) > 4 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _head(words: List[str]) -> str:
+    """英文短语的中心词：第一个后置修饰词之前的词，没有后置修饰时为最后一个词"""
+    for i in range(1, len(words)):
+        if words[i] in _POSTMODIFIERS:
+            return words[i - 1]
+    return words[-1]
+
+
+class PromptPostProcessor:
+    """自然语言提示词的确定性后处理"""
+
+    @staticmethod
+    def _key(phrase: str, lang: str, normalized: str = None) -> str:
+        """比较用的规范化形式：英文为空格分隔的词干序列，中文为去除标点的字符串"""
+        text = normalize(phrase) if normalized is None else normalized
+        if lang == "cn":
+            return text.replace(" ", "")
+        return " ".join(_stem(word) for word in text.split())
+
+    @staticmethod
+    def _contains(longer: str, shorter: str, lang: str) -> bool:
+        """
+        shorter 是否为 longer 的泛化说法（可被更具体的 longer 代替）
+
+        英文：shorter 按整词位于 longer 的开头或结尾，且两者中心词相同
+        （"stockings" ⊂ "black silk stockings"；"glass" ⊄ "glass table"，"long hair" ⊄ "long hair ribbon"）；
+        中文：中心语在后，shorter 须位于 longer 的结尾（"长发" ⊂ "乌黑长发"，"长发" ⊄ "长发飘飘"）。
+        其余情况只作为近似重复候选比较
+        """
+        if lang == "cn":
+            if len(shorter) < MIN_CONTAINED_CN_CHARS:
+                return longer == shorter
+            return longer.endswith(shorter)
+        long_words, short_words = longer.split(), shorter.split()
+        size = len(short_words)
+        if not size or size >= len(long_words):
+            return False
+        if long_words[:size] != short_words and long_words[-size:] != short_words:
+            return False
+        return _head(long_words) == _head(short_words)
+
+    @staticmethod
+    def _tokens(key: str, lang: str) -> set:
+        """候选召回用的词元：英文为词干，中文为两字片段；被包含或近似重复的短语至少共享一个词元"""
+        if lang == "cn":
+            return {key[i:i + 2] for i in range(len(key) - 1)} or {key}
+        return set(key.split())
+
+    @classmethod
+    def dedupe(cls, phrases: List[str], lang: str = "en", keys: List[str] = None) -> Tuple[List[int], int]:
+        """
+        去除重复短语
+
+        Args:
+            keys: 各短语的 _key()，为 None 时计算
+
+        Returns:
+            (保留短语的下标（按输出顺序）, 删去的短语数)
+        """
+        keys = keys or [cls._key(phrase, lang) for phrase in phrases]
+        kept = {}  # 下标 → 输出位置
+        postings = defaultdict(set)
+        removed = 0
+        grams = {}  # shingles 只在有候选时计算
+
+        def shingles_of(i: int):
+            if i not in grams:
+                grams[i] = shingles(phrases[i])
+            return grams[i]
+
+        def keep(i: int, slot: int):
+            kept[i] = slot
+            for token in cls._tokens(keys[i], lang):
+                postings[token].add(i)
+
+        def drop(i: int):
+            del kept[i]
+            for token in cls._tokens(keys[i], lang):
+                postings[token].discard(i)
+
+        for i, phrase in enumerate(phrases):
+            key = keys[i]
+            if not key:
+                kept[i] = i
+                continue
+            candidates = set()
+            for token in cls._tokens(key, lang):
+                candidates |= postings.get(token, set())
+            if not candidates:
+                keep(i, i)
+                continue
+            candidates = sorted(candidates)
+
+            # 新短语更具体：替换被它包含的已保留短语，位置取其中最靠前的
+            covered = [j for j in candidates if keys[j] != key and cls._contains(key, keys[j], lang)]
+            if covered:
+                slot = min(kept[j] for j in covered)
+                for j in covered:
+                    drop(j)
+                keep(i, slot)
+                removed += len(covered)
+                continue
+
+            if any(keys[j] == key or cls._contains(keys[j], key, lang)
+                   or jaccard(shingles_of(i), shingles_of(j)) >= NEAR_DUPLICATE_THRESHOLD
+                   for j in candidates):
+                removed += 1
+                continue
+            keep(i, i)
+        return sorted(kept, key=kept.get), removed
+
+    @classmethod
+    def reference(cls, description: str, options: dict = None) -> Dict:
+        """用户描述与指定选项的匹配索引 {"words": 英文词干, "cjk": 中文文本}"""
+        values = [str(v) for v in (options or {}).values() if v and v != "自动"]
+        text = " ".join([description or ""] + values)
+        words = {_stem(word) for word in normalize(text).split() if not _CJK_RE.match(word)}
+        return {
+            "words": {word for word in words if len(word) >= 3 and word not in _STOPWORDS},
+            "cjk": "".join(_CJK_RE.findall(text)),
+        }
+
+    @staticmethod
+    def _shares_bigram(text: str, cjk: str) -> bool:
+        return any(text[i:i + 2] in cjk for i in range(len(text) - 1))
+
+    @classmethod
+    def matches(cls, phrase: str, lang: str, reference: Dict, glossary: Dict[str, str] = None,
+                normalized: str = None) -> bool:
+        """
+        短语是否与用户描述相符
+
+        中文短语与描述共享两字片段即视为相符；英文短语按词干匹配描述中的英文词，
+        描述为中文时用 glossary（英文词/词组 → 中文）把短语中的一至两个词译成中文再比较
+        """
+        normalized = normalize(phrase) if normalized is None else normalized
+        if lang == "cn":
+            return cls._shares_bigram(normalized.replace(" ", ""), reference["cjk"])
+
+        raw = normalized.split()
+        if reference["words"] and any(_stem(word) in reference["words"] for word in raw if word not in _STOPWORDS):
+            return True
+        if not glossary or not reference["cjk"]:
+            return False
+        for size in (2, 1):
+            for i in range(len(raw) - size + 1):
+                if raw[i] in _STOPWORDS and size == 1:
+                    continue
+                translation = glossary.get(" ".join(raw[i:i + size]))
+                if translation and cls._shares_bigram(translation, reference["cjk"]):
+                    return True
+        return False
+
+    @classmethod
+    def process(
+        cls,
+        text: str,
+        lang: str = "en",
+        reference: Dict = None,
+        max_chars: Optional[int] = None,
+        glossary: Dict[str, str] = None
+    ) -> Tuple[str, Dict]:
+        """
+        后处理一段自然语言提示词
+
+        Args:
+            reference: reference() 的返回值，为 None 时不调整顺序
+            max_chars: 长度上限，为 None 时不删减
+
+        Returns:
+            (处理后的文本, 统计 {"duplicates", "promoted", "trimmed", "chars_before", "chars_after"})；
+            没有任何改动时返回原文
+        """
+        phrases = LocalJsonBuilder.split_phrases(text, lang)
+        stats = {"duplicates": 0, "promoted": 0, "trimmed": 0, "chars_before": len(text or ""), "chars_after": len(text or "")}
+        if not phrases:
+            return text, stats
+
+        normalized = [normalize(phrase) for phrase in phrases]
+        keys = [cls._key(phrase, lang, text) for phrase, text in zip(phrases, normalized)]
+        indices, stats["duplicates"] = cls.dedupe(phrases, lang, keys)
+        phrases = [phrases[i] for i in indices]
+
+        key_flags = [bool(reference) and cls.matches(phrases[n], lang, reference, glossary, normalized[i])
+                     for n, i in enumerate(indices)]
+        order = sorted(range(len(phrases)), key=lambda i: not key_flags[i])
+        # 原本就在相符短语之前的位置不算前置
+        stats["promoted"] = sum(1 for position, i in enumerate(order) if i > position)
+        phrases = [phrases[i] for i in order]
+        key_flags = [key_flags[i] for i in order]
+
+        joiner = JOINERS[lang]
+        if max_chars:
+            length = sum(len(p) for p in phrases) + len(joiner) * (len(phrases) - 1)
+            # 删除优先级：非关键短语先于关键短语，同类中靠后的先删；至少保留一个短语
+            for i in sorted(range(len(phrases)), key=lambda i: (key_flags[i], -i)):
+                if length <= max_chars or len(phrases) - stats["trimmed"] <= 1:
+                    break
+                length -= len(phrases[i]) + len(joiner)
+                phrases[i] = None
+                stats["trimmed"] += 1
+            phrases = [p for p in phrases if p is not None]
+
+        if not (stats["duplicates"] or stats["promoted"] or stats["trimmed"]):
+            return text, stats
+        processed = joiner.join(phrases)
+        stats["chars_after"] = len(processed)
+        return processed, stats
+
+    @classmethod
+    def process_result(
+        cls,
+        result: dict,
+        description: str = "",
+        options: dict = None,
+        enable_enhance: bool = True,
+        glossary: Dict[str, str] = None,
+        sections: Tuple[str, ...] = ("natural_en", "natural_cn")
+    ) -> Dict[str, Dict]:
+        """
+        就地后处理生成结果的自然语言段落（启用扩写时按各语言扩写规则的长度上限删减）
+
+        Returns:
+            {段落名: process() 的统计}，只包含有改动的段落
+        """
+        reference = cls.reference(description, options)
+        changed = {}
+        for name in sections:
+            text = result.get(f"prompt_{name}")
+            if not text:
+                continue
+            max_chars = length_rule(name)[1] if enable_enhance else None
+            processed, stats = cls.process(text, name[-2:], reference, max_chars, glossary)
+            if processed != text:
+                result[f"prompt_{name}"] = processed
+                changed[name] = stats
+        return changed
@@ -0,0 +1,111 @@
+"""
+后台预热 - 插件在 ComfyUI 内加载时在后台线程中完成首次运行的冷启动开销
+打开并读入元素库、构建元素索引与上下文缓存、预构建系统提示词片段、建立接口 keep-alive 连接
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+_prewarm_thread: Optional[threading.Thread] = None
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m")
+
+
+def _timed(timings: Dict[str, float], name: str, func):
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+def _page_in_db(db_path: str) -> int:
+    """顺序读取元素表，让数据库页进入系统缓存"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = 0
+        for _ in conn.execute("SELECT * FROM elements"):
+            rows += 1
+        return rows
+    finally:
+        conn.close()
+
+
+def run_prewarm(
+    db_path: str,
+    domain_options: Dict[str, dict],
+    api_base_url: str = None,
+    api_key: str = None,
+    model: str = None,
+    seed: int = 0
+) -> Dict[str, float]:
+    """
+    执行预热（同步），返回各阶段耗时（毫秒）
+
+    Args:
+        domain_options: {领域: 节点默认选项}，用于预构建默认上下文
+        api_base_url/api_key/model: 需要建立连接的接口，为空或 LLM 传输为回放模式时跳过
+        seed: 节点默认种子（与节点默认值一致才能命中上下文缓存）
+    """
+    from .element_index import get_element_index
+    from .prompt_engine import PromptEngine
+    from .llm_client import LLMClient
+    from .endpoint_pool import get_endpoint_pool
+    from .transport import get_transport
+
+    timings = {}
+    total_start = time.perf_counter()
+
+    rows = _timed(timings, "db", lambda: _page_in_db(db_path))
+    _log(f"预热: 元素库已读入 ({rows} 行, {timings['db']:.0f}ms)")
+
+    _timed(timings, "index", lambda: get_element_index(db_path))
+    _log(f"预热: 元素索引已构建 ({timings['index']:.0f}ms)")
+
+    def build_contexts():
+        engine = PromptEngine(db_path)
+        try:
+            for domain, options in domain_options.items():
+                engine.get_element_context(domain, options, seed)
+        finally:
+            engine.close()
+
+    _timed(timings, "context", build_contexts)
+    _log(f"预热: {len(domain_options)} 个领域上下文已缓存 ({timings['context']:.0f}ms)")
+
+    # 回放模式不访问网络，无需建立连接
+    if api_base_url and model and get_transport()["mode"] != "replay":
+        # 模型配置了接口池时预热池中每个接口
+        pool = get_endpoint_pool(model)
+        targets = [(e.base_url, e.api_key) for e in pool.endpoints] if pool else [(api_base_url, api_key)]
+        connected = _timed(
+            timings, "connect",
+            lambda: sum(LLMClient(url, key, model).warm_up(list(domain_options)) for url, key in targets)
+        )
+        status = f"已建立 {connected}/{len(targets)}" if connected else "失败（首次运行时重试）"
+        _log(f"预热: 接口连接{status} ({timings['connect']:.0f}ms)")
+
+    timings["total"] = (time.perf_counter() - total_start) * 1000
+    _log(f"预热完成，共 {timings['total']:.0f}ms")
+    return timings
+
+
+def start_prewarm(db_path: str, domain_options: Dict[str, dict], **kwargs) -> threading.Thread:
+    """在后台守护线程中执行预热，不阻塞节点注册；重复调用只启动一次"""
+    global _prewarm_thread
+    if _prewarm_thread is not None:
+        return _prewarm_thread
+
+    def target():
+        try:
+            run_prewarm(db_path, domain_options, **kwargs)
+        except Exception as e:
+            _log(f"预热失败: {type(e).__name__}: {e}")
+
+    _prewarm_thread = threading.Thread(target=target, name="skill-prompt-prewarm", daemon=True)
+    _prewarm_thread.start()
+    return _prewarm_thread
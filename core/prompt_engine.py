@@ -5,11 +5,74 @@
 
 import os
 import json
+import time
+import random
 import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict
 from .llm_client import LLMClient
 from .knowledge_base import KnowledgeBase
 from .design_variables import DesignVariables
+from .element_index import (
+    get_element_index, db_fingerprint, NON_CONTENT_CATEGORIES, CONTEXT_INDEX_NAME, CONTEXT_INDEX_SQL
+)
+from .similarity import NearDuplicateIndex
+from .context_packer import ContextPacker
+from .tokens import estimate_tokens
+from .local_json import LocalJsonBuilder
+from .bilingual import get_bilingual_dictionary, LLMPhraseTranslator
+from .storyboard import plan_shots, shot_input, extract_continuity
+from .constraint_checker import ConstraintChecker
+from .endpoint_pool import get_endpoint_pool
+from .scheduler import get_scheduler
+from .usage_ledger import get_usage_ledger
+from .model_profiles import ModelProfiles
+from .cascade import validate_result, CascadeStats
+from .post_process import PromptPostProcessor
+from .response_parser import SECTIONS
+
+
+# 元素上下文缓存（仅缓存带种子的确定性上下文，跨引擎实例共享）
+_CONTEXT_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_CONTEXT_CACHE_LOCK = threading.Lock()
+CONTEXT_CACHE_SIZE = 256
+
+# 已确认存在上下文检索索引的数据库
+_INDEXED_DBS = set()
+_INDEXED_DBS_LOCK = threading.Lock()
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m")
+
+
+def ensure_context_index(conn: sqlite3.Connection, db_path: str) -> bool:
+    """
+    确保上下文检索使用的复合索引存在，新建后执行 ANALYZE
+
+    随附的元素库已包含该索引，只做一次查询；索引存在或新建成功后本进程不再检查该数据库，
+    数据库只读或被锁定时跳过（查询仍然正确，只是较慢），下次连接时重试；返回是否新建了索引
+    """
+    with _INDEXED_DBS_LOCK:
+        if db_path in _INDEXED_DBS:
+            return False
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (CONTEXT_INDEX_NAME,)
+    ).fetchone()
+    if not exists:
+        try:
+            conn.execute(CONTEXT_INDEX_SQL)
+            conn.execute("ANALYZE")
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+            return False
+    with _INDEXED_DBS_LOCK:
+        _INDEXED_DBS.add(db_path)
+    return not exists
 
 
 class PromptEngine:
@@ -21,6 +84,8 @@ class PromptEngine:
             db_path = DB_PATH
         self.db_path = db_path
         self._conn = None
+        self._llm_clients = {}
+        self._llm_lock = threading.Lock()
 
     @property
     def conn(self):
@@ -28,6 +93,7 @@ class PromptEngine:
         if self._conn is None and os.path.exists(self.db_path):
             self._conn = sqlite3.connect(self.db_path)
             self._conn.row_factory = sqlite3.Row
+            ensure_context_index(self._conn, self.db_path)
         return self._conn
 
     def close(self):
@@ -35,6 +101,16 @@ class PromptEngine:
             self._conn.close()
             self._conn = None
 
+    def get_llm_client(self, api_base_url: str, api_key: str, model: str) -> LLMClient:
+        """获取（并复用）LLM 客户端，同一引擎内相同配置共享连接池"""
+        key = (api_base_url, api_key, model)
+        with self._llm_lock:
+            llm = self._llm_clients.get(key)
+            if llm is None:
+                llm = LLMClient(api_base_url, api_key, model)
+                self._llm_clients[key] = llm
+        return llm
+
     # =========================================================================
     # 数据库查询方法
     # =========================================================================
@@ -71,6 +147,49 @@ class PromptEngine:
 
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_top_elements_by_categories(self, domain: str, categories: List[str], limit: int = 5) -> Dict[str, List[Dict]]:
+        """
+        一次查询获取领域内多个类别各自复用分最高的 limit 个元素
+
+        类别按规范类别 ID 分组（别名类别的元素合并到规范类别中）；
+        先在复合索引上按类别分区排名，再回表取前 limit 行的内容
+
+        Returns:
+            {规范类别: [元素, ...]}，未出现的类别没有对应键
+        """
+        if not self.conn or not categories:
+            return {}
+
+        aliases = [
+            (variant, KnowledgeBase.canonical_category(category))
+            for category in categories
+            for variant in KnowledgeBase.category_variants(category)
+        ]
+        values = ", ".join("(?, ?)" for _ in aliases)
+        cursor = self.conn.execute(f"""
+            WITH alias(category_id, canonical) AS (VALUES {values}),
+            ranked AS (
+                SELECT e.rowid AS rid, a.canonical,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY a.canonical ORDER BY e.reusability_score DESC
+                       ) AS rank
+                FROM elements e
+                JOIN alias a ON e.category_id = a.category_id
+                WHERE e.domain_id = ?
+            )
+            SELECT e.element_id, e.name, e.chinese_name, e.ai_prompt_template,
+                   e.keywords, e.reusability_score, r.canonical AS category_id
+            FROM ranked r
+            JOIN elements e ON e.rowid = r.rid
+            WHERE r.rank <= ?
+            ORDER BY r.canonical, r.rank
+        """, (*[value for pair in aliases for value in pair], domain, limit))
+
+        grouped: Dict[str, List[Dict]] = {}
+        for row in cursor.fetchall():
+            grouped.setdefault(row['category_id'], []).append(dict(row))
+        return grouped
+
     def search_elements(self, keywords: List[str], domain: str = None, limit: int = 20) -> List[Dict]:
         """搜索匹配关键词的元素"""
         if not self.conn or not keywords:
@@ -89,6 +208,10 @@ class PromptEngine:
             where_clause = f"domain_id = ? AND ({where_clause})"
             params.insert(0, domain)
 
+        # 排除非画面内容的内部类别
+        where_clause = f"category_id NOT IN ({', '.join('?' * len(NON_CONTENT_CATEGORIES))}) AND ({where_clause})"
+        params = list(NON_CONTENT_CATEGORIES) + params
+
         cursor = self.conn.execute(f"""
             SELECT element_id, name, chinese_name, ai_prompt_template,
                    keywords, reusability_score, category_id, domain_id
@@ -119,31 +242,106 @@ class PromptEngine:
     # 元素上下文构建
     # =========================================================================
 
-    def build_element_context(self, domain: str, options: dict = None) -> str:
+    def get_element_context(self, domain: str, options: dict = None, seed: int = None,
+                            token_budget: int = None) -> str:
+        """
+        获取元素上下文
+
+        指定 seed 时上下文是确定的，结果按 (数据库及其版本指纹, 领域, 选项, seed, token 预算) 缓存，
+        元素库更新后旧条目自然失效；未指定 seed 时每次重新构建（设计风格配色随机采样）
+
+        Args:
+            token_budget: 上下文 token 预算（None 使用 config.CONTEXT_TOKEN_BUDGET，0 不限制）
+        """
+        if token_budget is None:
+            from ..config import CONTEXT_TOKEN_BUDGET
+            token_budget = CONTEXT_TOKEN_BUDGET
+        if seed is None:
+            return self.build_element_context(domain, options, token_budget=token_budget)
+
+        key = (
+            self.db_path, db_fingerprint(self.db_path), domain,
+            json.dumps(options or {}, sort_keys=True, ensure_ascii=False), seed, token_budget
+        )
+        with _CONTEXT_CACHE_LOCK:
+            context = _CONTEXT_CACHE.get(key)
+            if context is not None:
+                _CONTEXT_CACHE.move_to_end(key)
+                return context
+
+        context = self.build_element_context(domain, options, rng=random.Random(seed), token_budget=token_budget)
+
+        with _CONTEXT_CACHE_LOCK:
+            _CONTEXT_CACHE[key] = context
+            while len(_CONTEXT_CACHE) > CONTEXT_CACHE_SIZE:
+                _CONTEXT_CACHE.popitem(last=False)
+        return context
+
+    def build_element_context(self, domain: str, options: dict = None, rng: random.Random = None,
+                              token_budget: int = 0) -> str:
         """
         构建元素上下文，用于增强 LLM 提示词
 
         从数据库提取相关元素，构建结构化的参考信息
+
+        Args:
+            rng: 随机数生成器（设计风格配色采样使用，传入带种子的实例可复现）
+            token_budget: token 预算；大于 0 时按相关度/token 在预算内挑选片段（ContextPacker），
+                0 时每个类别取前 3 个样本、匹配元素取前 5 个
         """
+        # 多次查询在同一读事务中完成，元素库同时被写入时也读到一致的版本
+        conn = self.conn
+        own_transaction = conn is not None and not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            return self._build_element_context(domain, options, rng, token_budget)
+        finally:
+            if own_transaction:
+                conn.commit()
+
+    def _build_element_context(self, domain: str, options: dict = None, rng: random.Random = None,
+                               token_budget: int = 0) -> str:
         context_parts = []
+        packer = ContextPacker(token_budget) if token_budget > 0 else None
+        # 近似重复的模板只保留第一个（按复用分排序，即保留最高分）
+        seen = NearDuplicateIndex()
+
+        def is_new(template: str) -> bool:
+            if seen.find(template):
+                return False
+            seen.add(len(seen), template)
+            return True
+
+        def relevance(elem: dict, weight: float) -> float:
+            score = elem.get('reusability_score')
+            return weight * (score if score is not None else 5.0) / 10
 
         # 1. 获取领域核心类别
         categories = KnowledgeBase.get_domain_categories(domain)
         if not categories:
             categories = self._get_categories_from_db(domain)
 
-        # 2. 为每个类别获取样本元素
-        for category in categories[:8]:  # 限制类别数量
-            elements = self.get_elements_by_category(domain, category, limit=5)
+        # 2. 为每个类别获取样本元素（一次查询取回全部类别）
+        categories = categories[:8]  # 限制类别数量
+        elements_by_category = self.get_top_elements_by_categories(domain, categories, limit=5)
+        for position, category in enumerate(categories):
+            elements = elements_by_category.get(category)
             if elements:
                 category_samples = []
                 for elem in elements:
                     template = elem.get('ai_prompt_template', '')
-                    if template and len(template) < 200:
-                        category_samples.append(template)
-
-                if category_samples:
-                    context_parts.append(f"【{category}】: {'; '.join(category_samples[:3])}")
+                    if template and len(template) < 200 and is_new(template):
+                        category_samples.append(elem)
+
+                if packer:
+                    # 靠前的类别是领域核心类别，权重更高
+                    section = packer.section(f"【{category}】: ", "; ")
+                    for elem in category_samples:
+                        section.add(elem['ai_prompt_template'], relevance(elem, 1.0 - 0.05 * position))
+                elif category_samples:
+                    templates = [elem['ai_prompt_template'] for elem in category_samples[:3]]
+                    context_parts.append(f"【{category}】: {'; '.join(templates)}")
 
         # 3. 根据选项搜索特定元素
         if options:
@@ -152,27 +350,48 @@ class PromptEngine:
                 matched_elements = self.search_elements(search_keywords, domain, limit=10)
                 if matched_elements:
                     matched_samples = []
-                    for elem in matched_elements[:5]:
+                    for elem in matched_elements:
                         template = elem.get('ai_prompt_template', '')
-                        if template:
-                            matched_samples.append(f"{elem.get('chinese_name', elem['name'])}: {template[:80]}")
-
-                    if matched_samples:
-                        context_parts.append(f"\n【匹配选项的元素】:\n" + '\n'.join(matched_samples))
+                        if template and is_new(template):
+                            matched_samples.append(elem)
+                        if len(matched_samples) >= 5:
+                            break
+
+                    if packer:
+                        # 直接匹配用户所选选项，权重高于类别样本
+                        section = packer.section("\n【匹配选项的元素】:\n", "\n")
+                        for elem in matched_samples:
+                            section.add(elem['ai_prompt_template'], relevance(elem, 1.5),
+                                        label=elem.get('chinese_name') or elem['name'])
+                    elif matched_samples:
+                        lines = [
+                            f"{elem.get('chinese_name', elem['name'])}: {elem['ai_prompt_template'][:80]}"
+                            for elem in matched_samples
+                        ]
+                        context_parts.append(f"\n【匹配选项的元素】:\n" + '\n'.join(lines))
 
         # 4. 添加常识约束
         constraints = KnowledgeBase.build_constraints_prompt(options or {})
         if constraints:
-            context_parts.append(f"\n【一致性约束】:\n{constraints}")
+            if packer:
+                packer.section("\n【一致性约束】:\n", "", required=True).add(constraints)
+            else:
+                context_parts.append(f"\n【一致性约束】:\n{constraints}")
 
         # 5. 添加设计风格上下文（仅 design 领域）
         if domain == "design" and options:
             design_style = options.get("设计风格")
             if design_style and design_style != "自动":
-                design_context = DesignVariables.build_context(design_style, lang="en")
+                design_context = DesignVariables.build_context(design_style, lang="en", rng=rng)
                 if design_context:
-                    context_parts.append(f"\n【设计风格参考 ({design_style})】:\n{design_context}")
-
+                    prefix = f"\n【设计风格参考 ({design_style})】:\n"
+                    if packer:
+                        packer.section(prefix, "", required=True).add(design_context)
+                    else:
+                        context_parts.append(prefix + design_context)
+
+        if packer:
+            return packer.pack()
         return '\n'.join(context_parts)
 
     def _get_categories_from_db(self, domain: str) -> List[str]:
@@ -186,7 +405,14 @@ class PromptEngine:
             WHERE domain_id = ?
         """, (domain,))
 
-        return [row['category_id'] for row in cursor.fetchall()]
+        categories = []
+        for row in cursor.fetchall():
+            if row['category_id'] in NON_CONTENT_CATEGORIES:
+                continue
+            category = KnowledgeBase.canonical_category(row['category_id'])
+            if category not in categories:
+                categories.append(category)
+        return categories
 
     def _extract_search_keywords(self, options: dict) -> List[str]:
         """从选项中提取搜索关键词"""
@@ -232,7 +458,21 @@ class PromptEngine:
         output_natural_cn: bool = False,
         output_json_en: bool = False,
         output_json_cn: bool = False,
-        enable_enhance: bool = True  # 新增：是否启用二次扩写
+        enable_enhance: bool = True,  # 新增：是否启用二次扩写
+        json_mode: str = "llm",
+        auto_repair: bool = False,
+        response_mode: str = "delimited",
+        element_context: str = None,
+        seed: int = None,
+        on_delta=None,
+        use_endpoint_pool: bool = True,
+        context_token_budget: int = None,
+        priority: str = "interactive",
+        source: str = None,
+        cascade: bool = False,
+        cn_mode: str = "llm",
+        reasoning_effort: str = "auto",
+        post_process: bool = False
     ) -> dict:
         """
         增强版生成提示词（主入口）
@@ -246,29 +486,460 @@ class PromptEngine:
             options: 可选参数（性别、风格等）
             output_*: 输出开关
             enable_enhance: 是否启用扩写增强
+            json_mode: "llm" 由模型生成 JSON；"local" 模型只生成自然语言，JSON 本地推导
+            auto_repair: 是否在本地修复违反一致性规则的描述（触发的规则记录在 meta 中），默认关闭
+            response_mode: "delimited" 分隔符格式；"structured" 结构化输出（后端支持时）
+            element_context: 预先构建的元素上下文（为 None 时从数据库构建）
+            seed: 随机种子；相同输入与种子得到相同的上下文与系统提示词（可命中缓存）
+            on_delta: 流式回调，模型每输出一段文本调用 on_delta(text)（用于实时预览）
+            use_endpoint_pool: 模型配置了接口池（config.ENDPOINT_POOLS）时，
+                在池中选择接口，忽略 api_base_url/api_key
+            context_token_budget: 元素上下文 token 预算（None 使用 config.CONTEXT_TOKEN_BUDGET，0 不限制）；
+                上下文的估算 token 数记录在 meta["context_tokens"]
+            priority: 调度优先级，"interactive"（节点）先于 "batch"（批量节点、命令行）；
+                排队等待时间记录在 meta["queue_wait_ms"]
+            source: 调用来源（节点类名、stream、bulk_generate 等），记入用量账本并用于按来源的预算；
+                用量记录在 meta["usage"]，估算费用在 meta["cost"]
+            cascade: 级联模式，先用 config.CASCADE_FAST_MODEL 生成，本地检查不通过时再用 model 重新生成；
+                过程记录在 meta["cascade"]
+            cn_mode: "llm" 由模型生成中文自然语言；"local" 模型只生成英文，中文由本地中英词典逐短语翻译，
+                词典未覆盖的短语合并为一次小批量 LLM 翻译；统计记录在 meta["translation"]
+            reasoning_effort: 思考强度（auto / low / medium / high），仅对模型档案中支持思考控制的模型生效；
+                "auto" 使用档案默认值。思考内容不计入输出，思考与正文 token 分别记录在
+                meta["usage"]["reasoning_tokens"] / ["answer_tokens"]
+            post_process: 在本地对自然语言段落去重、把与描述相符的短语前置、按长度上限删减
+                （模型未遵守扩写规则时无需重新生成）；改动记录在 meta["post_process"]，默认关闭
 
         Returns:
             包含4种输出的字典
         """
         # 1. 构建元素上下文（从数据库）
-        element_context = self.build_element_context(domain, options)
-
-        # 2. 初始化 LLM 客户端
-        llm = LLMClient(api_base_url, api_key, model)
-
-        # 3. 调用 LLM 生成（带元素上下文）
-        result = llm.generate_prompt(
-            user_input=user_input,
-            domain=domain,
-            options=options or {},
-            element_context=element_context,
-            output_natural_en=output_natural_en,
-            output_natural_cn=output_natural_cn,
-            output_json_en=output_json_en,
-            output_json_cn=output_json_cn,
-            enable_enhance=enable_enhance  # 新增：传递扩写开关
+        if element_context is None:
+            element_context = self.get_element_context(domain, options, seed, context_token_budget)
+
+        if cascade:
+            return self._generate_cascade(dict(
+                user_input=user_input, domain=domain, api_base_url=api_base_url, api_key=api_key,
+                model=model, options=options, output_natural_en=output_natural_en,
+                output_natural_cn=output_natural_cn, output_json_en=output_json_en,
+                output_json_cn=output_json_cn, enable_enhance=enable_enhance, json_mode=json_mode,
+                auto_repair=auto_repair, response_mode=response_mode, element_context=element_context,
+                seed=seed, on_delta=on_delta, use_endpoint_pool=use_endpoint_pool,
+                priority=priority, source=source, cn_mode=cn_mode, reasoning_effort=reasoning_effort,
+                post_process=post_process
+            ))
+
+        # 本地 JSON 模式：只向模型请求对应语言的自然语言段落
+        local_json = json_mode == "local" and (output_json_en or output_json_cn)
+        if local_json:
+            request_flags = {
+                "output_natural_en": output_natural_en or output_json_en,
+                "output_natural_cn": output_natural_cn or output_json_cn,
+                "output_json_en": False,
+                "output_json_cn": False,
+            }
+        else:
+            request_flags = {
+                "output_natural_en": output_natural_en,
+                "output_natural_cn": output_natural_cn,
+                "output_json_en": output_json_en,
+                "output_json_cn": output_json_cn,
+            }
+
+        # 本地中文模式：中文自然语言（含本地 JSON 的中文来源）由英文翻译，不向模型请求
+        local_cn = cn_mode == "local" and request_flags["output_natural_cn"]
+        if local_cn:
+            request_flags["output_natural_cn"] = False
+            request_flags["output_natural_en"] = True
+
+        # 2. 调用 LLM 生成（带元素上下文）
+        from ..config import SECTION_RETRY_ATTEMPTS
+
+        def call(base_url, key):
+            llm = self.get_llm_client(base_url, key, model)
+            return llm.generate_prompt(
+                user_input=user_input,
+                domain=domain,
+                options=options or {},
+                element_context=element_context,
+                enable_enhance=enable_enhance,  # 新增：传递扩写开关
+                response_mode=response_mode,
+                on_delta=on_delta,
+                reasoning_effort=reasoning_effort,
+                section_retries=SECTION_RETRY_ATTEMPTS,
+                **request_flags
+            )
+
+        # 经调度器排队：按实际使用的接口 api_key（启用接口池时为选中接口的 key）的并发与 token 配额、
+        # 优先级与公平轮转获得调用许可；接口切换时按新接口的 key 重新排队
+        scheduler = get_scheduler()
+        queue_waits = []
+
+        def scheduled(base_url, key):
+            if not scheduler:
+                return call(base_url, key)
+            with scheduler.slot(key, priority, input_tokens + output_tokens) as ticket:
+                queue_waits.append(ticket.wait)
+                scheduled_result = call(base_url, key)
+                usage = scheduled_result.get("meta", {}).get("usage")
+                if usage:
+                    ticket.actual_tokens = usage["input_tokens"] + usage["output_tokens"]
+            return scheduled_result
+
+        def dispatch():
+            pool = get_endpoint_pool(model) if use_endpoint_pool else None
+            if not pool:
+                return scheduled(api_base_url, api_key)
+            # 相同领域与元素上下文（即相同系统提示词）优先发往同一接口
+            served = {}
+
+            def pooled(endpoint):
+                # 换接口重试：上一个接口可能已在流中途失败，已推送的 token 作废
+                if "base_url" in served:
+                    reset = getattr(on_delta, "reset", None)
+                    if reset:
+                        reset()
+                served["base_url"] = endpoint.base_url
+                return scheduled(endpoint.base_url, endpoint.api_key)
+
+            pooled_result = pool.call(pooled, affinity_key=f"{domain}|{element_context}")
+            pooled_result.setdefault("meta", {})["endpoint"] = served["base_url"]
+            return pooled_result
+
+        requested = [name[len("output_"):] for name, enabled in request_flags.items() if enabled]
+        input_tokens, output_tokens = ModelProfiles.estimate_request(
+            model, requested, user_input + element_context, enable_enhance, reasoning_effort
+        )
+
+        # 预算：超出时告警、降级到更便宜的模型或拒绝调用
+        ledger = get_usage_ledger()
+        requested_model = model
+        budget = None
+        if ledger:
+            model, budget = ledger.enforce(
+                domain, model, source, input_tokens + output_tokens,
+                ModelProfiles.estimate_cost(model, input_tokens, output_tokens)
+            )
+
+        result = dispatch()
+        meta = result.setdefault("meta", {})
+        if scheduler:
+            meta["queue_wait_ms"] = round(sum(queue_waits) * 1000, 1)
+        if budget:
+            meta["budget"] = {key: budget.get(key) for key in ("period", "action", "spent_tokens", "spent_usd")}
+        if model != requested_model:
+            meta["downgraded_from"] = requested_model
+        usage = meta.get("usage")
+        if ledger and usage:
+            meta["cost"] = ledger.record(
+                domain, model, usage["input_tokens"], usage["output_tokens"], usage["estimated"],
+                node=source, sections=requested, enhance=enable_enhance, requested_model=requested_model,
+                reasoning_tokens=usage.get("reasoning_tokens", 0)
+            )
+
+        meta["context_tokens"] = estimate_tokens(element_context)
+
+        # 先修复再后处理：修复可能把不同短语替换成同一合规描述，交由去重合并；
+        # 中文翻译与本地 JSON 均基于修复、后处理后的自然语言
+        if auto_repair:
+            meta["consistency_fixes"] = ConstraintChecker.repair_result(result, options, user_input, domain)
+
+        if post_process:
+            self.post_process_result(result, user_input, options, enable_enhance)
+
+        if local_cn:
+            result = self.translate_natural_cn(
+                result, domain, api_base_url, api_key, model, use_endpoint_pool, source, priority
+            )
+
+        if local_json:
+            result = self.derive_local_json(
+                result, output_natural_en, output_natural_cn, output_json_en, output_json_cn
+            )
+
+        return result
+
+    @staticmethod
+    def _derived_sections(request: dict) -> List[str]:
+        """本地推导的段落（长度不受扩写规则约束：JSON 由短语归类而来，中文由英文翻译而来）"""
+        derived = []
+        if request["json_mode"] == "local":
+            derived += ["json_en", "json_cn"]
+        if request["cn_mode"] == "local":
+            derived.append("natural_cn")
+        return derived
+
+    def _generate_cascade(self, request: dict) -> dict:
+        """级联生成：快速模型的结果通过本地检查则直接返回，否则用请求的模型重新生成"""
+        from ..config import CASCADE_FAST_MODEL
+
+        strong_model = request["model"]
+        if not CASCADE_FAST_MODEL or CASCADE_FAST_MODEL == strong_model:
+            return self.generate(**request)
+
+        requested = [name for name in SECTIONS if request[f"output_{name}"]]
+        start = time.monotonic()
+        try:
+            result = self.generate(**dict(request, model=CASCADE_FAST_MODEL))
+            failures = validate_result(
+                result, requested, request["options"], request["user_input"],
+                request["enable_enhance"], request["auto_repair"],
+                skip_length=self._derived_sections(request), domain=request["domain"]
+            )
+        except Exception as e:
+            # 快速模型调用失败（接口错误、预算拒绝等）同样升级
+            failures = [f"error:{type(e).__name__}"]
+        fast_latency = time.monotonic() - start
+
+        if not failures:
+            CascadeStats.record(CASCADE_FAST_MODEL, strong_model, failures, fast_latency)
+            result["meta"]["cascade"] = {
+                "fast_model": CASCADE_FAST_MODEL,
+                "escalated": False,
+                "failures": [],
+                "fast_ms": round(fast_latency * 1000, 1),
+            }
+            return result
+
+        # 预览已显示快速模型的输出，升级前通知清空
+        reset = getattr(request["on_delta"], "reset", None)
+        if reset:
+            reset()
+
+        start = time.monotonic()
+        result = self.generate(**request)
+        strong_latency = time.monotonic() - start
+        CascadeStats.record(CASCADE_FAST_MODEL, strong_model, failures, fast_latency, strong_latency)
+        result.setdefault("meta", {})["cascade"] = {
+            "fast_model": CASCADE_FAST_MODEL,
+            "escalated": True,
+            "failures": failures,
+            "fast_ms": round(fast_latency * 1000, 1),
+            "strong_ms": round(strong_latency * 1000, 1),
+        }
+        return result
+
+    def generate_batch(self, requests: List[Dict], max_workers: int = 4, priority: str = "batch") -> List[Dict]:
+        """
+        批量生成
+
+        元素上下文在当前线程依次构建（数据库连接不跨线程），
+        LLM 调用在线程池中并发执行。单条失败不会中断整批：
+        对应结果的四种输出为空字符串，并在 "error" 中给出原因。
+
+        Args:
+            requests: 每项为 generate() 的关键字参数
+            max_workers: 最大并发 LLM 调用数
+            priority: 未在请求中指定时使用的调度优先级
+
+        Returns:
+            与 requests 顺序一致的结果列表
+        """
+        results: List[Optional[Dict]] = [None] * len(requests)
+        prepared = []
+
+        for i, request in enumerate(requests):
+            try:
+                context = request.get("element_context")
+                if context is None:
+                    context = self.get_element_context(
+                        request["domain"], request.get("options"), request.get("seed"),
+                        request.get("context_token_budget")
+                    )
+                prepared.append((i, dict({"priority": priority}, **dict(request, element_context=context))))
+            except Exception as e:
+                results[i] = self._failed_result(e)
+
+        def run(item):
+            i, request = item
+            try:
+                results[i] = self.generate(**request)
+            except Exception as e:
+                results[i] = self._failed_result(e)
+
+        if prepared:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prepared)))) as pool:
+                list(pool.map(run, prepared))
+
+        return results
+
+    def generate_storyboard(self, request: Dict, shot_count: int, max_workers: int = 4) -> List[Dict]:
+        """
+        视频分镜：一段描述生成 N 个镜头的提示词
+
+        元素上下文与系统提示词只构建一次（运镜、转场不进入选项，所有镜头共享），
+        先生成建立镜头，从中提取人物、造型与光影作为连续性设定，其余镜头再并发生成
+
+        Args:
+            request: generate() 的关键字参数（其中的运镜 / 转场为"自动"时按镜头角色规划）
+            shot_count: 镜头数
+            max_workers: 其余镜头的最大并发数
+
+        Returns:
+            按镜头顺序的结果列表，镜头规划记录在各结果的 meta["shot"]；单个镜头失败不影响其他镜头
+        """
+        options = dict(request.get("options") or {})
+        shots = plan_shots(shot_count, options, request.get("seed"))
+        for name in ("camera_movement", "transition"):
+            if name in options:
+                options[name] = "自动"
+
+        shared = dict(request, options=options)
+        if shared.get("element_context") is None:
+            shared["element_context"] = self.get_element_context(
+                shared["domain"], options, shared.get("seed"), shared.get("context_token_budget")
+            )
+        on_delta = shared.pop("on_delta", None)
+        user_input = shared["user_input"]
+
+        def shot_request(shot, continuity=""):
+            return dict(shared, user_input=shot_input(user_input, shot, len(shots), continuity))
+
+        # 1. 建立镜头（流式预览只显示该镜头）
+        try:
+            first = self.generate(on_delta=on_delta, **shot_request(shots[0]))
+        except Exception as e:
+            first = self._failed_result(e)
+        results = [first]
+        continuity = ""
+        if not first.get("error"):
+            continuity = extract_continuity(LocalJsonBuilder(get_element_index(self.db_path)), first) or ""
+
+        # 2. 其余镜头共享上下文与连续性设定，并发生成
+        if len(shots) > 1:
+            results += self.generate_batch(
+                [shot_request(shot, continuity) for shot in shots[1:]],
+                max_workers=max_workers,
+                priority=shared.get("priority", "interactive")
+            )
+
+        for shot, result in zip(shots, results):
+            result.setdefault("meta", {})["shot"] = dict(shot, continuity=bool(continuity) and shot["index"] > 1)
+        return results
+
+    @staticmethod
+    def _failed_result(error: Exception) -> Dict:
+        return {
+            "prompt_natural_en": "",
+            "prompt_natural_cn": "",
+            "prompt_json_en": "",
+            "prompt_json_cn": "",
+            "error": f"{type(error).__name__}: {error}",
+        }
+
+    def post_process_result(self, result: dict, user_input: str, options: dict = None,
+                            enable_enhance: bool = True) -> dict:
+        """
+        自然语言段落的本地后处理（去重、关键元素前置、长度控制），见 PromptPostProcessor
+
+        描述为中文时借助中英词典判断英文短语是否与描述相符；有改动的段落及统计记录在 meta["post_process"]
+        """
+        glossary = get_bilingual_dictionary(self.db_path).entries if result.get("prompt_natural_en") else None
+        changes = PromptPostProcessor.process_result(result, user_input, options, enable_enhance, glossary)
+        result.setdefault("meta", {})["post_process"] = changes
+        return result
+
+    def derive_local_json(
+        self,
+        result: dict,
+        output_natural_en: bool,
+        output_natural_cn: bool,
+        output_json_en: bool,
+        output_json_cn: bool
+    ) -> dict:
+        """
+        由自然语言输出在本地推导 JSON 输出（{分区: {属性: 文本}}，与模型生成的结构一致）
+
+        未被请求的自然语言段落（仅作为 JSON 来源）会被清空
+        """
+        start = time.perf_counter()
+        builder = LocalJsonBuilder(get_element_index(self.db_path))
+
+        if output_json_en:
+            result["prompt_json_en"] = builder.build_json(result.get("prompt_natural_en", ""), lang="en")
+        if output_json_cn:
+            result["prompt_json_cn"] = builder.build_json(result.get("prompt_natural_cn", ""), lang="cn")
+        if not output_natural_en:
+            result["prompt_natural_en"] = ""
+        if not output_natural_cn:
+            result["prompt_natural_cn"] = ""
+
+        result.setdefault("meta", {}).update({
+            "json_mode": "local",
+            "json_shape": "nested",
+            "local_json_ms": round((time.perf_counter() - start) * 1000, 3),
+        })
+        return result
+
+    def translate_natural_cn(
+        self,
+        result: dict,
+        domain: str,
+        api_base_url: str,
+        api_key: str,
+        model: str,
+        use_endpoint_pool: bool = True,
+        source: str = None,
+        priority: str = "interactive"
+    ) -> dict:
+        """
+        由英文自然语言输出在本地翻译中文自然语言
+
+        词典未覆盖的短语合并为一次 LLM 翻译请求，与生成请求一样先执行预算、再经调度器排队；
+        请求失败或被预算拒绝时这些短语保留英文
+        """
+        start = time.perf_counter()
+        dictionary = get_bilingual_dictionary(self.db_path)
+        translator = {"model": model}
+
+        def fallback(phrases):
+            def call(base_url, key):
+                translator["client"] = LLMPhraseTranslator(base_url, key, translator["model"])
+                return translator["client"].translate(phrases)
+
+            def scheduled(base_url, key):
+                # 与生成请求相同：按实际使用的接口 api_key 排队
+                scheduler = get_scheduler()
+                if not scheduler:
+                    return call(base_url, key)
+                with scheduler.slot(key, priority, sum(estimate)) as ticket:
+                    translations = call(base_url, key)
+                    usage = translator["client"].usage
+                    ticket.actual_tokens = usage["input_tokens"] + usage["output_tokens"]
+                return translations
+
+            try:
+                estimate = LLMPhraseTranslator.estimate(model, phrases)
+                ledger = get_usage_ledger()
+                if ledger:
+                    translator["model"], _ = ledger.enforce(
+                        domain, model, source, sum(estimate), ModelProfiles.estimate_cost(model, *estimate)
+                    )
+                pool = get_endpoint_pool(translator["model"]) if use_endpoint_pool else None
+                if pool:
+                    return pool.call(lambda endpoint: scheduled(endpoint.base_url, endpoint.api_key))
+                return scheduled(api_base_url, api_key)
+            except Exception as e:
+                _log(f"短语翻译失败，{len(phrases)} 个短语保留英文: {e}")
+                return [None] * len(phrases)
+
+        result["prompt_natural_cn"], stats = dictionary.translate(
+            result.get("prompt_natural_en", ""), fallback=fallback
         )
 
+        # 词典覆盖全部短语（或文本为空）时不会创建翻译客户端
+        client = translator.get("client")
+        usage = client.usage if client else None
+        if usage and (usage["input_tokens"] or usage["output_tokens"]):
+            stats["usage"] = dict(usage)
+            ledger = get_usage_ledger()
+            if ledger:
+                stats["cost"] = ledger.record(
+                    domain, translator["model"], usage["input_tokens"], usage["output_tokens"], usage["estimated"],
+                    node=source, sections=["translate_cn"], requested_model=model
+                )
+        stats["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result.setdefault("meta", {})["translation"] = stats
         return result
 
     def enhance_with_elements(self, prompt: str, domain: str, limit: int = 5) -> str:
@@ -294,33 +965,29 @@ class PromptEngine:
 
         return prompt
 
-    def validate_consistency(self, intent: dict, generated_prompt: str) -> List[Dict]:
+    def validate_consistency(self, intent: dict, generated_prompt: str, description: str = "") -> List[Dict]:
         """
         验证生成结果的一致性
 
-        检查人种-眼睛颜色、人种-发色等约束
+        检查人种-眼睛/发色、风格-光影、时代-服装等约束
         返回问题列表
         """
-        issues = []
-
-        # 检查人种约束
-        ethnicity = intent.get('ethnicity') or intent.get('subject', {}).get('ethnicity')
-        if ethnicity:
-            ethnicity_key = KnowledgeBase._normalize_ethnicity(ethnicity)
-            constraints = KnowledgeBase.get_ethnicity_constraints(ethnicity_key)
-
-            prompt_lower = generated_prompt.lower()
-
-            # 检查不合理的眼睛颜色
-            if ethnicity_key == 'East_Asian':
-                incompatible_eyes = ['green eyes', 'blue eyes', 'violet eyes']
-                for eye in incompatible_eyes:
-                    if eye in prompt_lower:
-                        issues.append({
-                            'type': 'ethnicity_eye_mismatch',
-                            'severity': 'warning',
-                            'message': f"东亚人通常不会有{eye}",
-                            'suggestion': f"建议使用: {', '.join(constraints['typical_eyes'][:2])} eyes"
-                        })
+        options = dict(intent)
+        subject = intent.get('subject')
+        if not options.get('ethnicity') and isinstance(subject, dict) and subject.get('ethnicity'):
+            options['ethnicity'] = subject['ethnicity']
 
+        context = ConstraintChecker.build_context(options, description, intent.get('domain'))
+        _, issues = ConstraintChecker.check(generated_prompt, context, repair=False)
         return issues
+
+    def repair_consistency(self, options: dict, generated_prompt: str, description: str = "",
+                           domain: str = None) -> tuple:
+        """
+        在本地修复一致性问题，无需重新生成
+
+        Returns:
+            (修复后的提示词, 触发的规则列表)
+        """
+        context = ConstraintChecker.build_context(options, description, domain)
+        return ConstraintChecker.check(generated_prompt, context, repair=True)
@@ -0,0 +1,300 @@
+"""
+响应解析器 - 解析 LLM 返回的多段提示词
+支持分隔符格式（=== natural_en ===）与结构化 JSON 格式，
+解析失败按段落报告，不再静默丢弃
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(text: str):
+        return orjson.loads(text)
+except ImportError:
+    _loads = json.loads
+
+SECTIONS = ["natural_en", "natural_cn", "json_en", "json_cn"]
+JSON_SECTIONS = {"json_en", "json_cn"}
+
+# 一次扫描定位全部段落标题
+_HEADER_RE = re.compile(r'^[ \t]*===[ \t]*(natural_en|natural_cn|json_en|json_cn)[ \t]*===[ \t]*$', re.MULTILINE)
+# 任意 === xxx === 形式的行（用于截断未知段落）
+_ANY_HEADER_RE = re.compile(r'^[ \t]*===[^\n]*===[ \t]*$', re.MULTILINE)
+_FENCE_RE = re.compile(r'```(?:json)?[ \t]*\n?(.*?)(?:```|$)', re.DOTALL)
+
+
+def strip_code_fence(text: str) -> str:
+    """去除 ```json ... ``` 代码块包裹"""
+    match = _FENCE_RE.search(text)
+    if match:
+        return match.group(1).strip()
+    return text.strip()
+
+
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _parses(text: str, allow_empty: bool = True) -> bool:
+    try:
+        value = _loads(text)
+    except ValueError:
+        return False
+    return allow_empty or bool(value)
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    本地修复 JSON 段落：去除代码块包裹与前后说明文字、去除多余的尾逗号、补全被截断的括号
+    （截断在键、字符串或不完整的值处时，回退到最后一个完整的成员）
+
+    Returns:
+        可解析的 JSON 文本（保留原有排版）；无法修复、或截断后没有任何完整成员时返回 None
+    """
+    text = strip_code_fence(text or "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+
+    stack = []
+    in_string = escaped = False
+    cuts = []  # 截断时可回退的位置：(位置, 当时未闭合的括号)
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if not stack or stack[-1] != char:
+                return None
+            stack.pop()
+            if not stack:
+                # 完整的 JSON 之后是说明文字：截去
+                candidate = text[start:i + 1]
+                for fixed in (candidate, _TRAILING_COMMA_RE.sub(r'\1', candidate)):
+                    if _parses(fixed):
+                        return fixed
+                return None
+            cuts.append((i + 1, list(stack)))
+        elif char == ",":
+            cuts.append((i, list(stack)))
+
+    # 被截断：截在值之后时原样补全括号，否则（含截在字符串中，避免留下半个词）回退到更早的完整成员
+    attempts = [] if in_string else [text[start:].rstrip() + "".join(reversed(stack))]
+    attempts += [text[start:position].rstrip() + "".join(reversed(open_)) for position, open_ in reversed(cuts)]
+    # 只剩空括号（如截断在第一个成员之前）不算修复成功，交由重试
+    for attempt in attempts:
+        for fixed in (attempt, _TRAILING_COMMA_RE.sub(r'\1', attempt)):
+            if _parses(fixed, allow_empty=False):
+                return fixed
+    return None
+
+
+def _check_json(section: str, text: str, errors: Dict[str, str]):
+    try:
+        _loads(text)
+    except ValueError as e:
+        errors[section] = f"invalid_json: {e}"
+
+
+def parse_delimited(content: str, requested: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    单次线性扫描解析分隔符格式
+
+    Returns:
+        (段落内容, 段落错误)；错误值为 missing / empty / invalid_json: ...
+    """
+    sections = {}
+    errors = {}
+
+    headers = list(_HEADER_RE.finditer(content))
+    boundaries = [m.start() for m in _ANY_HEADER_RE.finditer(content)] + [len(content)]
+
+    for match in headers:
+        name = match.group(1)
+        if name in sections:
+            continue
+        end = next(b for b in boundaries if b > match.start())
+        sections[name] = content[match.end():end].strip()
+
+    # 完全没有分隔符时，整体视为英文自然语言（兼容不遵循格式的模型）
+    if not headers and "natural_en" in requested and "===" not in content:
+        sections["natural_en"] = content.strip()
+
+    result = {}
+    for name in requested:
+        if name not in sections:
+            errors[name] = "missing"
+            continue
+        text = sections[name]
+        if name in JSON_SECTIONS:
+            text = strip_code_fence(text)
+        if not text:
+            errors[name] = "empty"
+            continue
+        if name in JSON_SECTIONS:
+            _check_json(name, text, errors)
+        result[name] = text
+
+    return result, errors
+
+
+def parse_structured(content: str, requested: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    解析结构化输出（单个 JSON 对象，键为段落名）
+
+    json_* 段落的对象值会被序列化为 JSON 字符串
+    """
+    try:
+        data = _loads(strip_code_fence(content))
+    except ValueError as e:
+        return {}, {name: f"invalid_response: {e}" for name in requested}
+    if not isinstance(data, dict):
+        return {}, {name: "invalid_response: not an object" for name in requested}
+
+    result = {}
+    errors = {}
+    for name in requested:
+        value = data.get(name)
+        if value is None:
+            errors[name] = "missing"
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False)
+        elif name in JSON_SECTIONS:
+            value = strip_code_fence(str(value))
+            _check_json(name, value, errors)
+        value = str(value).strip()
+        if not value:
+            errors[name] = "empty"
+            continue
+        result[name] = value
+
+    return result, errors
+
+
+class SectionStreamTracker:
+    """
+    流式段落跟踪：增量喂入文本，出现下一个段落标题时报告上一段已完成
+
+    仅用于分隔符格式的实时预览，最终结果仍以完整解析为准
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._current = None      # (段落名, 内容起始位置)
+        self._scan_from = 0
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """追加文本，返回本次新完成的段落 [(段落名, 内容)]"""
+        self.buffer += text
+        completed = []
+        # 只扫描完整的行，避免标题被切成两半
+        limit = self.buffer.rfind("\n") + 1
+        for match in _ANY_HEADER_RE.finditer(self.buffer, self._scan_from, limit):
+            if self._current:
+                name, start = self._current
+                completed.append((name, self.buffer[start:match.start()].strip()))
+            header = _HEADER_RE.match(self.buffer, match.start(), match.end())
+            self._current = (header.group(1), match.end()) if header else None
+            self._scan_from = match.end()
+        self._scan_from = max(self._scan_from, limit - 1 if limit else 0)
+        return completed
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """流结束，返回最后一个未完成的段落"""
+        completed = self.feed("\n")
+        if self._current:
+            name, start = self._current
+            completed.append((name, self.buffer[start:].strip()))
+            self._current = None
+        return completed
+
+
+class ThinkTagSplitter:
+    """
+    流式思考内容分离：部分代理把思考过程以 <think>...</think> 内联在正文开头，
+    增量喂入文本，分别返回思考内容与正文（标签被切成两半时暂存，等待后续文本）
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "start"     # start: 尚未确定是否有思考块；think: 思考块内；answer: 正文
+        self._strip = False       # 思考块之后的正文去除开头空白
+
+    def feed(self, text: str) -> Tuple[str, str]:
+        """追加文本，返回 (新增思考内容, 新增正文)"""
+        if self._state == "answer":
+            if self._strip:
+                text = text.lstrip()
+                self._strip = not text
+            return "", text
+        self._buffer += text
+
+        if self._state == "start":
+            head = self._buffer.lstrip()
+            if self.OPEN.startswith(head):
+                return "", ""
+            if not head.startswith(self.OPEN):
+                self._state = "answer"
+                answer, self._buffer = self._buffer, ""
+                return "", answer
+            self._state = "think"
+            self._buffer = head[len(self.OPEN):]
+
+        end = self._buffer.find(self.CLOSE)
+        if end >= 0:
+            reasoning, answer = self._buffer[:end], self._buffer[end + len(self.CLOSE):]
+            self._state = "answer"
+            self._strip = True
+            self._buffer = ""
+            return reasoning, self.feed(answer)[1]
+        # 末尾可能是被切开的结束标签，暂存
+        keep = next(
+            (size for size in range(len(self.CLOSE) - 1, 0, -1) if self._buffer.endswith(self.CLOSE[:size])), 0
+        )
+        reasoning = self._buffer[:len(self._buffer) - keep]
+        self._buffer = self._buffer[len(self._buffer) - keep:]
+        return reasoning, ""
+
+    def finish(self) -> Tuple[str, str]:
+        """流结束，返回暂存的内容（未闭合的思考块视为思考内容）"""
+        pending, self._buffer = self._buffer, ""
+        if self._state == "think":
+            return pending, ""
+        return "", pending
+
+
+def build_response_schema(requested: List[str]) -> dict:
+    """构建 response_format 使用的 JSON Schema"""
+    properties = {
+        name: {"type": "object"} if name in JSON_SECTIONS else {"type": "string"}
+        for name in requested
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "skill_prompt",
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(requested),
+            },
+        },
+    }
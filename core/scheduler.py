@@ -0,0 +1,298 @@
+"""
+LLM 调用调度器 - PromptEngine 的所有 LLM 调用经此排队
+- 优先级：interactive（节点、流式预览）先于 batch（批量节点、命令行）
+- 配额：每个 api_key 的并发上限与 token 速率（令牌桶，按请求前估算扣除，结束后按实际输出校正）
+- 公平排队：同一优先级内按各 api_key 已获得的 token 数（虚拟时间）轮转，单个 key 的大量请求不会饿死其他 key
+- 指标：各优先级与各 key 的排队深度、在途数、等待时间
+"""
+
+import hashlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# 优先级（数值越小越先调度）
+PRIORITIES = {"interactive": 0, "batch": 1}
+DEFAULT_PRIORITY = "interactive"
+
+# 等待时间统计保留的最近样本数
+WAIT_SAMPLES = 1000
+
+
+class Ticket:
+    """一次排队中的调用"""
+
+    __slots__ = ("key", "priority", "tokens", "enqueued_at", "granted", "wait", "actual_tokens")
+
+    def __init__(self, key: str, priority: int, tokens: int):
+        self.key = key
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.wait = 0.0
+        # 调用结束后由调用方填入实际 token 数，用于校正令牌桶
+        self.actual_tokens: Optional[int] = None
+
+
+class _KeyState:
+    """单个 api_key 的配额与队列"""
+
+    def __init__(self, concurrency: int, tokens_per_minute: int):
+        self.concurrency = concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.bucket = float(tokens_per_minute)
+        self.refilled_at = time.monotonic()
+        self.active = 0
+        self.queues = {priority: deque() for priority in PRIORITIES.values()}
+        self.virtual_time = {priority: 0.0 for priority in PRIORITIES.values()}
+        self.granted = 0
+        self.tokens = 0
+
+    def refill(self, now: float):
+        if self.tokens_per_minute:
+            self.bucket = min(
+                self.tokens_per_minute,
+                self.bucket + (now - self.refilled_at) * self.tokens_per_minute / 60
+            )
+        self.refilled_at = now
+
+    def token_wait(self, tokens: int) -> float:
+        """令牌足够时返回 0，否则返回还需等待的秒数（超过桶容量的请求等桶满即可）"""
+        if not self.tokens_per_minute:
+            return 0.0
+        needed = min(tokens, self.tokens_per_minute)
+        if self.bucket >= needed:
+            return 0.0
+        return (needed - self.bucket) * 60 / self.tokens_per_minute
+
+
+def _mask(key: str) -> str:
+    """指标中不暴露 api_key 原文"""
+    if not key:
+        return "(none)"
+    return f"{key[:4]}…{hashlib.sha256(key.encode('utf-8')).hexdigest()[:6]}"
+
+
+class LLMScheduler:
+    """
+    调度器（线程安全）
+
+    用法：
+        with scheduler.slot(api_key, "batch", tokens=estimate) as ticket:
+            result = call()
+            ticket.actual_tokens = used
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        key_concurrency: int = 8,
+        key_tokens_per_minute: int = 0,
+        key_quotas: Dict[str, Dict] = None,
+        queue_timeout: float = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.key_concurrency = key_concurrency
+        self.key_tokens_per_minute = key_tokens_per_minute
+        self.key_quotas = key_quotas or {}
+        self.queue_timeout = queue_timeout
+        self._keys: Dict[str, _KeyState] = {}
+        self._running = 0
+        # 各优先级的系统虚拟时间（最近一次调度的起始虚拟时间）
+        self._clock = {priority: 0.0 for priority in PRIORITIES.values()}
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITIES.values()}
+        self._granted = {priority: 0 for priority in PRIORITIES.values()}
+        self._timeouts = 0
+        self._retry_after: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def _state(self, key: str) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            quota = self.key_quotas.get(key, {})
+            state = _KeyState(
+                quota.get("concurrency", self.key_concurrency),
+                quota.get("tokens_per_minute", self.key_tokens_per_minute)
+            )
+            self._keys[key] = state
+        return state
+
+    # =========================================================================
+    # 排队与调度
+    # =========================================================================
+
+    @contextmanager
+    def slot(self, api_key: str, priority: str = DEFAULT_PRIORITY, tokens: int = 0):
+        """排队直到获得调用许可；退出时释放并发与校正令牌"""
+        ticket = self._enqueue(api_key or "", PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY]), tokens)
+        try:
+            self._wait(ticket)
+        except BaseException:
+            self._cancel(ticket)
+            raise
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def _enqueue(self, key: str, priority: int, tokens: int) -> Ticket:
+        ticket = Ticket(key, priority, max(0, int(tokens)))
+        with self._cond:
+            state = self._state(key)
+            queue = state.queues[priority]
+            if not queue:
+                # 重新变为积压的 key 从当前系统虚拟时间开始，不能攒下空闲期的份额
+                state.virtual_time[priority] = max(state.virtual_time[priority], self._clock[priority])
+            queue.append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _wait(self, ticket: Ticket):
+        deadline = ticket.enqueued_at + self.queue_timeout if self.queue_timeout else None
+        with self._cond:
+            while not ticket.granted:
+                timeout = self._retry_after
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise TimeoutError(f"LLM 调用排队超时（{self.queue_timeout:g} 秒）")
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                self._cond.wait(timeout)
+                self._dispatch()
+
+    def _cancel(self, ticket: Ticket):
+        with self._cond:
+            if ticket.granted:
+                self._release_locked(ticket)
+            else:
+                self._keys[ticket.key].queues[ticket.priority].remove(ticket)
+                self._dispatch()
+
+    def _release(self, ticket: Ticket):
+        with self._cond:
+            self._release_locked(ticket)
+
+    def _release_locked(self, ticket: Ticket):
+        state = self._keys[ticket.key]
+        state.active -= 1
+        self._running -= 1
+        if ticket.actual_tokens is not None:
+            state.tokens += ticket.actual_tokens - ticket.tokens
+            if state.tokens_per_minute:
+                # 按实际用量校正预扣的令牌（可为负，之后的请求等待补足）
+                state.refill(time.monotonic())
+                state.bucket = min(state.tokens_per_minute, state.bucket + ticket.tokens - ticket.actual_tokens)
+        self._dispatch()
+
+    def _dispatch(self):
+        """在锁内尽可能多地授予许可；严格按优先级，同优先级内选虚拟时间最小的 key"""
+        now = time.monotonic()
+        self._retry_after = None
+        granted = False
+        while self._running < self.max_concurrency:
+            chosen = None
+            for priority in sorted(PRIORITIES.values()):
+                for state in self._keys.values():
+                    queue = state.queues[priority]
+                    if not queue or state.active >= state.concurrency:
+                        continue
+                    state.refill(now)
+                    wait = state.token_wait(queue[0].tokens)
+                    if wait:
+                        if self._retry_after is None or wait < self._retry_after:
+                            self._retry_after = wait
+                        continue
+                    if chosen is None or state.virtual_time[priority] < chosen.virtual_time[priority]:
+                        chosen = state
+                if chosen is not None:
+                    break
+            if chosen is None:
+                break
+
+            ticket = chosen.queues[priority].popleft()
+            ticket.granted = True
+            ticket.wait = now - ticket.enqueued_at
+            self._clock[priority] = chosen.virtual_time[priority]
+            chosen.virtual_time[priority] += max(1, ticket.tokens)
+            chosen.active += 1
+            chosen.granted += 1
+            chosen.tokens += ticket.tokens
+            if chosen.tokens_per_minute:
+                chosen.bucket -= ticket.tokens
+            self._running += 1
+            self._granted[priority] += 1
+            self._waits[priority].append(ticket.wait)
+            granted = True
+
+        if granted:
+            self._cond.notify_all()
+
+    # =========================================================================
+    # 指标
+    # =========================================================================
+
+    def stats(self) -> Dict:
+        """排队深度、在途数与等待时间（毫秒）"""
+        names = {value: name for name, value in PRIORITIES.items()}
+        with self._cond:
+            classes = {}
+            for priority, name in names.items():
+                waits = sorted(self._waits[priority])
+                classes[name] = {
+                    "queued": sum(len(state.queues[priority]) for state in self._keys.values()),
+                    "granted": self._granted[priority],
+                    "wait_ms": {
+                        "mean": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                        "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                        "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                        "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+                    },
+                }
+            keys = {
+                _mask(key): {
+                    "active": state.active,
+                    "concurrency": state.concurrency,
+                    "queued": {names[p]: len(queue) for p, queue in state.queues.items()},
+                    "granted": state.granted,
+                    "tokens": state.tokens,
+                    "tokens_available": round(state.bucket) if state.tokens_per_minute else None,
+                }
+                for key, state in self._keys.items()
+            }
+            return {
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "timeouts": self._timeouts,
+                "classes": classes,
+                "keys": keys,
+            }
+
+
+_SCHEDULER: Optional[LLMScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> Optional[LLMScheduler]:
+    """进程内共享的调度器（config.SCHEDULER_ENABLED 关闭时返回 None）"""
+    global _SCHEDULER
+    from ..config import (
+        SCHEDULER_ENABLED, SCHEDULER_MAX_CONCURRENCY, SCHEDULER_KEY_CONCURRENCY,
+        SCHEDULER_KEY_TOKENS_PER_MINUTE, SCHEDULER_KEY_QUOTAS, SCHEDULER_QUEUE_TIMEOUT
+    )
+
+    if not SCHEDULER_ENABLED:
+        return None
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = LLMScheduler(
+                max_concurrency=SCHEDULER_MAX_CONCURRENCY,
+                key_concurrency=SCHEDULER_KEY_CONCURRENCY,
+                key_tokens_per_minute=SCHEDULER_KEY_TOKENS_PER_MINUTE,
+                key_quotas=SCHEDULER_KEY_QUOTAS,
+                queue_timeout=SCHEDULER_QUEUE_TIMEOUT
+            )
+    return _SCHEDULER
@@ -0,0 +1,83 @@
+"""
+文本相似度 - 基于字符 n-gram（shingle）Jaccard 的近似重复检测
+用于元素学习去重与元素库压缩
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+
+# 归一化：只保留字母数字与中文
+_NORMALIZE_RE = re.compile(r'[^0-9a-z一-鿿]+')
+
+# 默认近似重复阈值
+DUPLICATE_THRESHOLD = 0.6
+
+
+def normalize(text: str) -> str:
+    return _NORMALIZE_RE.sub(' ', (text or '').lower()).strip()
+
+
+def shingles(text: str, n: int = 3) -> FrozenSet[str]:
+    """字符 n-gram 集合（归一化后计算，短文本整体作为一个 shingle）"""
+    text = normalize(text)
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """
+    近似重复索引
+
+    倒排索引按 shingle 召回候选，只对共享 shingle 的文本计算 Jaccard
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD, n: int = 3):
+        self.threshold = threshold
+        self.n = n
+        self._shingles: Dict[Hashable, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[Hashable]] = defaultdict(set)
+
+    def __len__(self):
+        return len(self._shingles)
+
+    def add(self, key: Hashable, text: str):
+        grams = shingles(text, self.n)
+        self._shingles[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def remove(self, key: Hashable):
+        for gram in self._shingles.pop(key, ()):
+            self._postings[gram].discard(key)
+
+    def find(self, text: str) -> Optional[Tuple[Hashable, float]]:
+        """返回最相似且达到阈值的 (键, 相似度)，没有时返回 None"""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
+
+    def find_all(self, text: str) -> List[Tuple[Hashable, float]]:
+        """返回所有达到阈值的 (键, 相似度)，按相似度降序"""
+        grams = shingles(text, self.n)
+        if not grams:
+            return []
+        overlap = defaultdict(int)
+        for gram in grams:
+            for key in self._postings.get(gram, ()):
+                overlap[key] += 1
+
+        matches = []
+        for key, shared in overlap.items():
+            other = self._shingles[key]
+            score = shared / (len(grams) + len(other) - shared)
+            if score >= self.threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda item: item[1], reverse=True)
+        return matches
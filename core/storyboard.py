@@ -0,0 +1,95 @@
+"""
+视频分镜 - 把一段视频描述拆成 N 个镜头（建立镜头、动作镜头、收尾镜头）
+- 镜头规划：按镜头角色为每个镜头安排运镜与转场，相邻镜头不重复运镜
+- 连续性设定：从建立镜头的输出中提取人物、造型与光影短语，作为其余镜头的共同设定
+"""
+
+import random
+from typing import Dict, List, Optional
+
+from .local_json import LocalJsonBuilder
+
+# 镜头角色：(名称, 可选运镜, 可选转场)；取值与 VideoPromptNode 的选项一致
+SHOT_ROLES = {
+    "establishing": ("建立镜头", ("拉", "升降", "环绕"), ("淡入淡出",)),
+    "action": ("动作镜头", ("跟", "推", "摇", "移", "环绕"), ("硬切", "溶解", "擦除")),
+    "closing": ("收尾镜头", ("拉", "升降"), ("淡入淡出", "溶解")),
+}
+
+# 连续性设定取用的 JSON 分区及每个分区的最多短语数
+CONTINUITY_SECTIONS = ("subject", "styling", "lighting")
+CONTINUITY_PHRASES = 4
+
+_AUTO = "自动"
+
+
+def shot_roles(shot_count: int) -> List[str]:
+    """镜头角色序列：首个为建立镜头，最后一个为收尾镜头，其余为动作镜头"""
+    if shot_count <= 1:
+        return ["establishing"][:shot_count]
+    return ["establishing"] + ["action"] * (shot_count - 2) + ["closing"]
+
+
+def plan_shots(shot_count: int, options: dict = None, seed: int = None) -> List[Dict]:
+    """
+    规划分镜
+
+    用户指定的运镜 / 转场（非"自动"）用于所有镜头；"自动"时按镜头角色挑选，
+    相同种子得到相同的规划
+
+    Returns:
+        [{"index", "role", "role_name", "camera_movement", "transition"}]
+    """
+    options = options or {}
+    rng = random.Random(seed)
+    shots = []
+    previous = None
+    for index, role in enumerate(shot_roles(shot_count), 1):
+        role_name, movements, transitions = SHOT_ROLES[role]
+
+        movement = options.get("camera_movement", _AUTO)
+        if movement == _AUTO:
+            candidates = [m for m in movements if m != previous] or list(movements)
+            movement = rng.choice(candidates)
+        transition = options.get("transition", _AUTO)
+        if transition == _AUTO:
+            transition = rng.choice(transitions)
+
+        shots.append({
+            "index": index,
+            "role": role,
+            "role_name": role_name,
+            "camera_movement": movement,
+            "transition": transition,
+        })
+        previous = movement
+    return shots
+
+
+def shot_input(description: str, shot: Dict, shot_count: int, continuity: str = "") -> str:
+    """单个镜头的用户输入：原描述 + 镜头要求 + 连续性设定"""
+    lines = [
+        description,
+        f"【分镜 {shot['index']}/{shot_count} · {shot['role_name']}】"
+        f"运镜：{shot['camera_movement']}；转场：{shot['transition']}。只描述这一个镜头的画面",
+    ]
+    if continuity:
+        lines.append(f"【连续性设定】以下人物、造型与光影在所有镜头中保持一致：{continuity}")
+    return "\n".join(lines)
+
+
+def extract_continuity(builder: LocalJsonBuilder, result: Dict) -> Optional[str]:
+    """从建立镜头的结果中提取人物、造型与光影短语（优先英文自然语言）"""
+    for key, lang in (("prompt_natural_en", "en"), ("prompt_natural_cn", "cn")):
+        text = result.get(key)
+        if not text:
+            continue
+        sections = builder.build(text, lang)
+        phrases = [
+            phrase
+            for name in CONTINUITY_SECTIONS
+            for phrase in sections.get(name, [])[:CONTINUITY_PHRASES]
+        ]
+        if phrases:
+            return ("; " if lang == "en" else "；").join(phrases)
+    return None
@@ -0,0 +1,23 @@
+"""
+Token 估算工具
+在拿不到接口 usage 时，用字符统计近似估算 token 数
+"""
+
+import math
+import re
+
+# CJK 统一表意文字、全角标点
+_CJK_RE = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    经验值：中文约 1 字 1 token，英文及符号约 4 字符 1 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + math.ceil(other / 4)
@@ -0,0 +1,319 @@
+"""
+LLM 调用的录制 / 回放 - 用真实流量形态做可复现的性能测试（离线可运行）
+- live:   直连接口（默认）
+- record: 直连接口，同时把请求与每个流式 chunk 及其到达时间写入夹具文件
+- replay: 不访问网络，按夹具以原始或缩放后的时间间隔回放 chunk；对调用方仍是 OpenAI 客户端接口
+
+夹具按请求内容（模型、消息、response_format 等）的哈希命名，每个请求一个 JSON 文件；
+不记录 api_key。相同输入与种子得到相同的系统提示词，因此 PromptEngine 的运行可以精确回放。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+TRANSPORT_MODES = ("live", "record", "replay")
+# 回放时找不到完全匹配的夹具：exact 报错；loose 依次按 (模型, 用户消息)、模型、任意夹具轮转匹配
+REPLAY_MATCH_MODES = ("exact", "loose")
+FIXTURE_VERSION = 2
+
+# 参与夹具匹配的请求参数：max_tokens 决定是否截断，extra_body 携带思考强度，均改变回放内容；
+# temperature、stream_options 等不参与
+_KEY_PARAMS = ("model", "messages", "response_format", "stream", "max_tokens", "extra_body")
+
+# 运行时覆盖 config 中的传输设置（脚本与测试使用，见 set_transport）
+_OVERRIDE: Optional[Dict] = None
+
+
+class FixtureNotFoundError(LookupError):
+    """回放时没有与请求匹配的夹具"""
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m")
+
+
+def fixture_key(params: Dict) -> str:
+    payload = json.dumps(
+        {name: params.get(name) for name in _KEY_PARAMS},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def _user_message(params: Dict) -> str:
+    return next((m.get("content", "") for m in params.get("messages", []) if m.get("role") == "user"), "")
+
+
+def set_transport(mode: str = None, fixture_dir: str = None, time_scale: float = None, match: str = None):
+    """覆盖 config 中的传输设置（参数为 None 时沿用 config，全部为 None 时取消覆盖）"""
+    global _OVERRIDE
+    settings = {"mode": mode, "fixture_dir": fixture_dir, "time_scale": time_scale, "match": match}
+    _OVERRIDE = {k: v for k, v in settings.items() if v is not None} or None
+
+
+def get_transport() -> Dict:
+    """当前生效的传输设置 {"mode", "fixture_dir", "time_scale", "match"}"""
+    from ..config import LLM_TRANSPORT, LLM_FIXTURE_DIR, LLM_REPLAY_TIME_SCALE, LLM_REPLAY_MATCH
+
+    settings = {
+        "mode": LLM_TRANSPORT,
+        "fixture_dir": LLM_FIXTURE_DIR,
+        "time_scale": LLM_REPLAY_TIME_SCALE,
+        "match": LLM_REPLAY_MATCH,
+    }
+    settings.update(_OVERRIDE or {})
+    if settings["mode"] not in TRANSPORT_MODES:
+        raise ValueError(f"未知的 LLM 传输模式: {settings['mode']}")
+    return settings
+
+
+# =============================================================================
+# 夹具存储
+# =============================================================================
+
+class FixtureStore:
+    """夹具目录（线程安全）"""
+
+    def __init__(self, fixture_dir: str):
+        self.fixture_dir = fixture_dir
+        self._lock = threading.Lock()
+        self._index = None
+        self._cursor = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.fixture_dir, f"{key}.json")
+
+    def save(self, fixture: Dict):
+        os.makedirs(self.fixture_dir, exist_ok=True)
+        path = self.path(fixture["key"])
+        temp = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False)
+        os.replace(temp, path)
+        with self._lock:
+            self._index = None
+
+    def load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self.path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _build_index(self) -> Dict:
+        index = {"by_message": {}, "by_model": {}, "all": []}
+        if os.path.isdir(self.fixture_dir):
+            for name in sorted(os.listdir(self.fixture_dir)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.fixture_dir, name), encoding="utf-8") as f:
+                        fixture = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                key, request = fixture.get("key"), fixture.get("request", {})
+                index["by_message"].setdefault((request.get("model"), _user_message(request)), []).append(key)
+                index["by_model"].setdefault(request.get("model"), []).append(key)
+                index["all"].append(key)
+        return index
+
+    def find(self, params: Dict, match: str = "exact") -> Dict:
+        """
+        查找与请求匹配的夹具
+
+        Raises:
+            FixtureNotFoundError: 没有匹配的夹具
+        """
+        key = fixture_key(params)
+        fixture = self.load(key)
+        if fixture is not None or match != "loose":
+            if fixture is None:
+                raise FixtureNotFoundError(f"没有匹配的夹具 {self.path(key)}（模型 {params.get('model')}）")
+            return fixture
+
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            candidates = (
+                self._index["by_message"].get((params.get("model"), _user_message(params)))
+                or self._index["by_model"].get(params.get("model"))
+                or self._index["all"]
+            )
+            if not candidates:
+                raise FixtureNotFoundError(f"夹具目录为空: {self.fixture_dir}")
+            # 多个候选时轮转，保留真实流量中的时间分布
+            chosen = candidates[self._cursor % len(candidates)]
+            self._cursor += 1
+        return self.load(chosen)
+
+
+# =============================================================================
+# 录制
+# =============================================================================
+
+def _dump(obj) -> Dict:
+    return obj.model_dump(mode="json", exclude_unset=True)
+
+
+def _request_record(params: Dict) -> Dict:
+    return json.loads(json.dumps(params, ensure_ascii=False, default=str))
+
+
+class RecordingStream:
+    """包装流式响应：透传 chunk，同时记录每个 chunk 相对请求发出时刻的到达时间"""
+
+    def __init__(self, stream, store: FixtureStore, fixture: Dict, started: float):
+        self._stream = stream
+        self._store = store
+        self._fixture = fixture
+        self._started = started
+
+    def __iter__(self):
+        chunks = self._fixture["chunks"]
+        for chunk in self._stream:
+            chunks.append({"t": round(time.monotonic() - self._started, 6), "chunk": _dump(chunk)})
+            yield chunk
+        self._fixture["duration"] = round(time.monotonic() - self._started, 6)
+        self._store.save(self._fixture)
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, store: FixtureStore, base_url: str):
+        self._completions = completions
+        self._store = store
+        self._base_url = base_url
+
+    def create(self, **params):
+        fixture = {
+            "version": FIXTURE_VERSION,
+            "key": fixture_key(params),
+            "base_url": self._base_url,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "request": _request_record(params),
+        }
+        started = time.monotonic()
+        response = self._completions.create(**params)
+        if params.get("stream"):
+            fixture["chunks"] = []
+            return RecordingStream(response, self._store, fixture, started)
+        fixture["duration"] = round(time.monotonic() - started, 6)
+        fixture["response"] = _dump(response)
+        self._store.save(fixture)
+        return response
+
+
+class RecordingClient:
+    """包装 OpenAI 客户端：chat.completions.create 的请求与响应写入夹具，其余属性透传"""
+
+    def __init__(self, client, store: FixtureStore, base_url: str):
+        self._client = client
+        self._store = store
+        self._base_url = base_url
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(client.chat.completions, store, base_url))
+
+    def with_options(self, **options):
+        return RecordingClient(self._client.with_options(**options), self._store, self._base_url)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# =============================================================================
+# 回放
+# =============================================================================
+
+class ReplayStream:
+    """按夹具中的到达时间（乘以 time_scale）逐个产出 chunk"""
+
+    def __init__(self, fixture: Dict, time_scale: float):
+        from openai.types.chat import ChatCompletionChunk
+
+        self._chunks = [(item["t"], ChatCompletionChunk.model_validate(item["chunk"])) for item in fixture["chunks"]]
+        self._time_scale = time_scale
+        self._started = time.monotonic()
+
+    def __iter__(self):
+        for offset, chunk in self._chunks:
+            if self._time_scale:
+                delay = self._started + offset * self._time_scale - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class _ReplayCompletions:
+    def __init__(self, store: FixtureStore, time_scale: float, match: str):
+        self._store = store
+        self._time_scale = time_scale
+        self._match = match
+
+    def create(self, **params):
+        fixture = self._store.find(params, self._match)
+        if "chunks" in fixture:
+            return ReplayStream(fixture, self._time_scale)
+
+        from openai.types.chat import ChatCompletion
+
+        if self._time_scale:
+            time.sleep(fixture.get("duration", 0.0) * self._time_scale)
+        return ChatCompletion.model_validate(fixture["response"])
+
+
+class ReplayClient:
+    """以 OpenAI 客户端接口回放夹具，不访问网络"""
+
+    def __init__(self, store: FixtureStore, time_scale: float = 1.0, match: str = "exact"):
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(store, time_scale, match))
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(data=[]))
+
+    def with_options(self, **options):
+        return self
+
+
+# =============================================================================
+# 客户端构造
+# =============================================================================
+
+_STORES: Dict[str, FixtureStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_fixture_store(fixture_dir: str) -> FixtureStore:
+    with _STORES_LOCK:
+        store = _STORES.get(fixture_dir)
+        if store is None:
+            store = _STORES[fixture_dir] = FixtureStore(fixture_dir)
+    return store
+
+
+def transport_client(create_live, base_url: str, settings: Dict):
+    """
+    按传输设置构造客户端
+
+    Args:
+        create_live: 构造真实 OpenAI 客户端的函数（replay 模式不调用）
+        settings: get_transport() 的返回值
+    """
+    mode = settings["mode"]
+    if mode == "live":
+        return create_live()
+    store = get_fixture_store(settings["fixture_dir"])
+    if mode == "record":
+        _log(f"LLM 调用录制到 {settings['fixture_dir']}")
+        return RecordingClient(create_live(), store, base_url)
+    _log(f"LLM 调用从 {settings['fixture_dir']} 回放（时间缩放 {settings['time_scale']:g}）")
+    return ReplayClient(store, settings["time_scale"], settings["match"])
+
@@ -0,0 +1,336 @@
+"""
+用量账本 - 记录每次 LLM 请求的 token 用量与费用，并执行预算
+- 用量来自流式响应的 usage，接口未返回时按字符估算（estimated 标记）
+- 写入独立的 SQLite 文件（默认 data/usage.db），不触发元素库热更新；
+  记录先进入内存队列，由后台线程批量提交，请求路径上不等待磁盘同步
+- 汇总：按日期、领域、模型等维度聚合
+- 预算：超出时告警（warn）、降级到更便宜的模型（downgrade）或拒绝调用（refuse）
+"""
+
+import atexit
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .model_profiles import ModelProfiles
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS usage_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        day TEXT NOT NULL,             -- 本地日期 YYYY-MM-DD
+        domain TEXT,
+        node TEXT,                     -- 调用来源：节点类名 / stream / bulk_generate / api
+        model TEXT,
+        requested_model TEXT,          -- 被预算降级时为原模型
+        sections TEXT,                 -- 请求的输出段落，如 natural_en,json_en
+        enhance INTEGER,
+        input_tokens INTEGER,
+        output_tokens INTEGER,         -- 含思考 token
+        reasoning_tokens INTEGER DEFAULT 0,
+        estimated INTEGER,             -- 1 表示按字符估算
+        cost REAL                      -- 美元；模型未登记价格时为 NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_usage_ledger_day ON usage_ledger(day, domain, model);
+"""
+
+# 旧版账本缺少的列：(列名, 定义)
+_MIGRATIONS = (
+    ("reasoning_tokens", "INTEGER DEFAULT 0"),
+)
+
+_INSERT_SQL = """
+    INSERT INTO usage_ledger (day, domain, node, model, requested_model, sections, enhance,
+                              input_tokens, output_tokens, reasoning_tokens, estimated, cost)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 可汇总的维度（estimated 分开实际用量与估算用量）
+ROLLUP_DIMENSIONS = ("day", "domain", "node", "model", "sections", "estimated")
+
+# 预算动作
+BUDGET_ACTIONS = ("warn", "downgrade", "refuse")
+
+
+class BudgetExceededError(RuntimeError):
+    """预算已用尽，调用被拒绝"""
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m")
+
+
+def _describe(budget: Dict) -> str:
+    scope = "/".join(budget[column] for column in ("domain", "model", "node") if budget.get(column)) or "全部"
+    if budget.get("limit_usd") is not None:
+        limit = f"${budget['limit_usd']}（已用 ${budget['spent_usd']}）"
+    else:
+        limit = f"{budget['limit_tokens']} tokens（已用 {budget['spent_tokens']}）"
+    return f"预算 [{budget.get('period', 'day')} {scope}] {limit}"
+
+
+def _today() -> str:
+    return datetime.date.today().isoformat()
+
+
+def _period_start(period: str) -> str:
+    today = datetime.date.today()
+    if period == "month":
+        return today.replace(day=1).isoformat()
+    if period == "week":
+        return (today - datetime.timedelta(days=today.weekday())).isoformat()
+    return today.isoformat()
+
+
+class UsageLedger:
+    """用量账本（线程安全，单连接；记录由后台线程批量写入）"""
+
+    def __init__(self, db_path: str, budgets: List[Dict] = None,
+                 flush_interval: float = 1.0, flush_batch: int = 64):
+        self.db_path = db_path
+        self.budgets = budgets or []
+        self.flush_interval = flush_interval
+        self.flush_batch = max(1, flush_batch)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._conn = None
+        self._pending = []        # 待写入的记录行
+        self._writer = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(usage_ledger)")}
+            for column, definition in _MIGRATIONS:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE usage_ledger ADD COLUMN {column} {definition}")
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # =========================================================================
+    # 记录
+    # =========================================================================
+
+    def record(
+        self,
+        domain: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        estimated: bool = False,
+        node: str = None,
+        sections: List[str] = (),
+        enhance: bool = True,
+        requested_model: str = None,
+        reasoning_tokens: int = 0
+    ) -> Optional[float]:
+        """
+        记录一次请求，返回估算费用（美元，价格未登记时为 None）
+
+        output_tokens 含思考 token（按输出价格计费），reasoning_tokens 为其中的思考部分
+        """
+        cost = ModelProfiles.estimate_cost(model, input_tokens, output_tokens)
+        row = (
+            _today(), domain, node or "api", model, requested_model or model, ",".join(sections),
+            int(bool(enhance)), int(input_tokens), int(output_tokens), int(reasoning_tokens or 0),
+            int(bool(estimated)), cost
+        )
+        with self._cond:
+            self._pending.append(row)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="usage-ledger-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+            if len(self._pending) == 1 or len(self._pending) >= self.flush_batch:
+                self._cond.notify()
+        return cost
+
+    def flush(self):
+        """立即写入队列中的全部记录"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            self.conn.executemany(_INSERT_SQL, rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            _log(f"用量写入失败，{len(rows)} 条记录未保存: {e}")
+
+    def _write_loop(self):
+        """后台写入：有记录后等待攒满一批或间隔结束，一次提交"""
+        with self._cond:
+            while True:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.flush_interval
+                while self._pending and len(self._pending) < self.flush_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._flush_locked()
+
+    # =========================================================================
+    # 汇总
+    # =========================================================================
+
+    def rollup(self, by=("day", "domain", "model"), since: str = None, until: str = None) -> List[Dict]:
+        """
+        按维度汇总用量
+
+        每行含 requests、input_tokens、output_tokens、reasoning_tokens、cost，
+        以及按字符估算（接口未返回 usage）的请求数 estimated_requests 与 token 数 estimated_tokens
+
+        Args:
+            by: ROLLUP_DIMENSIONS 中的维度
+            since / until: 日期范围（YYYY-MM-DD，含端点）
+        """
+        columns = [column for column in by if column in ROLLUP_DIMENSIONS]
+        where, params = [], []
+        if since:
+            where.append("day >= ?")
+            params.append(since)
+        if until:
+            where.append("day <= ?")
+            params.append(until)
+        select = ", ".join(columns + [
+            "COUNT(*) AS requests",
+            "SUM(input_tokens) AS input_tokens",
+            "SUM(output_tokens) AS output_tokens",
+            "SUM(reasoning_tokens) AS reasoning_tokens",
+            "SUM(estimated) AS estimated_requests",
+            "SUM(CASE WHEN estimated THEN input_tokens + output_tokens ELSE 0 END) AS estimated_tokens",
+            "SUM(cost) AS cost",
+        ])
+        sql = f"SELECT {select} FROM usage_ledger"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if columns:
+            sql += f" GROUP BY {', '.join(columns)} ORDER BY {', '.join(columns)}"
+        with self._lock:
+            self._flush_locked()
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def spent(self, since: str, domain: str = None, model: str = None, node: str = None) -> Tuple[int, float]:
+        """since 以来（含）的 (token 总数, 费用)"""
+        where, params = ["day >= ?"], [since]
+        for column, value in (("domain", domain), ("model", model), ("node", node)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        with self._lock:
+            self._flush_locked()
+            row = self.conn.execute(f"""
+                SELECT COALESCE(SUM(input_tokens + output_tokens), 0), COALESCE(SUM(cost), 0)
+                FROM usage_ledger WHERE {' AND '.join(where)}
+            """, params).fetchone()
+        return row[0], row[1]
+
+    # =========================================================================
+    # 预算
+    # =========================================================================
+
+    def check_budgets(
+        self,
+        domain: str,
+        model: str,
+        node: str = None,
+        estimated_tokens: int = 0,
+        estimated_cost: float = None
+    ) -> Optional[Dict]:
+        """
+        检查本次请求是否会超出预算
+
+        预算项：{"period": "day"/"week"/"month", "limit_usd" 或 "limit_tokens",
+                 可选过滤 "domain"/"model"/"node", "action": warn/downgrade/refuse, "downgrade_to": 模型}
+
+        Returns:
+            命中的最严格的预算（refuse > downgrade > warn）及其用量，没有超出时返回 None
+        """
+        exceeded = None
+        for budget in self.budgets:
+            if any(budget.get(column) and budget[column] != value
+                   for column, value in (("domain", domain), ("model", model), ("node", node))):
+                continue
+            tokens, cost = self.spent(
+                _period_start(budget.get("period", "day")),
+                budget.get("domain"), budget.get("model"), budget.get("node")
+            )
+            over = False
+            if budget.get("limit_tokens") is not None:
+                over = tokens + estimated_tokens > budget["limit_tokens"]
+            if budget.get("limit_usd") is not None:
+                over = over or cost + (estimated_cost or 0.0) > budget["limit_usd"]
+            if not over:
+                continue
+            action = budget.get("action", "warn")
+            if exceeded is None or BUDGET_ACTIONS.index(action) > BUDGET_ACTIONS.index(exceeded["action"]):
+                exceeded = dict(budget, action=action, spent_tokens=tokens, spent_usd=round(cost, 6))
+        return exceeded
+
+    def enforce(
+        self,
+        domain: str,
+        model: str,
+        node: str = None,
+        estimated_tokens: int = 0,
+        estimated_cost: float = None
+    ) -> Tuple[str, Optional[Dict]]:
+        """
+        执行预算
+
+        Returns:
+            (本次使用的模型, 命中的预算或 None)；downgrade 时返回 downgrade_to 指定的模型
+
+        Raises:
+            BudgetExceededError: 命中 action 为 refuse 的预算
+        """
+        budget = self.check_budgets(domain, model, node, estimated_tokens, estimated_cost)
+        if budget is None:
+            return model, None
+
+        action = budget["action"]
+        if action == "refuse":
+            raise BudgetExceededError(f"超出{_describe(budget)}，调用被拒绝")
+        if action == "downgrade" and budget.get("downgrade_to") and budget["downgrade_to"] != model:
+            _log(f"超出{_describe(budget)}，{model} 降级为 {budget['downgrade_to']}")
+            return budget["downgrade_to"], budget
+        _log(f"超出{_describe(budget)}")
+        return model, budget
+
+
+_LEDGER: Optional[UsageLedger] = None
+_LEDGER_LOCK = threading.Lock()
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """进程内共享的用量账本（config.USAGE_LEDGER_ENABLED 关闭时返回 None）"""
+    global _LEDGER
+    from ..config import USAGE_LEDGER_ENABLED, USAGE_DB_PATH, USAGE_BUDGETS, USAGE_FLUSH_INTERVAL, USAGE_FLUSH_BATCH
+
+    if not USAGE_LEDGER_ENABLED:
+        return None
+    with _LEDGER_LOCK:
+        if _LEDGER is None:
+            _LEDGER = UsageLedger(USAGE_DB_PATH, USAGE_BUDGETS, USAGE_FLUSH_INTERVAL, USAGE_FLUSH_BATCH)
+    return _LEDGER
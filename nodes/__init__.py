@@ -1,13 +1,19 @@
-from .portrait_node import PortraitPromptNode
-from .art_node import ArtPromptNode
-from .design_node import DesignPromptNode
-from .product_node import ProductPromptNode
-from .video_node import VideoPromptNode
+from .portrait_node import PortraitPromptNode, PortraitPromptBatchNode
+from .art_node import ArtPromptNode, ArtPromptBatchNode
+from .design_node import DesignPromptNode, DesignPromptBatchNode
+from .product_node import ProductPromptNode, ProductPromptBatchNode
+from .video_node import VideoPromptNode, VideoPromptBatchNode, VideoStoryboardNode
 
 __all__ = [
     'PortraitPromptNode',
     'ArtPromptNode',
     'DesignPromptNode',
     'ProductPromptNode',
-    'VideoPromptNode'
+    'VideoPromptNode',
+    'PortraitPromptBatchNode',
+    'ArtPromptBatchNode',
+    'DesignPromptBatchNode',
+    'ProductPromptBatchNode',
+    'VideoPromptBatchNode',
+    'VideoStoryboardNode'
 ]
@@ -0,0 +1,214 @@
+"""
+提示词生成节点基类
+五个领域节点共享的输入定义与生成流程
+"""
+
+from ..config import (
+    DB_PATH, DEFAULT_API_BASE_URL, DEFAULT_API_KEY, DEFAULT_MODEL, AVAILABLE_MODELS,
+    JSON_MODES, DEFAULT_JSON_MODE, CN_MODES, DEFAULT_CN_MODE, RESPONSE_MODES, DEFAULT_RESPONSE_MODE,
+    REASONING_EFFORTS, DEFAULT_REASONING_EFFORT,
+    BATCH_MAX_WORKERS, CONTEXT_TOKEN_BUDGET
+)
+from ..core.prompt_engine import PromptEngine
+from ..core.element_index import get_element_snapshot
+from ..comfy_server import make_partial_pusher
+
+
+class BasePromptNode:
+    """领域提示词节点基类，子类只需声明领域、默认描述和领域选项"""
+
+    DOMAIN = ""
+    DEFAULT_DESCRIPTION = ""
+    # 领域选项：{参数名: [可选值, ...]}，第一个值为默认值
+    OPTION_INPUTS = {}
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("prompt_natural_en", "prompt_natural_cn", "prompt_json_en", "prompt_json_cn")
+    FUNCTION = "generate"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        optional = {
+            name: (choices, {"default": choices[0]})
+            for name, choices in cls.OPTION_INPUTS.items()
+        }
+        optional["json_mode"] = (JSON_MODES, {"default": DEFAULT_JSON_MODE})
+        optional["cn_mode"] = (CN_MODES, {"default": DEFAULT_CN_MODE})
+        optional["auto_repair"] = ("BOOLEAN", {"default": False})
+        optional["post_process"] = ("BOOLEAN", {"default": False})
+        optional["response_mode"] = (RESPONSE_MODES, {"default": DEFAULT_RESPONSE_MODE})
+        optional["reasoning_effort"] = (REASONING_EFFORTS, {"default": DEFAULT_REASONING_EFFORT})
+        optional["seed"] = ("INT", {
+            "default": 0, "min": 0, "max": 0xffffffffffffffff, "control_after_generate": "fixed"
+        })
+        optional["use_endpoint_pool"] = ("BOOLEAN", {"default": True})
+        optional["cascade"] = ("BOOLEAN", {"default": False})
+        optional["context_token_budget"] = ("INT", {
+            "default": CONTEXT_TOKEN_BUDGET, "min": 0, "max": 8192, "step": 16
+        })
+
+        return {
+            "required": {
+                "description": ("STRING", {
+                    "multiline": True,
+                    "default": cls.DEFAULT_DESCRIPTION
+                }),
+                "api_base_url": ("STRING", {
+                    "default": DEFAULT_API_BASE_URL,
+                    "multiline": False
+                }),
+                "api_key": ("STRING", {
+                    "default": DEFAULT_API_KEY,
+                    "multiline": False
+                }),
+                "model": (AVAILABLE_MODELS, {
+                    "default": DEFAULT_MODEL
+                }),
+                "output_natural_en": ("BOOLEAN", {"default": True}),
+                "output_natural_cn": ("BOOLEAN", {"default": False}),
+                "output_json_en": ("BOOLEAN", {"default": False}),
+                "output_json_cn": ("BOOLEAN", {"default": False}),
+                "enable_enhance": ("BOOLEAN", {"default": True}),
+            },
+            "optional": optional,
+            "hidden": {
+                "unique_id": "UNIQUE_ID"
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **inputs):
+        """
+        元素库快照版本：输入不变时 ComfyUI 直接复用缓存输出（seed 默认固定，需要重新生成时修改 seed），
+        元素库热更新后元素上下文随之变化，节点重新执行
+        """
+        return get_element_snapshot(DB_PATH).generation
+
+    def collect_options(self, option_values: dict) -> dict:
+        """按 OPTION_INPUTS 收集领域选项，未传入的使用默认值"""
+        return {
+            name: option_values.get(name, choices[0])
+            for name, choices in self.OPTION_INPUTS.items()
+        }
+
+    def build_request(
+        self,
+        description: str,
+        api_base_url: str,
+        api_key: str,
+        model: str,
+        output_natural_en: bool,
+        output_natural_cn: bool,
+        output_json_en: bool,
+        output_json_cn: bool,
+        enable_enhance: bool,
+        json_mode: str = DEFAULT_JSON_MODE,
+        auto_repair: bool = False,
+        response_mode: str = DEFAULT_RESPONSE_MODE,
+        seed: int = 0,
+        use_endpoint_pool: bool = True,
+        context_token_budget: int = CONTEXT_TOKEN_BUDGET,
+        cascade: bool = False,
+        cn_mode: str = DEFAULT_CN_MODE,
+        reasoning_effort: str = DEFAULT_REASONING_EFFORT,
+        post_process: bool = False,
+        **option_values
+    ) -> dict:
+        """将节点输入转换为 PromptEngine.generate() 的参数"""
+        return {
+            "user_input": description,
+            "domain": self.DOMAIN,
+            "api_base_url": api_base_url,
+            "api_key": api_key,
+            "model": model,
+            "options": self.collect_options(option_values),
+            "output_natural_en": output_natural_en,
+            "output_natural_cn": output_natural_cn,
+            "output_json_en": output_json_en,
+            "output_json_cn": output_json_cn,
+            "enable_enhance": enable_enhance,
+            "json_mode": json_mode,
+            "auto_repair": auto_repair,
+            "response_mode": response_mode,
+            "seed": seed,
+            "use_endpoint_pool": use_endpoint_pool,
+            "context_token_budget": context_token_budget,
+            "source": type(self).__name__,
+            "cascade": cascade,
+            "cn_mode": cn_mode,
+            "reasoning_effort": reasoning_effort,
+            "post_process": post_process,
+        }
+
+    @staticmethod
+    def unpack_result(result: dict) -> tuple:
+        return (
+            result.get("prompt_natural_en", ""),
+            result.get("prompt_natural_cn", ""),
+            result.get("prompt_json_en", ""),
+            result.get("prompt_json_cn", "")
+        )
+
+    def generate(self, unique_id=None, **inputs):
+        request = self.build_request(**inputs)
+        # 流式文本实时推送到前端节点（仅在 ComfyUI 内生效）
+        pusher = make_partial_pusher(unique_id)
+
+        engine = PromptEngine()
+        try:
+            result = engine.generate(on_delta=pusher, **request)
+        finally:
+            engine.close()
+            if pusher:
+                pusher.done()
+
+        return self.unpack_result(result)
+
+
+class BatchPromptNodeMixin:
+    """
+    列表输入批量生成（与领域节点组合使用）
+
+    所有输入以列表形式传入，长度不足的列表重复最后一个值（与 ComfyUI 列表展开规则一致），
+    任一输入为空列表时整批为空，各输出均为空列表；
+    整批共享一个引擎并发调用 LLM，输出与输入对齐的列表，单条失败输出空字符串并记录到 errors。
+    """
+
+    INPUT_IS_LIST = True
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("prompt_natural_en", "prompt_natural_cn", "prompt_json_en", "prompt_json_cn", "errors")
+    OUTPUT_IS_LIST = (True, True, True, True, True)
+    FUNCTION = "generate_batch"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        types = super().INPUT_TYPES()
+        types["optional"]["max_concurrency"] = ("INT", {
+            "default": BATCH_MAX_WORKERS, "min": 1, "max": 32
+        })
+        return types
+
+    def generate_batch(self, max_concurrency: list = None, unique_id: list = None, **inputs):
+        max_workers = max_concurrency[0] if max_concurrency else BATCH_MAX_WORKERS
+        outputs = ([], [], [], [], [])
+        if not inputs or not all(inputs.values()):
+            return outputs
+        size = max(len(values) for values in inputs.values())
+
+        requests = [
+            self.build_request(**{
+                name: values[min(i, len(values) - 1)] for name, values in inputs.items()
+            })
+            for i in range(size)
+        ]
+
+        engine = PromptEngine()
+        try:
+            results = engine.generate_batch(requests, max_workers=max_workers)
+        finally:
+            engine.close()
+
+        for result in results:
+            for column, value in zip(outputs, self.unpack_result(result) + (result.get("error", ""),)):
+                column.append(value)
+        return outputs
@@ -2,95 +2,73 @@
 视频提示词生成节点
 """
 
-from ..config import DEFAULT_API_BASE_URL, DEFAULT_API_KEY, DEFAULT_MODEL, AVAILABLE_MODELS
+from ..config import BATCH_MAX_WORKERS, STORYBOARD_SHOTS
 from ..core.prompt_engine import PromptEngine
+from ..comfy_server import make_partial_pusher
+from .base_node import BasePromptNode, BatchPromptNodeMixin
 
 
-class VideoPromptNode:
+class VideoPromptNode(BasePromptNode):
     """视频提示词生成器"""
 
+    DOMAIN = "video"
+    DEFAULT_DESCRIPTION = "武侠场景，人物飞檐走壁"
+    OPTION_INPUTS = {
+        "camera_movement": ["自动", "推", "拉", "摇", "移", "跟", "升降", "环绕"],
+        "transition": ["自动", "淡入淡出", "硬切", "溶解", "擦除", "缩放"],
+        "mood": ["自动", "紧张", "平静", "欢快", "悲伤", "史诗"],
+        "speed": ["自动", "正常", "慢动作", "快动作", "延时"],
+    }
+    CATEGORY = "Skill Prompt/视频"
+
+
+class VideoPromptBatchNode(BatchPromptNodeMixin, VideoPromptNode):
+    """视频提示词批量生成器（列表输入）"""
+
+
+class VideoStoryboardNode(VideoPromptNode):
+    """
+    视频分镜生成器（列表输出）
+
+    一段描述生成建立镜头、动作镜头、收尾镜头共 shot_count 个镜头的提示词；
+    运镜 / 转场为"自动"时按镜头角色逐镜头安排，人物与光影沿用建立镜头的设定
+    """
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("prompt_natural_en", "prompt_natural_cn", "prompt_json_en", "prompt_json_cn", "shots")
+    OUTPUT_IS_LIST = (True, True, True, True, True)
+
     @classmethod
     def INPUT_TYPES(cls):
-        return {
-            "required": {
-                "description": ("STRING", {
-                    "multiline": True,
-                    "default": "武侠场景，人物飞檐走壁"
-                }),
-                "api_base_url": ("STRING", {
-                    "default": DEFAULT_API_BASE_URL,
-                    "multiline": False
-                }),
-                "api_key": ("STRING", {
-                    "default": DEFAULT_API_KEY,
-                    "multiline": False
-                }),
-                "model": (AVAILABLE_MODELS, {
-                    "default": DEFAULT_MODEL
-                }),
-                "output_natural_en": ("BOOLEAN", {"default": True}),
-                "output_natural_cn": ("BOOLEAN", {"default": False}),
-                "output_json_en": ("BOOLEAN", {"default": False}),
-                "output_json_cn": ("BOOLEAN", {"default": False}),
-                "enable_enhance": ("BOOLEAN", {"default": True}),
-            },
-            "optional": {
-                "camera_movement": (["自动", "推", "拉", "摇", "移", "跟", "升降", "环绕"], {"default": "自动"}),
-                "transition": (["自动", "淡入淡出", "硬切", "溶解", "擦除", "缩放"], {"default": "自动"}),
-                "mood": (["自动", "紧张", "平静", "欢快", "悲伤", "史诗"], {"default": "自动"}),
-                "speed": (["自动", "正常", "慢动作", "快动作", "延时"], {"default": "自动"}),
-            }
-        }
-
-    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING")
-    RETURN_NAMES = ("prompt_natural_en", "prompt_natural_cn", "prompt_json_en", "prompt_json_cn")
-    FUNCTION = "generate"
-    CATEGORY = "Skill Prompt/视频"
+        types = super().INPUT_TYPES()
+        types["required"]["shot_count"] = ("INT", {"default": STORYBOARD_SHOTS, "min": 1, "max": 12})
+        types["optional"]["max_concurrency"] = ("INT", {
+            "default": BATCH_MAX_WORKERS, "min": 1, "max": 32
+        })
+        return types
 
-    def generate(
-        self,
-        description: str,
-        api_base_url: str,
-        api_key: str,
-        model: str,
-        output_natural_en: bool,
-        output_natural_cn: bool,
-        output_json_en: bool,
-        output_json_cn: bool,
-        enable_enhance: bool,
-        camera_movement: str = "自动",
-        transition: str = "自动",
-        mood: str = "自动",
-        speed: str = "自动"
-    ):
-        options = {
-            "camera_movement": camera_movement,
-            "transition": transition,
-            "mood": mood,
-            "speed": speed
-        }
+    def generate(self, shot_count: int = STORYBOARD_SHOTS, max_concurrency: int = BATCH_MAX_WORKERS,
+                 unique_id=None, **inputs):
+        request = self.build_request(**inputs)
+        # 流式预览显示建立镜头
+        pusher = make_partial_pusher(unique_id)
 
         engine = PromptEngine()
         try:
-            result = engine.generate(
-                user_input=description,
-                domain="video",
-                api_base_url=api_base_url,
-                api_key=api_key,
-                model=model,
-                options=options,
-                output_natural_en=output_natural_en,
-                output_natural_cn=output_natural_cn,
-                output_json_en=output_json_en,
-                output_json_cn=output_json_cn,
-                enable_enhance=enable_enhance
+            results = engine.generate_storyboard(
+                dict(request, on_delta=pusher), shot_count, max_workers=max_concurrency
             )
         finally:
             engine.close()
+            if pusher:
+                pusher.done()
 
-        return (
-            result.get("prompt_natural_en", ""),
-            result.get("prompt_natural_cn", ""),
-            result.get("prompt_json_en", ""),
-            result.get("prompt_json_cn", "")
-        )
+        outputs = ([], [], [], [], [])
+        for result in results:
+            shot = result["meta"]["shot"]
+            label = f"{shot['index']}/{len(results)} {shot['role_name']} · {shot['camera_movement']} · {shot['transition']}"
+            if result.get("error"):
+                label += f" · {result['error']}"
+            for column, value in zip(outputs, self.unpack_result(result) + (label,)):
+                column.append(value)
+        return outputs
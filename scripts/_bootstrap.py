@@ -0,0 +1,26 @@
+"""
+脚本公共引导
+脚本在 ComfyUI 之外运行时，按插件目录名导入插件包；
+只注册包路径、不执行插件的 __init__（节点注册、路由、预热、元素库热更新与学习进程只在 ComfyUI 内启动）
+"""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_PACKAGE = os.path.basename(PLUGIN_DIR)
+
+
+def import_plugin_module(name: str):
+    """导入插件内模块，如 import_plugin_module("core.prompt_engine")"""
+    parent = os.path.dirname(PLUGIN_DIR)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    if PLUGIN_PACKAGE not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PLUGIN_PACKAGE, None, is_package=True)
+        spec.submodule_search_locations = [PLUGIN_DIR]
+        sys.modules[PLUGIN_PACKAGE] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{name}")
@@ -0,0 +1,136 @@
+"""
+元素上下文检索基准
+
+对比两种取样方式（各领域前 8 个类别，每类取复用分最高的 5 个元素）：
+- per_category: 每个类别一次查询（原实现）
+- window:       ROW_NUMBER() 窗口函数一次查询全部类别
+
+分别在没有复合索引、建立 (domain_id, category_id, reusability_score DESC) 复合索引并 ANALYZE 后测量。
+基准在元素库的临时副本上运行，不修改 data/elements.db。
+
+用法:
+    python scripts/bench_context_query.py --runs 200
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+prompt_engine = import_plugin_module("core.prompt_engine")
+knowledge_base = import_plugin_module("core.knowledge_base")
+
+DOMAINS = list(config.DOMAINS)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _measure(func, runs: int):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples), _percentile(samples, 95)
+
+
+def _engine(db_path: str):
+    engine = prompt_engine.PromptEngine(db_path)
+    engine._conn = sqlite3.connect(db_path)
+    engine._conn.row_factory = sqlite3.Row
+    return engine
+
+
+def _categories(engine, domain: str):
+    categories = knowledge_base.KnowledgeBase.get_domain_categories(domain) or engine._get_categories_from_db(domain)
+    return categories[:8]
+
+
+def bench(db_path: str, runs: int):
+    engine = _engine(db_path)
+    plans = {domain: _categories(engine, domain) for domain in DOMAINS}
+
+    def per_category():
+        for domain, categories in plans.items():
+            for category in categories:
+                engine.get_elements_by_category(domain, category, limit=5)
+
+    def window():
+        for domain, categories in plans.items():
+            engine.get_top_elements_by_categories(domain, categories, limit=5)
+
+    results = {
+        "per_category": _measure(per_category, runs),
+        "window": _measure(window, runs),
+    }
+    engine.close()
+    return results
+
+
+def explain(db_path: str):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT rowid, ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY reusability_score DESC)
+        FROM elements WHERE domain_id = ? AND category_id IN (?, ?)
+    """, ("portrait", "gender", "poses")).fetchall()
+    conn.close()
+    return [row[-1] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="元素上下文检索基准")
+    parser.add_argument("--runs", type=int, default=200, help="每种方式的重复次数（每次覆盖全部 5 个领域）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(workdir, "elements.db")
+        shutil.copyfile(config.DB_PATH, db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP INDEX IF EXISTS idx_elements_domain_category_score")
+        conn.commit()
+        conn.close()
+
+        before = bench(db_path, args.runs)
+        plan_before = explain(db_path)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute(prompt_engine._CONTEXT_INDEX_SQL)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.close()
+
+        after = bench(db_path, args.runs)
+        plan_after = explain(db_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"5 个领域 × 8 个类别 × 前 5 个元素，{args.runs} 次\n")
+    print(f"{'方式':<16}{'无复合索引 mean':>16}{'p95':>10}{'复合索引 mean':>16}{'p95':>10}")
+    for name in ("per_category", "window"):
+        b_mean, b_p95 = before[name]
+        a_mean, a_p95 = after[name]
+        print(f"{name:<16}{b_mean:>14.3f}ms{b_p95:>8.3f}ms{a_mean:>14.3f}ms{a_p95:>8.3f}ms")
+
+    baseline = before["per_category"][0]
+    print(f"\nwindow + 复合索引 相对原实现: {baseline / after['window'][0]:.1f}x")
+    print("\n查询计划（无复合索引）:")
+    for line in plan_before:
+        print(f"  {line}")
+    print("查询计划（复合索引）:")
+    for line in plan_after:
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
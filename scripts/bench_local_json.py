@@ -0,0 +1,156 @@
+"""
+本地 JSON 推导基准
+
+对比两种输出方式：
+- llm:   模型输出 natural_en + natural_cn + json_en + json_cn 四段
+- local: 模型只输出 natural_en + natural_cn，JSON 在本地推导
+
+离线模式用样例文本估算输出 token 并实测本地推导耗时；
+--live 模式对真实接口各跑若干次，实测端到端延迟。
+
+用法:
+    python scripts/bench_local_json.py
+    python scripts/bench_local_json.py --live --model gemini-3-flash --runs 3
+"""
+
+import argparse
+import statistics
+import time
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+tokens = import_plugin_module("core.tokens")
+element_index = import_plugin_module("core.element_index")
+local_json = import_plugin_module("core.local_json")
+prompt_engine = import_plugin_module("core.prompt_engine")
+
+# 与增强规则长度一致的样例（自然语言 600-800 字符）
+SAMPLES = [
+    (
+        "portrait",
+        "职业女性全身像，横向画幅",
+        "professional East Asian woman in her late twenties, full body shot, confident standing pose, "
+        "tailored charcoal business suit with crisp white silk blouse, pointed black leather heels, "
+        "dark brown almond eyes, sleek black hair in a low chignon, natural makeup with soft rose lips, "
+        "calm self-assured expression, modern glass office lobby background, floor-to-ceiling windows, "
+        "soft window light from the left, gentle fill light, subtle rim light on hair, "
+        "clean architectural lines, muted neutral color palette, horizontal composition, "
+        "shallow depth of field, 85mm lens, f/2.0, eye-level camera angle, 8K resolution, "
+        "sharp focus, photorealistic skin texture, editorial photography",
+        "职业东亚女性，二十多岁，全身照，自信站姿，剪裁合身的炭灰色西装，白色真丝衬衫，黑色尖头高跟鞋，"
+        "深棕色杏仁眼，黑色低盘发，自然妆容，柔和玫瑰色唇，从容自信的表情，现代玻璃办公大堂背景，落地窗，"
+        "左侧柔和窗光，轻柔补光，发丝轮廓光，简洁建筑线条，中性色调，横向构图，浅景深，85mm镜头，"
+        "f/2.0光圈，平视机位，8K分辨率，锐利对焦，真实皮肤质感，杂志大片风格",
+    ),
+    (
+        "product",
+        "奢华手表产品摄影",
+        "luxury mechanical wristwatch, polished rose gold case, sapphire crystal dial, "
+        "intricate skeleton movement visible through the dial, black alligator leather strap, "
+        "placed on a dark marble pedestal, subtle water droplets on the surface, "
+        "dramatic low key studio lighting, strip softbox from above, specular highlights along the bezel, "
+        "deep shadows, gradient charcoal background, reflective surface, "
+        "macro product photography, 100mm macro lens, focus stacking, extreme detail, "
+        "commercial advertising style, 8K resolution, high dynamic range",
+        "奢华机械腕表，抛光玫瑰金表壳，蓝宝石水晶表盘，镂空机芯清晰可见，黑色鳄鱼皮表带，置于深色大理石底座，"
+        "表面细小水珠，戏剧性低调棚拍光，顶部条形柔光箱，表圈镜面高光，深邃阴影，炭灰渐变背景，反光台面，"
+        "微距产品摄影，100mm微距镜头，景深合成，极致细节，商业广告风格，8K分辨率，高动态范围",
+    ),
+]
+
+# 增强规则要求 JSON 段落 1000-1200 字符，取中值作为模型 JSON 输出的长度估计
+JSON_RULE_CHARS = 1100
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_offline(iterations: int):
+    start = time.perf_counter()
+    index = element_index.ElementIndex.from_db(config.DB_PATH)
+    build_ms = (time.perf_counter() - start) * 1000
+    builder = local_json.LocalJsonBuilder(index)
+
+    print(f"元素索引构建（冷启动，一次性）: {build_ms:.1f} ms, {index.element_count} 个元素\n")
+    print("llm 四段按两种口径估算：JSON 与本地推导结果等长（下限）/ JSON 取长度规则中值 1100 字符")
+    print(f"{'样例':<10}{'llm(下限)':>11}{'llm(规则)':>11}{'local':>8}{'节省':>12}{'本地 mean':>12}{'本地 p95':>12}")
+
+    for domain, _, natural_en, natural_cn in SAMPLES:
+        json_en = builder.build_json(natural_en, "en")
+        json_cn = builder.build_json(natural_cn, "cn")
+
+        timings = []
+        for _ in range(iterations):
+            t = time.perf_counter()
+            builder.build_json(natural_en, "en")
+            builder.build_json(natural_cn, "cn")
+            timings.append((time.perf_counter() - t) * 1000)
+
+        natural_tokens = tokens.estimate_tokens(natural_en) + tokens.estimate_tokens(natural_cn)
+        json_tokens = tokens.estimate_tokens(json_en) + tokens.estimate_tokens(json_cn)
+        rule_tokens = sum(
+            tokens.estimate_tokens(text) * max(1.0, JSON_RULE_CHARS / len(text))
+            for text in (json_en, json_cn)
+        )
+        low = natural_tokens + json_tokens
+        high = natural_tokens + int(rule_tokens)
+        saving = f"{1 - natural_tokens / low:.0%}-{1 - natural_tokens / high:.0%}"
+
+        print(f"{domain:<10}{low:>11}{high:>11}{natural_tokens:>8}{saving:>12}"
+              f"{statistics.mean(timings):>10.3f}ms{_percentile(timings, 95):>10.3f}ms")
+
+
+def bench_live(args):
+    engine = prompt_engine.PromptEngine()
+    print(f"{'样例':<10}{'模式':<8}{'延迟 mean':>12}{'输出 token':>12}")
+    try:
+        for domain, description, _, _ in SAMPLES:
+            for mode in ("llm", "local"):
+                latencies, output_tokens = [], []
+                for _ in range(args.runs):
+                    t = time.perf_counter()
+                    result = engine.generate(
+                        user_input=description,
+                        domain=domain,
+                        api_base_url=args.api_base_url,
+                        api_key=args.api_key,
+                        model=args.model,
+                        output_natural_en=True,
+                        output_natural_cn=True,
+                        output_json_en=True,
+                        output_json_cn=True,
+                        json_mode=mode
+                    )
+                    latencies.append(time.perf_counter() - t)
+                    # local 模式的 JSON 不由模型输出，不计入输出 token
+                    keys = ["prompt_natural_en", "prompt_natural_cn"]
+                    if mode == "llm":
+                        keys += ["prompt_json_en", "prompt_json_cn"]
+                    output_tokens.append(sum(tokens.estimate_tokens(result.get(k, "")) for k in keys))
+                print(f"{domain:<10}{mode:<8}{statistics.mean(latencies):>11.2f}s"
+                      f"{int(statistics.mean(output_tokens)):>12}")
+    finally:
+        engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 JSON 推导基准")
+    parser.add_argument("--iterations", type=int, default=2000, help="离线计时迭代次数")
+    parser.add_argument("--live", action="store_true", help="调用真实接口对比端到端延迟")
+    parser.add_argument("--api-base-url", default=config.DEFAULT_API_BASE_URL)
+    parser.add_argument("--api-key", default=config.DEFAULT_API_KEY)
+    parser.add_argument("--model", default=config.DEFAULT_MODEL)
+    parser.add_argument("--runs", type=int, default=3, help="--live 模式每种组合的运行次数")
+    args = parser.parse_args()
+
+    bench_offline(args.iterations)
+    if args.live:
+        print()
+        bench_live(args)
+
+
+if __name__ == "__main__":
+    main()
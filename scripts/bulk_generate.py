@@ -0,0 +1,273 @@
+"""
+批量生成命令行工具（JSONL → JSONL，可断点续跑）
+
+输入每行一条记录：
+    {"description": "...", "domain": "portrait", "options": {...}}
+可选字段：id、seed、output_natural_en/output_natural_cn/output_json_en/output_json_cn（覆盖命令行开关）
+
+- 流式读取输入，同时在途的请求数不超过 --concurrency，内存占用与输入规模无关
+- 结果按完成顺序逐行写入输出文件，每行带输入行号 index
+- 检查点文件记录已完成的行号及输出文件位置；中断后重新运行同一命令即可继续，
+  已完成的记录不会重复生成，上次未记录到检查点的输出会被截断
+- 失败的记录写入 <输出>.errors.jsonl，不计入检查点，续跑时自动重试
+
+用法:
+    python scripts/bulk_generate.py prompts.jsonl -o results.jsonl --concurrency 8
+    python scripts/bulk_generate.py prompts.jsonl -o results.jsonl --json-en --json-mode local
+    python scripts/bulk_generate.py prompts.jsonl -o results.jsonl --natural-cn --cn-mode local
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+prompt_engine = import_plugin_module("core.prompt_engine")
+cascade = import_plugin_module("core.cascade")
+
+OUTPUT_FLAGS = ("output_natural_en", "output_natural_cn", "output_json_en", "output_json_cn")
+
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def load_checkpoint(checkpoint_path: str, output_path: str) -> set:
+    """
+    读取检查点，返回已完成的行号集合
+
+    输出文件截断到检查点记录的最后位置，丢弃崩溃时写了一半或未登记的行
+    """
+    completed = set()
+    offset = 0
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # 崩溃时写了一半的最后一行
+                completed.add(entry["index"])
+                offset = entry["offset"]
+
+    if os.path.exists(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(offset)
+    return completed
+
+
+def iter_records(path: str):
+    """流式读取输入，产出 (行号, 记录)；行号只计非空行"""
+    index = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"_parse_error": str(e)}
+            yield index, record
+            index += 1
+
+
+class Progress:
+    """吞吐、错误与剩余时间（输出到 stderr）"""
+
+    def __init__(self, total: int, skipped: int, interval: float):
+        self.total = total
+        self.skipped = skipped
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.start = time.monotonic()
+        self._last = 0.0
+
+    def update(self, ok: bool):
+        if ok:
+            self.done += 1
+        else:
+            self.errors += 1
+        self.report()
+
+    def report(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self.start
+        processed = self.done + self.errors
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.skipped - processed
+        eta = remaining / rate if rate > 0 else float("inf")
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta != float("inf") else "--:--:--"
+        sys.stderr.write(
+            f"\r已完成 {self.skipped + self.done}/{self.total}  失败 {self.errors}  "
+            f"{rate:.2f} 条/秒  剩余 {eta_text}   "
+        )
+        sys.stderr.flush()
+
+
+def build_request(record: dict, args) -> dict:
+    """将输入记录转换为 PromptEngine.generate() 的参数"""
+    if "_parse_error" in record:
+        raise ValueError(f"输入行不是合法 JSON: {record['_parse_error']}")
+    description = record.get("description") or record.get("user_input")
+    if not description:
+        raise ValueError("缺少 description")
+    domain = record.get("domain", args.domain)
+    if domain not in config.DOMAINS:
+        raise ValueError(f"未知领域: {domain}")
+
+    request = {
+        "user_input": description,
+        "domain": domain,
+        "api_base_url": args.api_base_url,
+        "api_key": args.api_key,
+        "model": args.model,
+        "options": record.get("options") or {},
+        "enable_enhance": not args.no_enhance,
+        "json_mode": args.json_mode,
+        "cn_mode": args.cn_mode,
+        "reasoning_effort": args.reasoning_effort,
+        "auto_repair": args.auto_repair,
+        "post_process": args.post_process,
+        "response_mode": args.response_mode,
+        "seed": record.get("seed", args.seed),
+        "context_token_budget": args.context_budget,
+        "priority": "batch",
+        "source": "bulk_generate",
+        "cascade": args.cascade,
+    }
+    for flag in OUTPUT_FLAGS:
+        request[flag] = bool(record.get(flag, getattr(args, flag)))
+    return request
+
+
+def run(args) -> int:
+    checkpoint_path = args.checkpoint or args.output + ".ckpt"
+    errors_path = args.output + ".errors.jsonl"
+
+    total = count_lines(args.input)
+    completed = load_checkpoint(checkpoint_path, args.output)
+    progress = Progress(total, len(completed), args.progress_interval)
+    if completed:
+        sys.stderr.write(f"从检查点继续：跳过 {len(completed)} 条已完成记录\n")
+
+    engine = prompt_engine.PromptEngine()
+    output = open(args.output, "a", encoding="utf-8")
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+    errors = open(errors_path, "a", encoding="utf-8")
+
+    def fail(index, record, error):
+        errors.write(json.dumps({
+            "index": index, "record": record, "error": f"{type(error).__name__}: {error}"
+        }, ensure_ascii=False) + "\n")
+        errors.flush()
+        progress.update(False)
+
+    def finish(future, index, record):
+        """在主线程写出结果：先写输出，再登记检查点"""
+        try:
+            result = future.result()
+        except Exception as e:
+            fail(index, record, e)
+            return
+
+        line = {"index": index}
+        if "id" in record:
+            line["id"] = record["id"]
+        line.update(result)
+        output.write(json.dumps(line, ensure_ascii=False) + "\n")
+        output.flush()
+        checkpoint.write(json.dumps({"index": index, "offset": output.tell()}) + "\n")
+        checkpoint.flush()
+        progress.update(True)
+
+    pending = {}
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for index, record in iter_records(args.input):
+                if index in completed:
+                    continue
+                try:
+                    request = build_request(record, args)
+                    # 元素上下文在主线程构建（数据库连接不跨线程）
+                    request["element_context"] = engine.get_element_context(
+                        request["domain"], request["options"], request["seed"], request["context_token_budget"]
+                    )
+                except Exception as e:
+                    fail(index, record, e)
+                    continue
+                pending[pool.submit(engine.generate, **request)] = (index, record)
+
+                if len(pending) >= args.concurrency:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future, *pending.pop(future))
+
+            done, _ = wait(pending)
+            for future in done:
+                finish(future, *pending.pop(future))
+    except KeyboardInterrupt:
+        sys.stderr.write("\n已中断，重新运行同一命令即可从检查点继续\n")
+        return 130
+    finally:
+        output.close()
+        checkpoint.close()
+        errors.close()
+        engine.close()
+
+    progress.report(force=True)
+    sys.stderr.write("\n")
+    for stats in cascade.CascadeStats.snapshot():
+        saved = stats["latency_saved_s"]
+        sys.stderr.write(
+            f"级联 {stats['fast_model']} → {stats['strong_model']}: 升级 {stats['escalations']}/{stats['requests']} "
+            f"({stats['escalation_rate']:.0%}) {stats['reasons']}，"
+            f"节省延迟 {'未知' if saved is None else f'{saved:.1f}s'}\n"
+        )
+    if progress.errors:
+        sys.stderr.write(f"{progress.errors} 条失败，详见 {errors_path}（重新运行将重试）\n")
+    return 1 if progress.errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量生成提示词（JSONL，可断点续跑）")
+    parser.add_argument("input", help="输入 JSONL")
+    parser.add_argument("-o", "--output", required=True, help="输出 JSONL（追加写入）")
+    parser.add_argument("--checkpoint", help="检查点文件（默认 <输出>.ckpt）")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_MAX_WORKERS, help="最大在途请求数")
+    parser.add_argument("--domain", default="portrait", help="记录未指定 domain 时使用的领域")
+    parser.add_argument("--api-base-url", default=config.DEFAULT_API_BASE_URL)
+    parser.add_argument("--api-key", default=config.DEFAULT_API_KEY)
+    parser.add_argument("--model", default=config.DEFAULT_MODEL)
+    parser.add_argument("--no-natural-en", dest="output_natural_en", action="store_false")
+    parser.add_argument("--natural-cn", dest="output_natural_cn", action="store_true")
+    parser.add_argument("--json-en", dest="output_json_en", action="store_true")
+    parser.add_argument("--json-cn", dest="output_json_cn", action="store_true")
+    parser.add_argument("--no-enhance", action="store_true")
+    parser.add_argument("--auto-repair", action="store_true", help="本地修复违反一致性规则的描述")
+    parser.add_argument("--post-process", action="store_true", help="对自然语言段落执行本地去重、前置与长度控制")
+    parser.add_argument("--cascade", action="store_true",
+                        help=f"先用 {config.CASCADE_FAST_MODEL} 生成，本地检查不通过时再用 --model")
+    parser.add_argument("--json-mode", choices=config.JSON_MODES, default=config.DEFAULT_JSON_MODE)
+    parser.add_argument("--cn-mode", choices=config.CN_MODES, default=config.DEFAULT_CN_MODE)
+    parser.add_argument("--reasoning-effort", choices=config.REASONING_EFFORTS,
+                        default=config.DEFAULT_REASONING_EFFORT, help="思考强度（仅对支持思考控制的模型生效）")
+    parser.add_argument("--response-mode", choices=config.RESPONSE_MODES, default=config.DEFAULT_RESPONSE_MODE)
+    parser.add_argument("--context-budget", type=int, default=config.CONTEXT_TOKEN_BUDGET,
+                        help="元素上下文 token 预算（0 不限制）")
+    parser.add_argument("--seed", type=int, default=0, help="记录未指定 seed 时使用的种子")
+    parser.add_argument("--progress-interval", type=float, default=1.0, help="进度刷新间隔（秒）")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+元素库压缩
+
+1. 按 KnowledgeBase.CATEGORY_ALIASES 把漂移的类别 ID（hair_style、art_art_styles ...）改为规范 ID
+2. 同一领域、同一类别内合并近似重复的元素（shingle Jaccard >= 阈值），
+   保留复用分最高的代表，关键词、来源、标签、使用统计与引用合并到代表
+
+默认在元素库的临时副本上试运行并报告各领域元素上下文的大小变化；
+--apply 先备份为 <db>.bak 再原地修改。
+
+用法:
+    python scripts/compact_elements.py                  # 试运行，不修改元素库
+    python scripts/compact_elements.py --apply          # 备份后原地压缩
+    python scripts/compact_elements.py --threshold 0.7  # 更保守的去重阈值
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+compaction = import_plugin_module("core.compaction")
+knowledge_base = import_plugin_module("core.knowledge_base")
+prompt_engine = import_plugin_module("core.prompt_engine")
+similarity = import_plugin_module("core.similarity")
+tokens = import_plugin_module("core.tokens")
+nodes = import_plugin_module("nodes")
+
+NODE_CLASSES = (
+    nodes.PortraitPromptNode,
+    nodes.ArtPromptNode,
+    nodes.DesignPromptNode,
+    nodes.ProductPromptNode,
+    nodes.VideoPromptNode,
+)
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m", flush=True)
+
+
+def measure_contexts(db_path: str) -> dict:
+    """各领域默认选项下的元素上下文 {领域: (字符数, 估算 token 数, 元素数)}"""
+    engine = prompt_engine.PromptEngine(db_path)
+    sizes = {}
+    try:
+        for node_class in NODE_CLASSES:
+            context = engine.build_element_context(
+                node_class.DOMAIN, node_class().collect_options({}), rng=random.Random(0)
+            )
+            elements = sum(len(line.split("; ")) for line in context.splitlines() if line.startswith("【"))
+            sizes[node_class.DOMAIN] = (len(context), tokens.estimate_tokens(context), elements)
+    finally:
+        engine.close()
+    return sizes
+
+
+def count_elements(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM elements").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def compact(db_path: str, threshold: float) -> dict:
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        return compaction.compact_elements(conn, threshold)
+    finally:
+        conn.close()
+
+
+def report(result: dict, before: dict, after: dict, total_before: int, total_after: int):
+    renamed = result["renamed"]
+    _log(f"类别改名: {len(renamed)} 个别名, {sum(renamed.values())} 个元素")
+    for alias, count in sorted(renamed.items()):
+        print(f"  {alias} -> {knowledge_base.KnowledgeBase.canonical_category(alias)}: {count}")
+
+    _log(f"近似重复: {result['clusters']} 簇, 合并 {sum(result['removed'].values())} 个元素, "
+         f"元素总数 {total_before} -> {total_after}")
+    for domain, count in sorted(result["removed"].items()):
+        print(f"  {domain}: -{count}")
+
+    print(f"\n{'领域':<10}{'字符':>16}{'token':>14}{'元素':>10}")
+    for domain, (chars, toks, elements) in before.items():
+        new_chars, new_toks, new_elements = after[domain]
+        print(f"{domain:<10}{chars:>7} -> {new_chars:<6}{toks:>6} -> {new_toks:<5}{elements:>4} -> {new_elements:<4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="元素库压缩")
+    parser.add_argument("--db", default=config.DB_PATH, help="元素库路径")
+    parser.add_argument("--threshold", type=float, default=similarity.DUPLICATE_THRESHOLD,
+                        help="近似重复的 Jaccard 阈值")
+    parser.add_argument("--apply", action="store_true", help="备份后原地修改元素库（默认只试运行）")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.apply:
+        backup = f"{args.db}.bak"
+        shutil.copyfile(args.db, backup)
+        _log(f"已备份: {backup}")
+        target = args.db
+    else:
+        workdir = tempfile.mkdtemp()
+        target = os.path.join(workdir, os.path.basename(args.db))
+        shutil.copyfile(args.db, target)
+
+    try:
+        before = measure_contexts(target)
+        total_before = count_elements(target)
+        result = compact(target, args.threshold)
+        after = measure_contexts(target)
+        report(result, before, after, total_before, count_elements(target))
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if not args.apply:
+        _log("试运行完成，元素库未修改（--apply 写入）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+增量元素学习（工作进程）
+
+从 source_prompts（learning_status = 'pending'）与新增的 generated_prompts 中提取候选元素，
+去重后写入元素库。以降低的优先级运行，可随 ComfyUI 自动启动（config.LEARNER_ENABLED），
+也可手动运行。
+
+用法:
+    python scripts/learn_elements.py                  # 处理全部待学习提示词后退出
+    python scripts/learn_elements.py --watch 300      # 持续运行，每 5 分钟检查新数据
+    python scripts/learn_elements.py --llm            # 本地无法分类的短语批量交给 LLM
+"""
+
+import argparse
+import os
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+learner = import_plugin_module("core.learner")
+
+
+def _log(message: str):
+    print(f"\033[92m[Skill Prompt] {message}\033[0m", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量元素学习")
+    parser.add_argument("--db", default=config.DB_PATH, help="元素库路径")
+    parser.add_argument("--batch-size", type=int, default=config.LEARNER_BATCH_SIZE, help="每个事务处理的提示词数")
+    parser.add_argument("--watch", type=float, help="持续运行，每隔指定秒数检查新数据")
+    parser.add_argument("--llm", action="store_true", help="本地无法分类的短语批量交给 LLM")
+    parser.add_argument("--api-base-url", default=config.DEFAULT_API_BASE_URL)
+    parser.add_argument("--api-key", default=config.DEFAULT_API_KEY)
+    parser.add_argument("--model", default=config.DEFAULT_MODEL)
+    parser.add_argument("--nice", type=int, default=10, help="降低进程优先级（POSIX nice 增量）")
+    args = parser.parse_args()
+
+    if args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)
+
+    classifier = None
+    if args.llm:
+        classifier = learner.LLMPhraseClassifier(args.api_base_url, args.api_key, args.model)
+
+    def report(stats):
+        _log(
+            f"学习: {stats['prompts']} 条提示词, {stats['candidates']} 个候选, "
+            f"新增 {stats['inserted']} 个元素, 重复 {stats['duplicates']}, 失败 {stats['failed']}"
+        )
+
+    element_learner = learner.ElementLearner(args.db, batch_size=args.batch_size, classifier=classifier)
+    try:
+        element_learner.run(watch_interval=args.watch, on_batch=report)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
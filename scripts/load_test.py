@@ -0,0 +1,506 @@
+"""
+并发压测
+
+在本地启动一个模拟 OpenAI 流式接口（独立进程，首 token 延迟与逐 token 输出速率可配置），
+按并发等级逐级运行与节点一致的调用（每次新建 PromptEngine → generate → close），报告每一级的：
+- 吞吐（请求/秒）与 p50/p95/p99 延迟
+- 线程数与 RSS 峰值
+- 各组件的单次耗时（独占时间，嵌套调用不重复计入）：数据库连接、元素上下文、客户端构造、
+  系统提示词、请求建立（含首 token）、流式接收、解析、调度排队、预算与账本、一致性修复
+
+饱和点：吞吐增长不足 10% 或 p95 超过单并发 p95 的 2 倍的首个等级；
+瓶颈：饱和点上单次耗时相对单并发增长最多的组件（流式接收与请求建立反映模拟接口本身，单独标注）。
+
+用法:
+    python scripts/load_test.py
+    python scripts/load_test.py --levels 1,4,16,32,64 --duration 15 --ttft 0.4 --tps 80
+    python scripts/load_test.py --no-scheduler --vary-seed
+    python scripts/load_test.py --replay data/fixtures --time-scale 0.5   # 回放录制的真实流量，不启动模拟接口
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+from _bootstrap import import_plugin_module
+
+# 模拟接口输出的样例段落（与扩写规则长度相当）
+SAMPLE_SECTIONS = {
+    "natural_en": (
+        "professional East Asian woman in her late twenties, full body shot, confident standing pose, "
+        "tailored charcoal business suit with crisp white silk blouse, dark brown almond eyes, "
+        "sleek black hair in a low chignon, natural makeup with soft rose lips, calm self-assured expression, "
+        "modern glass office lobby background, floor-to-ceiling windows, soft window light from the left, "
+        "gentle fill light, subtle rim light on hair, clean architectural lines, muted neutral color palette, "
+        "shallow depth of field, 85mm lens, f/2.0, eye-level camera angle, 8K resolution, sharp focus, "
+        "photorealistic skin texture, editorial photography"
+    ),
+    "natural_cn": (
+        "职业东亚女性，二十多岁，全身照，自信站姿，剪裁合身的炭灰色西装，白色真丝衬衫，深棕色杏仁眼，黑色低盘发，"
+        "自然妆容，柔和玫瑰色唇，从容自信的表情，现代玻璃办公大堂背景，落地窗，左侧柔和窗光，轻柔补光，发丝轮廓光，"
+        "简洁建筑线条，中性色调，浅景深，85mm镜头，f/2.0光圈，平视机位，8K分辨率，锐利对焦，真实皮肤质感，杂志大片风格"
+    ),
+    "json_en": json.dumps({
+        "subject": ["professional East Asian woman", "late twenties", "confident standing pose"],
+        "styling": ["tailored charcoal business suit", "white silk blouse", "sleek black low chignon"],
+        "lighting": ["soft window light from the left", "gentle fill light", "subtle rim light"],
+        "scene": ["modern glass office lobby", "floor-to-ceiling windows", "muted neutral palette"],
+        "technical": ["85mm lens", "f/2.0", "shallow depth of field", "8K resolution"],
+    }),
+    "json_cn": json.dumps({
+        "主体": ["职业东亚女性", "二十多岁", "自信站姿"],
+        "造型": ["炭灰色西装", "白色真丝衬衫", "黑色低盘发"],
+        "光影": ["左侧柔和窗光", "轻柔补光", "发丝轮廓光"],
+        "场景": ["现代玻璃办公大堂", "落地窗", "中性色调"],
+        "技术": ["85mm镜头", "f/2.0光圈", "浅景深", "8K分辨率"],
+    }, ensure_ascii=False),
+}
+_REQUESTED_RE = re.compile(r'^- (natural_en|natural_cn|json_en|json_cn): ', re.MULTILINE)
+
+# 组件 → 插桩位置；"接口"组件反映模拟接口自身的耗时
+COMPONENTS = [
+    ("db_connect", "数据库连接"),
+    ("context", "元素上下文"),
+    ("client_init", "客户端构造"),
+    ("system_prompt", "系统提示词"),
+    ("request", "请求建立/首token"),
+    ("stream", "流式接收"),
+    ("parse", "解析"),
+    ("queue", "调度排队"),
+    ("ledger", "预算与账本"),
+    ("repair", "一致性修复"),
+    ("other", "其他"),
+]
+UPSTREAM_COMPONENTS = {"request", "stream"}
+# 瓶颈组件对应的调整方向
+BOTTLENECK_HINTS = {
+    "queue": "调度器并发上限：SCHEDULER_MAX_CONCURRENCY / SCHEDULER_KEY_CONCURRENCY（或 --keys 增加 api_key）",
+    "db_connect": "每次执行新建数据库连接：PromptEngine.conn",
+    "context": "元素上下文构建：固定种子命中上下文缓存，或设置 CONTEXT_TOKEN_BUDGET",
+    "client_init": "LLM 客户端构造：get_openai_client 的共享客户端",
+    "system_prompt": "系统提示词构建",
+    "parse": "响应解析：response_parser",
+    "ledger": "用量账本写入（SQLite 单连接串行）：USAGE_LEDGER_ENABLED",
+    "repair": "一致性修复：ConstraintChecker",
+    "other": "未插桩部分（线程调度、GIL 争用、其余 Python 开销）",
+}
+
+
+# =============================================================================
+# 模拟 OpenAI 接口
+# =============================================================================
+
+def _sse(payload: dict) -> bytes:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def make_handler(ttft: float, tps: float, chunk_chars: int):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = json.dumps({"object": "list", "data": []}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            system = request["messages"][0]["content"]
+            requested = _REQUESTED_RE.findall(system) or ["natural_en"]
+            content = "\n\n".join(f"=== {name} ===\n{SAMPLE_SECTIONS[name]}" for name in requested)
+            prompt_tokens = sum(len(m["content"]) for m in request["messages"]) // 3
+            chunks = [content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars)]
+            # 约 4 个字符 1 个 token
+            interval = chunk_chars / 4 / tps if tps else 0.0
+
+            # 首 token 前不返回响应头：请求建立阶段计入首 token 延迟
+            time.sleep(ttft)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            base = {"id": "chatcmpl-load", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": request.get("model", "")}
+            start = time.monotonic()
+            for i, text in enumerate(chunks):
+                delay = start + i * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._write(_sse(dict(base, choices=[{"index": 0, "delta": {"content": text}, "finish_reason": None}])))
+            self._write(_sse(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._write(_sse(dict(base, choices=[], usage={
+                    "prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                    "total_tokens": prompt_tokens + len(content) // 4,
+                })))
+            self._write(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _write(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭空闲 keep-alive 连接属于正常情况
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+def serve(args):
+    server = _QuietServer(("127.0.0.1", args.port), make_handler(args.ttft, args.tps, args.chunk_chars))
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+def start_server(args) -> Tuple[subprocess.Popen, int]:
+    """在独立进程中启动模拟接口，避免其线程与内存计入被测进程"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", "0",
+         "--ttft", str(args.ttft), "--tps", str(args.tps), "--chunk-chars", str(args.chunk_chars)],
+        stdout=subprocess.PIPE, text=True
+    )
+    port = int(process.stdout.readline())
+    return process, port
+
+
+# =============================================================================
+# 插桩：按线程记录各组件的独占耗时
+# =============================================================================
+
+class Tracer:
+    def __init__(self):
+        self._local = threading.local()
+
+    def begin(self) -> dict:
+        self._local.trace = {}
+        self._local.stack = []
+        return self._local.trace
+
+    def wrap(self, name: str, func):
+        tracer = self
+
+        def timed(*args, **kwargs):
+            trace = getattr(tracer._local, "trace", None)
+            if trace is None:
+                return func(*args, **kwargs)
+            stack = tracer._local.stack
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                trace[name] = trace.get(name, 0.0) + elapsed - nested
+                if stack:
+                    stack[-1] += elapsed
+
+        timed.__wrapped__ = func
+        return timed
+
+
+def instrument(tracer: Tracer):
+    prompt_engine = import_plugin_module("core.prompt_engine")
+    llm_client = import_plugin_module("core.llm_client")
+    scheduler = import_plugin_module("core.scheduler")
+    usage_ledger = import_plugin_module("core.usage_ledger")
+    constraint_checker = import_plugin_module("core.constraint_checker")
+
+    engine_cls = prompt_engine.PromptEngine
+    engine_cls.conn = property(tracer.wrap("db_connect", engine_cls.conn.fget))
+    engine_cls.get_element_context = tracer.wrap("context", engine_cls.get_element_context)
+
+    client_cls = llm_client.LLMClient
+    client_cls.__init__ = tracer.wrap("client_init", client_cls.__init__)
+    client_cls._build_enhanced_system_prompt = tracer.wrap("system_prompt", client_cls._build_enhanced_system_prompt)
+    client_cls._collect_stream_response = tracer.wrap("stream", client_cls._collect_stream_response)
+    client_cls._parse_generation_response = tracer.wrap("parse", client_cls._parse_generation_response)
+    completions_cls = type(llm_client.get_openai_client("http://127.0.0.1:1/v1", "instrument").chat.completions)
+    completions_cls.create = tracer.wrap("request", completions_cls.create)
+
+    scheduler.LLMScheduler._wait = tracer.wrap("queue", scheduler.LLMScheduler._wait)
+    usage_ledger.UsageLedger.enforce = tracer.wrap("ledger", usage_ledger.UsageLedger.enforce)
+    usage_ledger.UsageLedger.record = tracer.wrap("ledger", usage_ledger.UsageLedger.record)
+    checker = constraint_checker.ConstraintChecker
+    checker.repair_result = classmethod(tracer.wrap("repair", checker.repair_result.__func__))
+
+
+# =============================================================================
+# 资源采样
+# =============================================================================
+
+def _proc_status() -> dict:
+    status = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                status[key] = value.strip()
+    except OSError:
+        pass
+    return status
+
+
+def sample_resources() -> Tuple[int, float]:
+    """(线程数, RSS MB)；非 Linux 时线程数取 Python 线程，RSS 取峰值"""
+    status = _proc_status()
+    threads = int(status["Threads"]) if "Threads" in status else threading.active_count()
+    if "VmRSS" in status:
+        rss = int(status["VmRSS"].split()[0]) / 1024
+    else:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return threads, rss
+
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.max_threads = 0
+        self.max_rss = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            threads, rss = sample_resources()
+            self.max_threads = max(self.max_threads, threads)
+            self.max_rss = max(self.max_rss, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# =============================================================================
+# 压测
+# =============================================================================
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_level(args, tracer: Tracer, base_url: str, concurrency: int) -> dict:
+    prompt_engine = import_plugin_module("core.prompt_engine")
+    latencies, traces, errors = [], [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    counter = iter(range(10 ** 9))
+
+    def worker():
+        while time.monotonic() < deadline:
+            number = next(counter)
+            seed = number if args.vary_seed else 0
+            trace = tracer.begin()
+            start = time.perf_counter()
+            try:
+                # 与节点一致：每次执行新建引擎，结束后关闭
+                engine = prompt_engine.PromptEngine()
+                try:
+                    engine.generate(
+                        user_input=args.description, domain=args.domain, api_base_url=base_url,
+                        api_key=f"load-{number % max(1, args.keys)}", model=args.model,
+                        output_natural_en=True, output_natural_cn=args.natural_cn,
+                        output_json_en=args.json_en, output_json_cn=False,
+                        seed=seed, use_endpoint_pool=False, source="load_test"
+                    )
+                finally:
+                    engine.close()
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            finally:
+                tracer._local.trace = None
+            elapsed = time.perf_counter() - start
+            trace["other"] = max(0.0, elapsed - sum(trace.values()))
+            with lock:
+                latencies.append(elapsed)
+                traces.append(trace)
+
+    sampler = ResourceSampler()
+    sampler.start()
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+    sampler.stop()
+
+    components = {
+        name: sum(trace.get(name, 0.0) for trace in traces) / len(traces) * 1000 if traces else 0.0
+        for name, _ in COMPONENTS
+    }
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput": len(latencies) / wall,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "threads": sampler.max_threads,
+        "rss_mb": sampler.max_rss,
+        "components_ms": components,
+    }
+
+
+def find_saturation(levels: list) -> dict:
+    """吞吐增长不足 10% 或 p95 超过基线 2 倍的首个等级"""
+    base = levels[0]
+    for previous, level in zip(levels, levels[1:]):
+        if level["throughput"] < previous["throughput"] * 1.1 or level["p95"] > base["p95"] * 2:
+            return level
+    return None
+
+
+def bottleneck(base: dict, level: dict) -> list:
+    """各组件单次耗时相对基线的增长（毫秒），降序"""
+    growth = [
+        (name, level["components_ms"][name] - base["components_ms"][name])
+        for name, _ in COMPONENTS
+    ]
+    return sorted(growth, key=lambda item: -item[1])
+
+
+def report(levels: list):
+    labels = dict(COMPONENTS)
+    header = ["conc", "req", "err", "req/s", "p50ms", "p95ms", "p99ms", "threads", "rssMB"]
+    rows = [[
+        str(level["concurrency"]), str(level["requests"]), str(level["errors"]),
+        f"{level['throughput']:.2f}", f"{level['p50']:.0f}", f"{level['p95']:.0f}", f"{level['p99']:.0f}",
+        str(level["threads"]), f"{level['rss_mb']:.1f}",
+    ] for level in levels]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *rows)]
+    for line in [header] + rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+    print("\n各组件单次耗时（毫秒，独占时间）：")
+    names = [name for name, _ in COMPONENTS]
+    header = ["conc"] + names
+    rows = [[str(level["concurrency"])] + [f"{level['components_ms'][name]:.1f}" for name in names] for level in levels]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *rows)]
+    for line in [header] + rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(line, widths)))
+
+    for level in levels:
+        if level["first_error"]:
+            print(f"\n并发 {level['concurrency']} 出错 {level['errors']} 次，首个错误：{level['first_error']}")
+
+    saturated = find_saturation(levels)
+    target = saturated or levels[-1]
+    if saturated:
+        print(f"\n饱和点：并发 {saturated['concurrency']}（吞吐 {saturated['throughput']:.2f} req/s，"
+              f"p95 {saturated['p95']:.0f}ms）")
+    else:
+        print(f"\n在测试范围内未饱和（最高并发 {target['concurrency']}，吞吐 {target['throughput']:.2f} req/s）")
+
+    growth = bottleneck(levels[0], target)
+    local = [(name, ms) for name, ms in growth if name not in UPSTREAM_COMPONENTS]
+    upstream = [(name, ms) for name, ms in growth if name in UPSTREAM_COMPONENTS]
+    print("相对单并发的单次耗时增长：")
+    for name, ms in local[:3]:
+        print(f"  {labels[name]:<10} {ms:+.1f}ms")
+    for name, ms in upstream:
+        print(f"  {labels[name]:<10} {ms:+.1f}ms（含模拟接口自身与本进程 GIL 争用）")
+    if local and local[0][1] > 0:
+        print(f"瓶颈：{labels[local[0][0]]} → {BOTTLENECK_HINTS[local[0][0]]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发压测")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="并发等级（逗号分隔）")
+    parser.add_argument("--duration", type=float, default=20.0, help="每个等级的持续时间（秒）")
+    parser.add_argument("--ttft", type=float, default=0.5, help="模拟接口首 token 延迟（秒）")
+    parser.add_argument("--tps", type=float, default=80.0, help="模拟接口每个流的输出速率（token/秒，0 为不限速）")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="每个流式 chunk 的字符数")
+    parser.add_argument("--domain", default="portrait")
+    parser.add_argument("--description", default="职业女性全身像")
+    parser.add_argument("--model", default="gemini-3-flash")
+    parser.add_argument("--natural-cn", action="store_true")
+    parser.add_argument("--json-en", action="store_true")
+    parser.add_argument("--keys", type=int, default=1, help="轮换使用的 api_key 数（影响调度器的按 key 配额）")
+    parser.add_argument("--vary-seed", action="store_true", help="每次请求使用不同种子（不命中上下文缓存）")
+    parser.add_argument("--no-scheduler", action="store_true", help="关闭调度器")
+    parser.add_argument("--replay", metavar="DIR", help="回放夹具目录中录制的真实调用（宽松匹配），代替模拟接口")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="回放时间缩放（0 为不等待）")
+    parser.add_argument("--json", dest="json_output", help="同时把结果写入 JSON 文件")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    config = import_plugin_module("config")
+    # 压测不写入真实用量账本
+    config.USAGE_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="skill_prompt_load_"), "usage.db")
+    if args.no_scheduler:
+        config.SCHEDULER_ENABLED = False
+
+    process = None
+    if args.replay:
+        # 须在 instrument 之前设置，使计时包装落在回放客户端上
+        import_plugin_module("core.transport").set_transport("replay", args.replay, args.time_scale, "loose")
+        base_url = "http://replay.invalid/v1"
+        print(f"回放夹具: {args.replay}（时间缩放 {args.time_scale:g}）", file=sys.stderr)
+
+    tracer = Tracer()
+    instrument(tracer)
+    if not args.replay:
+        process, port = start_server(args)
+        base_url = f"http://127.0.0.1:{port}/v1"
+        print(f"模拟接口: {base_url}（首 token {args.ttft}s，{args.tps:g} token/s）", file=sys.stderr)
+
+    levels = []
+    try:
+        for concurrency in [int(level) for level in args.levels.split(",") if level.strip()]:
+            result = run_level(args, tracer, base_url, concurrency)
+            levels.append(result)
+            print(f"并发 {concurrency}: {result['requests']} 次，{result['throughput']:.2f} req/s，"
+                  f"p95 {result['p95']:.0f}ms", file=sys.stderr)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print()
+    report(levels)
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(levels, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
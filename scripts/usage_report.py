@@ -0,0 +1,80 @@
+"""
+用量报表
+
+按日期、领域、来源（节点）、模型、输出段落汇总用量账本（config.USAGE_DB_PATH）。
+
+用法:
+    python scripts/usage_report.py                         # 最近 7 天，按日期/领域/模型
+    python scripts/usage_report.py --by model,sections     # 哪些模型与输出组合最耗 token
+    python scripts/usage_report.py --since 2026-10-01 --by node
+    python scripts/usage_report.py --by model,estimated    # 分开实际用量与估算用量
+
+est_requests 列为按字符估算（接口未返回 usage）的请求数 / 总请求数，est_tokens 为其中估算的 token 数
+"""
+
+import argparse
+import datetime
+
+from _bootstrap import import_plugin_module
+
+config = import_plugin_module("config")
+usage_ledger = import_plugin_module("core.usage_ledger")
+
+
+def _cell(column: str, value) -> str:
+    if value is None:
+        return "-"
+    if column == "estimated":
+        return "estimated" if value else "actual"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用量报表")
+    parser.add_argument("--db", default=config.USAGE_DB_PATH, help="用量账本路径")
+    parser.add_argument("--by", default="day,domain,model",
+                        help=f"汇总维度（逗号分隔）：{', '.join(usage_ledger.ROLLUP_DIMENSIONS)}")
+    parser.add_argument("--since", help="起始日期 YYYY-MM-DD（默认最近 --days 天）")
+    parser.add_argument("--until", help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    by = [column.strip() for column in args.by.split(",") if column.strip()]
+    unknown = [column for column in by if column not in usage_ledger.ROLLUP_DIMENSIONS]
+    if unknown:
+        parser.error(f"未知维度: {', '.join(unknown)}")
+    since = args.since or (datetime.date.today() - datetime.timedelta(days=args.days - 1)).isoformat()
+
+    ledger = usage_ledger.UsageLedger(args.db)
+    try:
+        rows = ledger.rollup(by, since=since, until=args.until)
+    finally:
+        ledger.close()
+
+    header = by + ["requests", "input", "output", "reasoning", "est_requests", "est_tokens", "cost($)"]
+    table = [
+        [_cell(column, row[column]) for column in by] + [
+            str(row["requests"]),
+            str(row["input_tokens"] or 0),
+            str(row["output_tokens"] or 0),
+            str(row["reasoning_tokens"] or 0),
+            f"{row['estimated_requests'] or 0}/{row['requests']}",
+            str(row["estimated_tokens"] or 0),
+            f"{row['cost']:.4f}" if row["cost"] is not None else "-",
+        ]
+        for row in rows
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *table)]
+    for line in [header] + table:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+    total_cost = sum(row["cost"] or 0 for row in rows)
+    total_tokens = sum((row["input_tokens"] or 0) + (row["output_tokens"] or 0) for row in rows)
+    estimated_tokens = sum(row["estimated_tokens"] or 0 for row in rows)
+    share = f"{estimated_tokens / total_tokens:.0%}" if total_tokens else "0%"
+    print(f"\n{since} 起：{sum(row['requests'] for row in rows)} 次请求，{total_tokens} tokens"
+          f"（其中估算 {estimated_tokens}，{share}），${total_cost:.4f}")
+
+
+if __name__ == "__main__":
+    main()
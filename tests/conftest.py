@@ -0,0 +1,12 @@
+"""
+测试公共引导
+与 scripts/ 相同，经 _bootstrap 按插件目录名导入插件包：
+    from _bootstrap import import_plugin_module
+"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
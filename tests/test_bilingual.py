@@ -0,0 +1,103 @@
+"""本地中英短语翻译（BilingualDictionary）"""
+
+import pytest
+
+from _bootstrap import import_plugin_module
+
+bilingual = import_plugin_module("core.bilingual")
+
+
+@pytest.fixture
+def dictionary():
+    pairs = [
+        ("soft light", "柔光"), ("soft", "柔和"), ("light", "光线"),
+        ("red", "红色"), ("dress", "连衣裙"), ("silk", "丝绸"),
+        ("woman", "女性"), ("portrait", "肖像"), ("lens", "镜头"),
+    ]
+    return bilingual.BilingualDictionary([bilingual._entry(en, cn) for en, cn in pairs])
+
+
+def test_entry_normalizes_and_rejects():
+    assert bilingual._entry("Soft  Light", " 柔光 ") == ("soft light", "柔光")
+    # 中文须为纯中文词，英文不超过单词数上限
+    assert bilingual._entry("soft light", "soft 光")[0] is None
+    assert bilingual._entry("a b c d e f g", "长句")[0] is None
+
+
+def test_majority_translation_wins():
+    entries = bilingual.BilingualDictionary([("red", "红色"), ("red", "赤"), ("red", "红色")]).entries
+    assert entries == {"red": "红色"}
+
+
+def test_longest_match_segmentation(dictionary):
+    assert dictionary.translate_phrase("soft light") == "柔光"
+    assert dictionary.translate_phrase("a red silk dress") == "红色丝绸连衣裙"
+    assert dictionary.translate_phrase("85mm lens") == "85mm镜头"
+    assert dictionary.translate_phrase("8k portrait") == "8K肖像"
+
+
+def test_connectives(dictionary):
+    assert dictionary.translate_phrase("woman with red dress") == "女性，红色连衣裙"
+    assert dictionary.translate_phrase("portrait of woman") == "女性的肖像"
+    assert dictionary.translate_phrase("red and silk") == "红色和丝绸"
+
+
+def test_uncovered_phrase(dictionary):
+    assert dictionary.translate_phrase("neon cyberpunk alley") is None
+
+
+def test_split_keeps_separators(dictionary):
+    phrases, separators = dictionary.split("red dress, soft light; portrait.")
+    assert phrases == ["red dress", "soft light", "portrait", ""]
+    assert [s.strip() for s in separators] == [",", ";", ".", ""]
+
+
+def test_translate_with_fallback(dictionary):
+    calls = []
+
+    def fallback(phrases):
+        calls.append(phrases)
+        return ["霓虹小巷"]
+
+    text, stats = dictionary.translate("red dress, neon alley, soft light", fallback)
+    assert text == "红色连衣裙，霓虹小巷，柔光"
+    assert calls == [["neon alley"]]
+    assert stats == {"phrases": 3, "local": 2, "llm": 1, "untranslated": 0}
+
+
+def test_translate_without_fallback_keeps_english(dictionary):
+    text, stats = dictionary.translate("red dress, neon alley")
+    assert text == "红色连衣裙，neon alley"
+    assert stats["untranslated"] == 1
+
+
+def test_estimate_counts_batches():
+    phrases = ["soft light"] * 5
+    one_batch = bilingual.LLMPhraseTranslator.estimate("gpt-4o-mini", phrases, batch_size=5)
+    two_batches = bilingual.LLMPhraseTranslator.estimate("gpt-4o-mini", phrases, batch_size=3)
+    # 每批都带系统提示词
+    assert two_batches[0] > one_batch[0]
+    assert one_batch[1] > 0
+
+
+@pytest.fixture
+def engine():
+    engine = import_plugin_module("core.prompt_engine").PromptEngine()
+    yield engine
+    engine.close()
+
+
+@pytest.mark.parametrize("text, expected", [
+    # 词典完整覆盖或文本为空：不调用 LLM，也不会创建翻译客户端
+    ("cinematic lighting", "电影级灯光"),
+    ("", ""),
+])
+def test_translate_natural_cn_without_llm(engine, text, expected):
+    result = engine.translate_natural_cn(
+        {"prompt_natural_en": text}, "portrait", "http://127.0.0.1:9", "key", "gpt-4o-mini",
+        use_endpoint_pool=False
+    )
+    assert result["prompt_natural_cn"] == expected
+    stats = result["meta"]["translation"]
+    assert stats["llm"] == 0 and stats["untranslated"] == 0
+    assert "usage" not in stats
@@ -0,0 +1,75 @@
+"""一致性检查与本地修复（ConstraintChecker / KnowledgeBase.detect_ethnicity）"""
+
+import pytest
+
+from _bootstrap import import_plugin_module
+
+ConstraintChecker = import_plugin_module("core.constraint_checker").ConstraintChecker
+KnowledgeBase = import_plugin_module("core.knowledge_base").KnowledgeBase
+
+
+@pytest.fixture
+def east_asian():
+    return ConstraintChecker.build_context({"ethnicity": "East_Asian"})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("blue eyes", "dark brown eyes"),
+    ("蓝色眼睛", "深棕色眼睛"),
+    # 组合颜色：全部不合规时整体替换，部分合规时只保留合规的部分
+    ("blue-grey eyes", "dark brown eyes"),
+    ("brown-green eyes", "brown eyes"),
+    ("dark brown eyes", "dark brown eyes"),
+])
+def test_eye_color_repair(east_asian, text, expected):
+    assert ConstraintChecker.check(text, east_asian)[0] == expected
+
+
+def test_compound_word_is_not_a_color_match(east_asian):
+    # "strawberry-blonde" 中的 blonde 不能单独匹配
+    text = "strawberry-blonde hair"
+    assert ConstraintChecker.check(text, east_asian) == (text, [])
+
+
+def test_check_without_repair_reports_only(east_asian):
+    text, fired = ConstraintChecker.check("blue eyes, soft light", east_asian, repair=False)
+    assert text == "blue eyes, soft light"
+    assert [issue["rule"] for issue in fired] == ["eyes"]
+    assert fired[0]["replacement"] == "dark brown eyes"
+
+
+def test_ancient_era_clothing_repair():
+    context = ConstraintChecker.build_context({}, "ancient Chinese palace scene")
+    assert context["era"] == "ancient"
+    text, fired = ConstraintChecker.check("business suit, jeans", context)
+    assert text == "traditional period costume, traditional period costume"
+    assert {issue["rule"] for issue in fired} == {"clothing"}
+
+
+def test_repair_result_records_field():
+    result = {"prompt_natural_en": "woman with blue eyes", "prompt_natural_cn": "蓝色眼睛的女性"}
+    fired = ConstraintChecker.repair_result(result, {"ethnicity": "East_Asian"})
+    assert result == {"prompt_natural_en": "woman with dark brown eyes", "prompt_natural_cn": "深棕色眼睛的女性"}
+    assert [issue["field"] for issue in fired] == ["prompt_natural_en", "prompt_natural_cn"]
+
+
+@pytest.mark.parametrize("description, domain", [
+    # 不涉及人物的描述不推断人种，避免误改
+    ("arabesque pattern poster", "design"),
+    ("Chinese ink painting", "art"),
+    ("a Japanese garden", None),
+])
+def test_detect_ethnicity_ignores_non_person(description, domain):
+    assert KnowledgeBase.detect_ethnicity({}, description, domain) is None
+
+
+@pytest.mark.parametrize("description, expected", [
+    ("一位东南亚女性", "Southeast_Asian"),
+    ("a Vietnamese woman", "Southeast_Asian"),
+])
+def test_detect_ethnicity_from_portrait_description(description, expected):
+    assert KnowledgeBase.detect_ethnicity({}, description, "portrait") == expected
+
+
+def test_explicit_ethnicity_option_wins():
+    assert KnowledgeBase.detect_ethnicity({"ethnicity": "African"}, "一位东南亚女性", "portrait") == "African"
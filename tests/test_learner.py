@@ -0,0 +1,46 @@
+"""学习进程启动（不得递归启动学习进程）"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+from _bootstrap import PLUGIN_DIR, PLUGIN_PACKAGE, import_plugin_module
+
+config = import_plugin_module("config")
+learner = import_plugin_module("core.learner")
+
+SCRIPT = os.path.join(PLUGIN_DIR, "scripts", "learn_elements.py")
+
+
+def test_learner_child_is_marked(monkeypatch):
+    calls = []
+    monkeypatch.setattr(learner.subprocess, "Popen", lambda command, **kwargs: calls.append((command, kwargs)))
+    learner.start_learner_process("elements.db", interval=60)
+    (command, kwargs), = calls
+    assert command[1] == SCRIPT
+    assert kwargs["env"][config.LEARNER_CHILD_ENV] == "1"
+
+
+def test_learner_script_starts_no_services(tmp_path):
+    db_path = str(tmp_path / "elements.db")
+    shutil.copyfile(config.DB_PATH, db_path)
+    # 在全新的解释器中运行学习脚本：记录其启动的子进程与后台线程，并检查插件 __init__ 未执行
+    code = f"""
+import runpy, subprocess, sys, threading
+spawned = []
+subprocess.Popen = lambda *args, **kwargs: spawned.append(args)
+sys.path.insert(0, {os.path.dirname(SCRIPT)!r})
+sys.argv = [{SCRIPT!r}, "--db", {db_path!r}, "--nice", "0"]
+runpy.run_path({SCRIPT!r}, run_name="__main__")
+print("spawned", len(spawned))
+print("initialized", hasattr(sys.modules[{PLUGIN_PACKAGE!r}], "NODE_CLASS_MAPPINGS"))
+print("threads", sorted(t.name for t in threading.enumerate() if t.name.startswith("skill-prompt")))
+"""
+    env = dict(os.environ, **{config.LEARNER_CHILD_ENV: "1"})
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=120, check=True
+    ).stdout
+    assert "spawned 0" in output
+    assert "initialized False" in output
+    assert "threads []" in output
@@ -0,0 +1,91 @@
+"""自然语言提示词后处理（PromptPostProcessor）"""
+
+import pytest
+
+from _bootstrap import import_plugin_module
+
+PromptPostProcessor = import_plugin_module("core.post_process").PromptPostProcessor
+ConstraintChecker = import_plugin_module("core.constraint_checker").ConstraintChecker
+
+
+def _dedupe(phrases, lang="en"):
+    indices, removed = PromptPostProcessor.dedupe(phrases, lang)
+    return [phrases[i] for i in indices], removed
+
+
+@pytest.mark.parametrize("phrases, expected", [
+    (["red dress", "red dress"], ["red dress"]),
+    (["Red dresses", "red dress"], ["Red dresses"]),
+    # 更具体的短语代替被包含的短语，位置取靠前的一个
+    (["stockings", "soft light", "black silk stockings"], ["black silk stockings", "soft light"]),
+    (["long hair", "long hair with bangs"], ["long hair with bangs"]),
+])
+def test_dedupe_merges(phrases, expected):
+    kept, removed = _dedupe(phrases)
+    assert kept == expected
+    assert removed == len(phrases) - len(expected)
+
+
+@pytest.mark.parametrize("phrases", [
+    # 中心词不同或复数另有词义：不是同一事物
+    ["glasses", "glass table"],
+    ["long hair ribbon", "long hair"],
+    ["a cat", "a cat's tail"],
+    ["jeans", "jean jacket"],
+])
+def test_dedupe_keeps_distinct(phrases):
+    assert _dedupe(phrases) == (phrases, 0)
+
+
+@pytest.mark.parametrize("phrases, expected", [
+    (["长发", "乌黑长发"], ["乌黑长发"]),
+    (["长发", "长发飘飘"], ["长发", "长发飘飘"]),
+    # 单字不视为被包含
+    (["红", "红色长裙"], ["红", "红色长裙"]),
+])
+def test_dedupe_cn(phrases, expected):
+    assert _dedupe(phrases, "cn")[0] == expected
+
+
+def test_repaired_clothing_collapses():
+    # 古代场景中修复出的两个相同短语只保留一个
+    context = ConstraintChecker.build_context({}, "ancient Chinese palace scene")
+    repaired = ConstraintChecker.check("business suit, jeans", context)[0]
+    text, stats = PromptPostProcessor.process(repaired, "en")
+    assert text == "traditional period costume"
+    assert stats["duplicates"] == 1
+
+
+def test_process_promotes_matching_phrases():
+    reference = PromptPostProcessor.reference("woman in a red dress")
+    text, stats = PromptPostProcessor.process("soft light, red dress, city street", "en", reference)
+    assert text == "red dress, soft light, city street"
+    assert stats["promoted"] == 1
+
+
+def test_process_trims_from_the_end():
+    text, stats = PromptPostProcessor.process("red dress, soft light, city street", "en", max_chars=24)
+    assert text == "red dress, soft light"
+    assert stats["trimmed"] == 1
+
+
+def test_process_unchanged_returns_original():
+    text = "red dress,  soft light"
+    assert PromptPostProcessor.process(text, "en")[0] == text
+
+
+def test_process_result_applies_length_rule():
+    # 互不重复的短语，超出英文长度上限（800 字符）
+    text = ", ".join(f"{word}-toned {word} detail" for word in (
+        "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november oscar papa "
+        "quebec romeo sierra tango uniform victor whiskey xray yankee zulu amber cobalt indigo scarlet "
+        "ivory ebony copper silver golden crimson azure violet emerald orange magenta "
+        "saffron umber sepia ochre teal olive navy maroon coral peach mint lilac plum"
+    ).split())
+    assert len(text) > 800
+    result = {"prompt_natural_en": text}
+    changed = PromptPostProcessor.process_result(result, enable_enhance=True)
+    assert len(result["prompt_natural_en"]) <= 800
+    assert changed["natural_en"]["trimmed"] > 0
+    result = {"prompt_natural_en": text}
+    assert PromptPostProcessor.process_result(result, enable_enhance=False) == {}
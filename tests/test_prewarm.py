@@ -0,0 +1,43 @@
+"""插件加载与预热（ComfyUI 之外不启动后台服务，回放模式不访问网络）"""
+
+import os
+import subprocess
+import sys
+
+from _bootstrap import PLUGIN_DIR, PLUGIN_PACKAGE, import_plugin_module
+
+config = import_plugin_module("config")
+prewarm = import_plugin_module("core.prewarm")
+transport = import_plugin_module("core.transport")
+llm_client = import_plugin_module("core.llm_client")
+
+
+def test_import_outside_comfyui_starts_nothing():
+    # 在全新的解释器中执行插件 __init__
+    code = f"""
+import sys, threading
+sys.path.insert(0, {os.path.dirname(PLUGIN_DIR)!r})
+import {PLUGIN_PACKAGE}
+print("nodes", len({PLUGIN_PACKAGE}.NODE_CLASS_MAPPINGS))
+print("threads", sorted(t.name for t in threading.enumerate() if t.name.startswith("skill-prompt")))
+"""
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, timeout=120, check=True
+    ).stdout
+    assert "nodes 11" in output
+    assert "threads []" in output
+
+
+def test_replay_prewarm_does_not_connect(monkeypatch):
+    connects = []
+    monkeypatch.setattr(llm_client.LLMClient, "warm_up", lambda self, domains: connects.append(self) or True)
+    transport.set_transport("replay")
+    try:
+        timings = prewarm.run_prewarm(
+            config.DB_PATH, {"portrait": {}}, api_base_url="http://127.0.0.1:9", api_key="key", model="gpt-4o-mini"
+        )
+    finally:
+        transport.set_transport()
+    assert connects == []
+    assert "connect" not in timings
+    assert "context" in timings
@@ -0,0 +1,77 @@
+"""响应解析（ThinkTagSplitter / repair_json）"""
+
+import json
+
+import pytest
+
+from _bootstrap import import_plugin_module
+
+response_parser = import_plugin_module("core.response_parser")
+ThinkTagSplitter = response_parser.ThinkTagSplitter
+repair_json = response_parser.repair_json
+
+
+def _split(chunks):
+    splitter = ThinkTagSplitter()
+    reasoning = answer = ""
+    for chunk in chunks:
+        r, a = splitter.feed(chunk)
+        reasoning += r
+        answer += a
+    r, a = splitter.finish()
+    return reasoning + r, answer + a
+
+
+@pytest.mark.parametrize("chunks", [
+    ["<think>plan it</think>\n\n=== natural_en ===\nred dress"],
+    # 标签被切成两半
+    ["<thi", "nk>plan", " it</th", "ink>", "\n\n=== natural_en ===\nred dress"],
+    ["  <think>", "plan it<", "/think>\n", "\n=== natural_en ===\nred dress"],
+])
+def test_think_block_split(chunks):
+    assert _split(chunks) == ("plan it", "=== natural_en ===\nred dress")
+
+
+def test_no_think_block_passes_through():
+    splitter = ThinkTagSplitter()
+    assert splitter.feed("<th") == ("", "")
+    assert splitter.feed("e answer") == ("", "<the answer")
+    assert splitter.feed(" <think>inline</think>") == ("", " <think>inline</think>")
+
+
+def test_unclosed_think_block_is_reasoning():
+    assert _split(["<think>still thinking", " about it"]) == ("still thinking about it", "")
+
+
+def test_repair_json_valid_untouched():
+    text = '{\n  "subject": {"gender": "female"}\n}'
+    assert repair_json(text) == text
+
+
+@pytest.mark.parametrize("text, expected", [
+    # 代码块与前后说明文字
+    ('Here you go:\n```json\n{"a": 1}\n```\nEnjoy', {"a": 1}),
+    ('Sure! {"a": [1, 2]} hope this helps', {"a": [1, 2]}),
+    # 尾逗号
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}),
+    # 截断在值之后：补全括号
+    ('{"a": {"b": "c"', {"a": {"b": "c"}}),
+    # 截断在字符串或键中：回退到最后一个完整成员
+    ('{"a": "x", "b": "half a sen', {"a": "x"}),
+    ('{"a": {"b": "c", "d"', {"a": {"b": "c"}}),
+    ('{"a": 1, "b": ', {"a": 1}),
+])
+def test_repair_json(text, expected):
+    fixed = repair_json(text)
+    assert fixed is not None
+    assert json.loads(fixed) == expected
+
+
+def test_repair_json_keeps_complete_empty_object():
+    assert repair_json("result: {} done") == "{}"
+
+
+# 截断在第一个成员之前时没有可保留的内容
+@pytest.mark.parametrize("text", ["", "no json here", '{"a": 1]', "{", '{"subject": {"gen', '[{"a'])
+def test_repair_json_unrecoverable(text):
+    assert repair_json(text) is None
@@ -0,0 +1,86 @@
+"""LLM 调用调度器（优先级、并发上限、令牌桶）"""
+
+import threading
+import time
+
+import pytest
+
+from _bootstrap import import_plugin_module
+
+scheduler = import_plugin_module("core.scheduler")
+LLMScheduler = scheduler.LLMScheduler
+
+
+def test_token_wait():
+    state = scheduler._KeyState(concurrency=1, tokens_per_minute=600)
+    assert state.token_wait(600) == 0.0
+    state.bucket = 300
+    # 每秒补充 10 个令牌
+    assert state.token_wait(400) == pytest.approx(10.0)
+    # 超过桶容量的请求只需等到桶满
+    assert state.token_wait(10_000) == pytest.approx(30.0)
+
+
+def test_token_wait_unlimited():
+    state = scheduler._KeyState(concurrency=1, tokens_per_minute=0)
+    assert state.token_wait(10_000) == 0.0
+
+
+def test_bucket_corrected_by_actual_tokens():
+    sched = LLMScheduler(key_tokens_per_minute=1000)
+    with sched.slot("key", tokens=800) as ticket:
+        assert sched.stats()["keys"][scheduler._mask("key")]["tokens_available"] == 200
+        ticket.actual_tokens = 100
+    stats = sched.stats()["keys"][scheduler._mask("key")]
+    assert stats["tokens"] == 100
+    assert stats["tokens_available"] >= 900
+
+
+def test_exhausted_bucket_times_out():
+    sched = LLMScheduler(key_tokens_per_minute=60, queue_timeout=0.05)
+    with sched.slot("key", tokens=60):
+        pass
+    with pytest.raises(TimeoutError):
+        with sched.slot("key", tokens=60):
+            pass
+    assert sched.stats()["timeouts"] == 1
+    # 超时的请求已出队
+    assert sched.stats()["classes"]["interactive"]["queued"] == 0
+
+
+def test_other_key_not_blocked_by_exhausted_bucket():
+    sched = LLMScheduler(key_quotas={"slow": {"tokens_per_minute": 60}}, queue_timeout=0.5)
+    with sched.slot("slow", tokens=60):
+        pass
+    with sched.slot("fast", tokens=10_000) as ticket:
+        assert ticket.granted
+
+
+def test_interactive_before_batch():
+    sched = LLMScheduler(max_concurrency=1)
+    order = []
+    started = threading.Barrier(3)
+
+    def call(priority):
+        started.wait()
+        with sched.slot("key", priority):
+            order.append(priority)
+
+    with sched.slot("key"):
+        threads = [threading.Thread(target=call, args=(p,)) for p in ("batch", "interactive")]
+        for thread in threads:
+            thread.start()
+        started.wait()
+        # 两个请求都已排队后再释放
+        while sum(c["queued"] for c in sched.stats()["classes"].values()) < 2:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive", "batch"]
+
+
+def test_stats_mask_api_key():
+    sched = LLMScheduler()
+    with sched.slot("sk-secret-value"):
+        pass
+    assert "sk-secret-value" not in str(sched.stats())
@@ -0,0 +1,41 @@
+// Skill Prompt 流式预览：节点生成时显示模型的实时输出，生成结束后移除
+import { app } from "../../../scripts/app.js";
+import { api } from "../../../scripts/api.js";
+import { ComfyWidgets } from "../../../scripts/widgets.js";
+
+const PREVIEW_WIDGET = "stream_preview";
+
+function removePreview(node) {
+    const index = node.widgets?.findIndex((w) => w.name === PREVIEW_WIDGET) ?? -1;
+    if (index < 0) return;
+    node.widgets[index].onRemove?.();
+    node.widgets.splice(index, 1);
+    node.setSize(node.computeSize());
+}
+
+app.registerExtension({
+    name: "SkillPrompt.StreamPreview",
+    setup() {
+        api.addEventListener("skill_prompt.partial", ({ detail }) => {
+            const node = app.graph.getNodeById(Number(detail.node));
+            if (!node) return;
+
+            if (detail.done) {
+                removePreview(node);
+                node.setDirtyCanvas(true, true);
+                return;
+            }
+
+            let widget = node.widgets?.find((w) => w.name === PREVIEW_WIDGET);
+            if (!widget) {
+                widget = ComfyWidgets["STRING"](node, PREVIEW_WIDGET, ["STRING", { multiline: true }], app).widget;
+                widget.inputEl.readOnly = true;
+                widget.inputEl.style.opacity = 0.7;
+                widget.serialize = false;
+            }
+            widget.value = detail.text;
+            widget.inputEl.scrollTop = widget.inputEl.scrollHeight;
+            node.setDirtyCanvas(true, true);
+        });
+    },
+});